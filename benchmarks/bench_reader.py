@@ -0,0 +1,186 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-message cost of _QuoteReader.parse compared to the pre single-pass decoder.
+
+Usage:
+    python -m benchmarks.bench_reader [--number N] [--output FILE]
+"""
+
+from typing import Dict
+
+import argparse
+import base64
+import json
+import timeit
+
+from yflive._reader import _Projection, _QuoteReader
+from yflive.quote import Quote
+from yflive.yfquote_pb2 import YFQuote
+
+MESSAGES = [
+    # equity tick as captured from the live socket
+    "CgRUU0xBFR8FKUQYoMyD1ZVeKgNOTVMwCDgBRSLND8BIpvnwDmXAo3jB2AEE",
+    # crypto tick carrying the long tail of string and double fields
+    base64.b64encode(YFQuote(
+        identifier="BTC-USD", price=61234.5, time=1617815434000, 
+        currency="USD", exchange="CCC", quoteType=41, marketState=1, 
+        changePercent=1.25, dayVolume=41234567890, dayHigh=62000.0, 
+        dayLow=60000.0, change=760.5, shortName="Bitcoin USD", 
+        vol_24hr=41234567890, volAllCurrencies=41234567890, 
+        fromCurrency="BTC", lastMarket="CoinMarketCap", 
+        circulatingSupply=18680000.0, marketCap=1.14e12
+    ).SerializeToString()).decode(),
+]
+
+# ==============================================================================
+# Reference implementation (double base64 decode + list copy + method varints)
+# ==============================================================================
+
+class _LegacyReader:
+
+    def __init__(self, buf, pos, length):
+        self.buf = buf
+        self.pos = pos
+        self.length = length
+
+    @staticmethod
+    def parse(msg):
+        yfquote = YFQuote()
+        yfquote.ParseFromString(base64.b64decode(msg))
+        fields = {}
+        for f in _LegacyReader.available_fields(msg):
+            fields[f] = getattr(yfquote, f, None)
+        return Quote(**fields)
+
+    @staticmethod
+    def available_fields(msg):
+        buffer = list(base64.b64decode(msg))
+        reader = _LegacyReader(buffer, 0, len(buffer))
+        available_fields = []
+        while reader.pos < reader.length:
+            t = reader._uint32()
+            available_fields.append(Quote.__fields__[(t >> 3) - 1])
+            reader._skipType(t & 7)
+        return available_fields
+
+    def _incr(self):
+        self.pos += 1
+        return self.pos - 1
+
+    def _uint32(self):
+        value = 0
+        shift = 0
+        while True:
+            b = self.buf[self._incr()]
+            value |= (b & 127) << shift
+            if b < 128:
+                return value
+            shift += 7
+
+    def _skip(self, length=None):
+        if isinstance(length, int):
+            self.pos += length
+        else:
+            while self.buf[self._incr()] & 128:
+                pass
+
+    def _skipType(self, wireType):
+        if wireType == 0:
+            self._skip()
+        elif wireType == 1:
+            self._skip(8)
+        elif wireType == 2:
+            self._skip(self._uint32())
+        elif wireType == 5:
+            self._skip(4)
+
+# ==============================================================================
+# Benchmark
+# ==============================================================================
+
+def bench(fn, number: int) -> float:
+    """Return mean microseconds per message for fn over MESSAGES."""
+    def run():
+        for msg in MESSAGES:
+            fn(msg)
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / (number * len(MESSAGES)) * 1e6
+
+def bench_attributes(number: int) -> float:
+    """Return mean microseconds for reading the common fields of a Quote."""
+    quotes = [_QuoteReader.parse(msg) for msg in MESSAGES]
+    def run():
+        for q in quotes:
+            q.identifier, q.price, q.time, q.dayVolume, q.quoteType
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / (number * len(quotes)) * 1e6
+
+def results(number: int=2000) -> Dict[str, Dict[str, float]]:
+    """
+    Run all micro-benchmarks.
+
+    Returns:
+        dict: benchmark -> microseconds per message of the legacy and the 
+            current implementation, legacy is None where there is none
+    """
+    for msg in MESSAGES:
+        assert _QuoteReader.parse(msg)._raw == _LegacyReader.parse(msg)._raw
+
+    result = {}
+    for name, legacy, current in [
+            ("parse", _LegacyReader.parse, _QuoteReader.parse),
+            ("available_fields", _LegacyReader.available_fields, 
+             _QuoteReader.available_fields)]:
+        result[name] = {"legacy_us": bench(legacy, number), 
+                        "current_us": bench(current, number)}
+
+    batch = MESSAGES * 100
+    best = min(timeit.repeat(lambda: _QuoteReader.parse_many(batch), 
+                             number=max(number // 100, 1), repeat=5))
+    per_msg = best / (max(number // 100, 1) * len(batch)) * 1e6
+    result["parse_many"] = {"legacy_us": None, "current_us": per_msg}
+
+    projection = _Projection(["identifier", "price", "time", "bid", "ask"])
+    per_msg = bench(lambda msg: _QuoteReader.parse(msg, projection), number)
+    result["parse (projected)"] = {"legacy_us": None, "current_us": per_msg}
+
+    result["quote attributes"] = {"legacy_us": None, 
+                                  "current_us": bench_attributes(number)}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--output", default=None,
+                        help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = results(args.number)
+    print("{:<18} {:>12} {:>12} {:>8}".format(
+        "", "legacy us", "current us", "speedup"))
+    for name, row in result.items():
+        old, new = row["legacy_us"], row["current_us"]
+        if old is None:
+            print("{:<18} {:>12} {:>12.2f}".format(name, "", new))
+        else:
+            print("{:<18} {:>12.2f} {:>12.2f} {:>7.2f}x".format(
+                name, old, new, old / new))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
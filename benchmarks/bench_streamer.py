@@ -0,0 +1,167 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End to end throughput and latency of QuoteStreamer against the simulator.
+
+Reports sustained frames per second, receive to on_quote latency, CPU time
+and peak RSS of the streaming process. The simulator runs in a separate
+process.
+
+Usage:
+    python -m benchmarks.bench_streamer [--symbols N] [--rate R]
+        [--frames N] [--workers N] [--fields F ...] [--output FILE]
+"""
+
+from typing import Dict, Iterable
+
+import argparse
+import json
+import resource
+import sys
+import threading
+import time
+
+from yflive.streamer import QuoteStreamer
+
+from benchmarks.simulator import Simulator
+
+class _TimedStreamer(QuoteStreamer):
+    """
+    QuoteStreamer noting when each message was received, so on_quote can
+    measure the time until the quote is handed out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = {}
+        self.local = threading.local()
+
+    def _ws_message(self, socket, message):
+        # message objects stay alive until handled, so their id is unique
+        self.received[id(message)] = time.perf_counter()
+        super()._ws_message(socket, message)
+
+    def _handle_message(self, message):
+        self.local.received = self.received.pop(id(message), None)
+        super()._handle_message(message)
+
+def _percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return None
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def _cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _peak_rss() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run(symbols: int=500, rate: float=0, frames: int=100000,
+        workers: int=0, fields: Iterable[str]=None, seed: int=0,
+        timeout: float=120) -> Dict:
+    """
+    Stream frames from the simulator and measure the streamer.
+
+    Args:
+        symbols (int): number of identifiers subscribed to
+        rate (float): frames per second sent, 0 sends as fast as possible
+        frames (int): frames to receive
+        workers (int): worker threads of the streamer
+        fields (Iterable): fields to decode, defaults to all fields
+        seed (int): random seed of the simulator
+        timeout (float): seconds after which the run is cut short
+
+    Returns:
+        dict: parameters and measurements, latencies in microseconds
+    """
+    latencies = []
+    done = threading.Event()
+    lock = threading.Lock()
+    first = [None]
+
+    def on_quote(qs: _TimedStreamer, quote):
+        now = time.perf_counter()
+        received = getattr(qs.local, "received", None)
+        with lock:
+            if first[0] is None:
+                first[0] = (now, _cpu())
+            if received is not None:
+                latencies.append(now - received)
+            if len(latencies) >= frames:
+                done.set()
+
+    with Simulator(symbols=symbols, rate=rate, frames=frames,
+                   seed=seed) as simulator:
+        qs = _TimedStreamer(subscribe=simulator.identifiers,
+                            on_quote=on_quote, workers=workers,
+                            queue_size=frames, fields=fields, 
+                            url=simulator.url)
+        qs.start(should_thread=True)
+        completed = done.wait(timeout)
+        ended = time.perf_counter(), _cpu()
+        qs.stop()
+
+    with lock:
+        received = len(latencies)
+        ordered = sorted(latencies)
+    started = first[0] or ended
+    elapsed = ended[0] - started[0]
+    cpu = ended[1] - started[1]
+    return {
+        "symbols": symbols,
+        "rate": rate,
+        "frames": frames,
+        "workers": workers,
+        "fields": None if fields is None else list(fields),
+        "completed": completed,
+        "received": received,
+        "seconds": elapsed,
+        "frames_per_second": received / elapsed if elapsed > 0 else 0.0,
+        "latency_p50_us": _scaled(_percentile(ordered, 0.5)),
+        "latency_p99_us": _scaled(_percentile(ordered, 0.99)),
+        "cpu_seconds": cpu,
+        "cpu_percent": cpu / elapsed * 100 if elapsed > 0 else 0.0,
+        "peak_rss_mb": _peak_rss(),
+    }
+
+def _scaled(seconds: float) -> float:
+    return None if seconds is None else seconds * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=0)
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--fields", nargs="+", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = run(args.symbols, args.rate, args.frames, args.workers,
+                 args.fields, args.seed)
+    for key, value in result.items():
+        print("{:<18} {}".format(key, value))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
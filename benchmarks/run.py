@@ -0,0 +1,137 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run the micro-benchmarks and the end to end scenarios and save the results
+as JSON. With --compare, every measurement is compared to a previous results
+file and changes for the worse beyond --threshold are reported.
+
+Usage:
+    python -m benchmarks.run [--output FILE] [--compare FILE] [--quick]
+"""
+
+from typing import Dict, List
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from google.protobuf.internal import api_implementation
+
+import yflive
+
+from benchmarks import bench_reader, bench_streamer
+
+# name -> bench_streamer.run arguments
+SCENARIOS = {
+    "inline": dict(symbols=500, frames=50000),
+    "workers": dict(symbols=500, frames=50000, workers=2),
+    "projected": dict(symbols=500, frames=50000,
+                      fields=["identifier", "price", "time", "bid", "ask"]),
+    "paced": dict(symbols=500, frames=20000, rate=5000),
+}
+
+# measurements where higher is better, all others are costs
+_HIGHER_IS_BETTER = ("frames_per_second",)
+
+# measurements describing a run rather than measuring it
+_PARAMETERS = ("symbols", "rate", "frames", "workers", "fields", "completed",
+               "received", "seconds", "legacy_us")
+
+def run(quick: bool=False) -> Dict:
+    """
+    Run all benchmarks.
+
+    Args:
+        quick (bool): run a tenth of the frames and iterations
+
+    Returns:
+        dict: environment, micro and end to end results
+    """
+    scale = 10 if quick else 1
+    scenarios = {}
+    for name, kwargs in SCENARIOS.items():
+        kwargs = dict(kwargs, frames=kwargs["frames"] // scale)
+        scenarios[name] = bench_streamer.run(**kwargs)
+    return {
+        "environment": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "yflive": yflive.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "protobuf": api_implementation.Type(),
+        },
+        "micro": bench_reader.results(2000 // scale),
+        "end_to_end": scenarios,
+    }
+
+def compare(current: Dict, baseline: Dict,
+            threshold: float=0.1) -> List[str]:
+    """
+    Compare results to a baseline.
+
+    Args:
+        current (dict): results of run()
+        baseline (dict): earlier results of run()
+        threshold (float): relative change for the worse reported
+
+    Returns:
+        list: one line per measurement present in both, regressions marked
+    """
+    lines = []
+    for section in ("micro", "end_to_end"):
+        for name, values in current.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name, {})
+            for key, value in values.items():
+                old = previous.get(key)
+                if key in _PARAMETERS or not isinstance(value, (int, float)) \
+                        or not isinstance(old, (int, float)) or not old:
+                    continue
+                change = value / old - 1
+                worse = -change if key in _HIGHER_IS_BETTER else change
+                lines.append("{:<4} {:<30} {:>12.2f} {:>12.2f} {:>+8.1%}".format(
+                    "!!" if worse > threshold else "",
+                    "{}.{}".format(name, key), old, value, change))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", default=None,
+                        help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines = compare(results, baseline, args.threshold)
+        print("{:<4} {:<30} {:>12} {:>12} {:>8}".format(
+            "", "", "baseline", "current", "change"))
+        print("\n".join(lines))
+        if any(line.startswith("!!") for line in lines):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local websocket server simulating the Yahoo! Finance streamer.
+
+Serves synthetic YFQuote frames with the field mix of their QuoteType for
+every subscribed identifier, at a fixed rate or as fast as possible. Frames
+are generated from a seed, so every run sends the same sequence, stamped with
+the current time when sent.
+
+Usage:
+    python -m benchmarks.simulator [--port P] [--rate R] [--frames N]
+
+Requires the asyncio extra (websockets).
+"""
+
+from typing import Dict, List
+
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import random
+import time
+
+from yflive.enums import MarketState, QuoteType
+from yflive.yfquote_pb2 import YFQuote
+
+# QuoteType -> share of identifiers, identifier format
+MIX = [
+    (QuoteType.EQUITY, 0.50, "EQ{:04d}"),
+    (QuoteType.ETF, 0.15, "ETF{:04d}"),
+    (QuoteType.OPTION, 0.10, "OP{:04d}C00150000"),
+    (QuoteType.CRYPTOCURRENCY, 0.10, "CR{:04d}-USD"),
+    (QuoteType.INDEX, 0.05, "^IX{:04d}"),
+    (QuoteType.CURRENCY, 0.05, "FX{:04d}=X"),
+    (QuoteType.FUTURE, 0.05, "FU{:04d}=F"),
+]
+
+# Frames generated per identifier, sent over and over
+FRAMES_PER_IDENTIFIER = 64
+
+def identifiers(count: int) -> List[str]:
+    """
+    Get count identifiers spread over the QuoteTypes of MIX.
+
+    Args:
+        count (int): number of identifiers
+
+    Returns:
+        list: identifiers, the same for the same count
+    """
+    result = []
+    for i in range(count):
+        # deterministic interleaving by share
+        position = (i * 0.6180339887) % 1.0
+        for quote_type, share, fmt in MIX:
+            if position < share:
+                result.append(fmt.format(i))
+                break
+            position -= share
+        else:
+            result.append(MIX[0][2].format(i))
+    return result
+
+def _quote_type(identifier: str) -> QuoteType:
+    for quote_type, _, fmt in MIX:
+        prefix = fmt.split("{")[0]
+        suffix = fmt.split("}")[1]
+        if identifier.startswith(prefix) and identifier.endswith(suffix):
+            return quote_type
+    return QuoteType.EQUITY
+
+def synthetic_frames(identifier: str, seed: int=0,
+                     count: int=FRAMES_PER_IDENTIFIER) -> List[bytes]:
+    """
+    Generate serialized YFQuote messages of an identifier, without time.
+
+    Prices follow a random walk and dayVolume grows. Like Yahoo! Finance,
+    messages carry a varying subset of the fields of their QuoteType.
+
+    Args:
+        identifier (str): identifier of the quotes
+        seed (int): random seed
+        count (int): number of messages
+
+    Returns:
+        list: serialized YFQuote messages
+    """
+    rng = random.Random("{}:{}".format(seed, identifier))
+    quote_type = _quote_type(identifier)
+    price = rng.uniform(5, 500)
+    if quote_type == QuoteType.CRYPTOCURRENCY:
+        price *= 100
+    elif quote_type == QuoteType.CURRENCY:
+        price /= 250
+    previous_close = price
+    day_volume = rng.randint(10000, 1000000)
+    high = low = price
+
+    frames = []
+    for _ in range(count):
+        price = max(price * (1 + rng.gauss(0, 0.0005)), 0.0001)
+        high, low = max(high, price), min(low, price)
+        size = rng.randint(1, 500)
+        day_volume += size
+        spread = price * rng.uniform(0.0001, 0.001)
+
+        fields = dict(
+            identifier=identifier, price=price, quoteType=quote_type.value,
+            marketState=MarketState.REGULAR.value,
+            changePercent=(price / previous_close - 1) * 100,
+            change=price - previous_close, priceHint=2)
+        # fields sent only when they changed
+        if rng.random() < 0.3:
+            fields.update(dayHigh=high, dayLow=low)
+
+        if quote_type in (QuoteType.EQUITY, QuoteType.ETF):
+            fields.update(exchange="NMS" if quote_type == QuoteType.EQUITY
+                          else "PCX", dayVolume=day_volume, lastSize=size)
+            if rng.random() < 0.5:
+                fields.update(bid=price - spread / 2, ask=price + spread / 2,
+                              bidSize=rng.randint(1, 50),
+                              askSize=rng.randint(1, 50))
+        elif quote_type == QuoteType.OPTION:
+            fields.update(exchange="OPR", dayVolume=day_volume // 100,
+                          expireDate=1640908800, strikePrice=150.0,
+                          underlyingSymbol=identifier[:6], optionType=0,
+                          openInterest=rng.randint(100, 10000),
+                          miniOption=0, bid=price - spread,
+                          ask=price + spread)
+        elif quote_type == QuoteType.CRYPTOCURRENCY:
+            fields.update(
+                currency="USD", exchange="CCC", dayVolume=day_volume * 1000,
+                vol_24hr=day_volume * 1000, volAllCurrencies=day_volume * 1000,
+                fromCurrency=identifier.split("-")[0],
+                lastMarket="CoinMarketCap", circulatingSupply=18680000.0,
+                marketCap=price * 18680000.0)
+            if rng.random() < 0.2:
+                fields.update(shortName=identifier.replace("-", " "))
+        elif quote_type == QuoteType.CURRENCY:
+            fields.update(currency="USD", exchange="CCY", priceHint=4)
+        elif quote_type == QuoteType.FUTURE:
+            fields.update(currency="USD", exchange="CME",
+                          dayVolume=day_volume, openPrice=previous_close,
+                          previousClose=previous_close,
+                          expireDate=1640908800,
+                          underlyingSymbol=identifier[:6])
+        else:
+            fields.update(exchange="SNP")
+        frames.append(YFQuote(**fields).SerializeToString())
+    return frames
+
+def _time_field(ms: int) -> bytes:
+    # tag of time (field 3, varint) followed by the zigzag encoded sint64
+    value = ms << 1 if ms >= 0 else (-ms << 1) - 1
+    out = bytearray(b"\x18")
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+# ==============================================================================
+# Server
+# ==============================================================================
+
+class _Handler:
+    """
+    Streams frames of the identifiers subscribed to on one connection.
+    """
+
+    def __init__(self, frames: Dict[str, List[bytes]], seed: int, 
+                 rate: float, limit: int):
+        self.frames = frames
+        self.seed = seed
+        self.rate = rate
+        self.limit = limit
+        self.subscribed = []
+        self.sent = 0
+
+    async def __call__(self, websocket, *args):
+        import websockets
+
+        sender = None
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                for identifier in request.get("subscribe", []):
+                    if identifier not in self.subscribed:
+                        self.subscribed.append(identifier)
+                for identifier in request.get("unsubscribe", []):
+                    if identifier in self.subscribed:
+                        self.subscribed.remove(identifier)
+                if sender is None and self.subscribed:
+                    sender = asyncio.ensure_future(self._send(websocket))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if sender is not None:
+                sender.cancel()
+
+    async def _send(self, websocket):
+        started = time.monotonic()
+        turn = 0
+        while self.limit is None or self.sent < self.limit:
+            if self.rate:
+                due = int((time.monotonic() - started) * self.rate) - self.sent
+                if due <= 0:
+                    await asyncio.sleep(0.001)
+                    continue
+            else:
+                due = 256
+            if self.limit is not None:
+                due = min(due, self.limit - self.sent)
+            subscribed = self.subscribed
+            if not subscribed:
+                await asyncio.sleep(0.01)
+                continue
+            stamp = _time_field(int(time.time() * 1000))
+            for _ in range(due):
+                identifier = subscribed[self.sent % len(subscribed)]
+                frames = self.frames.get(identifier)
+                if frames is None:
+                    frames = self.frames[identifier] = synthetic_frames(
+                        identifier, self.seed)
+                body = frames[turn % len(frames)] + stamp
+                await websocket.send(base64.b64encode(body).decode())
+                self.sent += 1
+                if self.sent % len(subscribed) == 0:
+                    turn += 1
+            await asyncio.sleep(0)
+
+async def _serve(host: str, port: int, frames: Dict[str, List[bytes]],
+                 seed: int, rate: float, limit: int, ready=None):
+    import websockets
+
+    server = await websockets.serve(
+        lambda websocket, *args: _Handler(frames, seed, rate, limit)(websocket),
+        host, port, compression=None)
+    port = server.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.send(port)
+    await asyncio.Future()
+
+def _run(host: str, port: int, symbols: int, seed: int, rate: float,
+         limit: int, ready=None):
+    frames = {identifier: synthetic_frames(identifier, seed)
+              for identifier in identifiers(symbols)}
+    # not asyncio.run, which requires Python 3.7+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            _serve(host, port, frames, seed, rate, limit, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+class Simulator:
+    """
+    Runs the simulated streamer in a separate process, so it does not take
+    CPU time from the process measured.
+
+        with Simulator(symbols=500, rate=20000) as simulator:
+            qs = QuoteStreamer(subscribe=simulator.identifiers)
+            ...
+    """
+
+    def __init__(self, symbols: int=100, rate: float=0, frames: int=None,
+                 seed: int=0, host: str="127.0.0.1", port: int=0):
+        """
+        Constructor method for Simulator.
+
+        Args:
+            symbols (int): number of identifiers served
+            rate (float): frames per second per connection, 0 sends as fast
+                as possible
+            frames (int): frames sent per connection, None sends forever
+            seed (int): random seed of the generated frames
+            host (str): address to listen on
+            port (int): port to listen on, 0 picks a free port
+        """
+        self.identifiers = identifiers(symbols)
+        self.rate = rate
+        self.frames = frames
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        return "ws://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_run, args=(self.host, self.port, len(self.identifiers),
+                               self.seed, self.rate, self.frames, sender),
+            daemon=True)
+        self._process.start()
+        sender.close()
+        if not receiver.poll(30):
+            self.stop()
+            raise RuntimeError("simulator did not start")
+        self.port = receiver.recv()
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1000)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Serving {} identifiers on ws://{}:{}".format(
+        args.symbols, args.host, args.port))
+    _run(args.host, args.port, args.symbols, args.seed, args.rate,
+         args.frames)
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,11 @@ setuptools.setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     install_requires=["websocket-client", "protobuf"],
+    extras_require={
+        "numpy": ["numpy"],
+        "asyncio": ["websockets"],
+        "parquet": ["numpy", "pyarrow"],
+    },
     packages=setuptools.find_packages(exclude="tests"),
     include_package_data=True,
     python_requires=">=3.6"
@@ -0,0 +1,91 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local websocket server standing in for Yahoo! Finance in tests.
+"""
+
+import asyncio
+import base64
+import json
+import threading
+
+import websockets
+
+from yflive.yfquote_pb2 import YFQuote
+
+def frame(identifier: str, **fields) -> str:
+    yfquote = YFQuote(identifier=identifier, **fields)
+    return base64.b64encode(yfquote.SerializeToString()).decode()
+
+class StandIn:
+    """
+    Runs a websocket server on a background event loop.
+
+    Every request received is recorded in requests. For each subscribed 
+    identifier, ticks frames are sent back. After close_after requests on a
+    connection, the server drops that connection.
+    """
+
+    def __init__(self, ticks: int=1, close_after: int=None):
+        self.ticks = ticks
+        self.close_after = close_after
+        self.requests = []
+        self.connections = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self._loop.run_forever, 
+                                        daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            self._serve(), self._loop).result()
+        return self
+
+    def __exit__(self, *args):
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    @property
+    def url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]
+        return "ws://127.0.0.1:{}".format(port)
+
+    async def _serve(self):
+        return await websockets.serve(self._handler, "127.0.0.1", 0, 
+                                     close_timeout=0.1)
+
+    async def _handler(self, websocket, *args):
+        self.connections += 1
+        handled = 0
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                self.requests.append(request)
+                for identifier in request.get("subscribe", []):
+                    for i in range(self.ticks):
+                        await websocket.send(frame(identifier, time=i + 1))
+                handled += 1
+                if self.close_after is not None \
+                        and handled >= self.close_after:
+                    await websocket.close()
+        except websockets.exceptions.ConnectionClosed:
+            pass
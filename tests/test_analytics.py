@@ -0,0 +1,123 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import math
+import random
+
+import numpy as np
+
+from yflive.analytics import METRICS, RollingAnalytics
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+class TestAnalytics(unittest.TestCase):
+    """"""
+
+    def quotes(self, n: int) -> list:
+        rng = random.Random(3)
+        quotes = []
+        volume = 0
+        price = 100.0
+        for i in range(n):
+            volume += rng.randint(0, 100)
+            price *= math.exp(rng.gauss(0, 0.001))
+            bid = price - rng.random()
+            quotes.append(Quote(identifier="AAPL", time=i * 100, price=price, 
+                                dayVolume=volume, bid=bid, 
+                                ask=bid + rng.random()))
+        return quotes
+
+    def expected(self, quotes: list) -> dict:
+        """Metrics over a window, recomputed from scratch."""
+        volumes = [b.dayVolume - a.dayVolume 
+                   for a, b in zip(quotes, quotes[1:])]
+        prices = [q.price for q in quotes[1:]]
+        spreads = np.array([q.ask - q.bid for q in quotes[1:]])
+        returns = [math.log(b.price / a.price) 
+                   for a, b in zip(quotes, quotes[1:])]
+        return {
+            "price": quotes[-1].price,
+            "vwap": sum(p * v for p, v in zip(prices, volumes)) / sum(volumes),
+            "spread": spreads.mean(),
+            "spread_std": spreads.std(),
+            "volatility": math.sqrt(sum(r * r for r in returns)),
+            "ticks": len(prices),
+        }
+
+    def assertMetrics(self, metrics: dict, expected: dict):
+        self.assertListEqual(list(metrics), list(METRICS))
+        for name in METRICS:
+            self.assertAlmostEqual(metrics[name], expected[name], places=6, 
+                                   msg=name)
+
+    def test_count_window(self):
+        quotes = self.quotes(5000)
+        analytics = RollingAnalytics(window=50)
+        for quote in quotes:
+            analytics.update(None, quote)
+        self.assertMetrics(analytics.get("AAPL"), self.expected(quotes[-51:]))
+        self.assertIsNone(analytics.get("TSLA"))
+
+    def test_duration_window(self):
+        quotes = self.quotes(3000)
+        qs = QuoteStreamer()
+        analytics = RollingAnalytics(duration=2.0, streamer=qs)
+        for quote in quotes:
+            qs.on_quote(qs, quote)
+        # 2s of quotes 100ms apart
+        self.assertMetrics(analytics.get("AAPL"), self.expected(quotes[-21:]))
+
+        # windows of quiet identifiers move with the latest quote time
+        analytics.update(None, Quote(identifier="TSLA", time=3000 * 100 + 1899,
+                                     price=1.0))
+        self.assertEqual(analytics.get("AAPL")["ticks"], 1)
+        analytics.update(None, Quote(identifier="TSLA", time=3000 * 100 + 2000,
+                                     price=1.0))
+        metrics = analytics.get("AAPL")
+        self.assertEqual(metrics["ticks"], 0)
+        self.assertTrue(math.isnan(metrics["vwap"]))
+        self.assertTrue(math.isnan(metrics["spread"]))
+        self.assertAlmostEqual(metrics["price"], quotes[-1].price)
+
+    def test_snapshot(self):
+        analytics = RollingAnalytics(window=10)
+        self.assertEqual(len(analytics.snapshot()["vwap"]), 0)
+
+        analytics.update(None, Quote(identifier="AAPL", time=1, price=10.0, 
+                                     dayVolume=10))
+        analytics.update(None, Quote(identifier="TSLA", time=1, bid=1.0, 
+                                     ask=1.5))
+        analytics.update(None, Quote(identifier="AAPL", time=2, price=20.0, 
+                                     dayVolume=15))
+        analytics.update(None, Quote(identifier="AAPL", time=3, price=10.0))
+        table = analytics.snapshot()
+
+        self.assertListEqual(table["identifier"].tolist(), ["AAPL", "TSLA"])
+        self.assertEqual(table["vwap"].dtype, np.float64)
+        self.assertEqual(table["ticks"].dtype, np.int64)
+        self.assertListEqual(table["vwap"].tolist()[:1], [20.0])
+        self.assertListEqual(table["ticks"].tolist(), [3, 0])
+        self.assertAlmostEqual(table["volatility"][0], 
+                               math.sqrt(2) * math.log(2))
+        self.assertTrue(np.isnan(table["spread"][0]))
+        self.assertEqual(table["spread"][1], 0.5)
+        self.assertEqual(table["spread_std"][1], 0.0)
+
+        with self.assertRaises(ValueError):
+            RollingAnalytics()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import asyncio
+
+from stand_in import StandIn
+
+from yflive.async_streamer import AsyncQuoteStreamer
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+class TestAsyncStreamer(unittest.TestCase):
+    """"""
+
+    def test_stream(self):
+        async def main(url):
+            quotes = []
+            async with AsyncQuoteStreamer(subscribe=["AAPL"], max_queue=4,
+                                          url=url) as streamer:
+                async for quote in streamer:
+                    quotes.append(quote)
+                    if len(quotes) == 50:
+                        await streamer.subscribe(["TSLA", "AAPL"])
+                    if len(quotes) == 100:
+                        await streamer.unsubscribe(["AAPL"])
+                        break
+                self.assertListEqual(streamer.subscribed, ["TSLA"])
+            return quotes
+
+        with StandIn(ticks=50) as stand_in:
+            quotes = _run(main(stand_in.url))
+
+        self.assertEqual([q.time for q in quotes[:50]], 
+                         [i + 1 for i in range(50)])
+        self.assertEqual({q.identifier for q in quotes[50:]}, {"TSLA"})
+        self.assertListEqual(stand_in.requests, [{"subscribe": ["AAPL"]}, 
+                                                 {"subscribe": ["TSLA"]},
+                                                 {"unsubscribe": ["AAPL"]}])
+
+    def test_server_close_ends_iteration(self):
+        async def main(url):
+            streamer = AsyncQuoteStreamer(subscribe=["AAPL"], url=url)
+            await streamer.start()
+            quotes = [quote async for quote in streamer]
+            await streamer.stop()
+            return quotes
+
+        with StandIn(ticks=1, close_after=1) as stand_in:
+            quotes = _run(main(stand_in.url))
+        self.assertEqual(len(quotes), 1)
+        self.assertEqual(quotes[0].identifier, "AAPL")
+
+    def test_stop_with_full_queue(self):
+        async def main(url):
+            quotes = []
+            async with AsyncQuoteStreamer(subscribe=["AAPL"], max_queue=2,
+                                          url=url) as streamer:
+                async for quote in streamer:
+                    quotes.append(quote)
+                    break
+                await asyncio.sleep(0.1)
+            return quotes
+
+        with StandIn(ticks=50) as stand_in:
+            quotes = _run(asyncio.wait_for(main(stand_in.url), 10))
+        self.assertEqual(len(quotes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
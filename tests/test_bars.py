@@ -0,0 +1,137 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import random
+import threading
+
+from yflive.bars import Bar, BarAggregator, backfill
+from yflive.columnar import QuoteColumns
+from yflive.quote import Quote
+
+def astuple(bar: Bar) -> tuple:
+    return tuple(getattr(bar, s) for s in Bar.__slots__)
+
+class TestBars(unittest.TestCase):
+    """"""
+
+    def test_bars(self):
+        bars = []
+        agg = BarAggregator(intervals=(1, 60), 
+                            on_bar=lambda a, b: bars.append(b))
+        quotes = [
+            Quote(identifier="AAPL", time=60000, price=10.0, dayVolume=100),
+            Quote(identifier="AAPL", time=60500, price=12.0, dayVolume=150),
+            Quote(identifier="TSLA", time=60600, price=700.0),
+            Quote(identifier="AAPL", time=60900, price=9.0, dayVolume=160),
+            Quote(identifier="AAPL", time=61200, price=11.0, dayVolume=200),
+            # new session, dayVolume starts over
+            Quote(identifier="AAPL", time=125000, price=13.0, dayVolume=30),
+        ]
+        for quote in quotes:
+            agg.update(None, quote)
+
+        self.assertListEqual([astuple(b) for b in bars], [
+            ("AAPL", 1, 60000, 10.0, 12.0, 9.0, 9.0, 60, 3),
+            ("AAPL", 1, 61000, 11.0, 11.0, 11.0, 11.0, 40, 1),
+            ("AAPL", 60, 60000, 10.0, 12.0, 9.0, 11.0, 100, 4),
+        ])
+        self.assertEqual(bars[2].end, 120000)
+
+        bars.clear()
+        self.assertListEqual([(b.identifier, b.interval) 
+                              for b in agg.flush(until=61000)], 
+                             [("TSLA", 1)])
+        agg.flush()
+        self.assertListEqual(sorted((b.identifier, b.interval, b.volume) 
+                                    for b in bars), 
+                             [("AAPL", 1, 30), ("AAPL", 60, 30), 
+                              ("TSLA", 1, 0), ("TSLA", 60, 0)])
+
+    def test_pending_volume(self):
+        agg = BarAggregator(intervals=(1,), on_bar=lambda a, b: None)
+        agg.update(None, Quote(identifier="AAPL", time=0, dayVolume=10))
+        agg.update(None, Quote(identifier="AAPL", time=1100, dayVolume=15))
+        agg.update(None, Quote(identifier="AAPL", time=1200, price=1.0, 
+                               dayVolume=17))
+        # volume of an interval without price is dropped
+        agg.update(None, Quote(identifier="AAPL", time=2100, dayVolume=20))
+        agg.update(None, Quote(identifier="AAPL", time=3100, price=2.0, 
+                               dayVolume=21))
+        bars = agg.flush()
+        self.assertEqual(len(bars), 1)
+        self.assertEqual(bars[0].volume, 1)
+        # the closed bar went to on_bar
+        self.assertEqual(agg._queue.qsize(), 0)
+
+    def test_iterator(self):
+        agg = BarAggregator(intervals=(1,))
+        received = []
+        thread = threading.Thread(target=lambda: received.extend(agg))
+        thread.start()
+        for t in range(5):
+            agg.update(None, Quote(identifier="AAPL", time=t * 1000, 
+                                   price=float(t)))
+        agg.close()
+        thread.join(5)
+        self.assertListEqual([b.start for b in received], 
+                             [0, 1000, 2000, 3000, 4000])
+
+    def test_backfill(self):
+        rng = random.Random(7)
+        quotes = []
+        volumes = {"AAPL": 0, "TSLA": 0, "MSFT": 0}
+        for t in range(0, 300000, 250):
+            identifier = rng.choice(list(volumes))
+            fields = {"identifier": identifier, "time": t}
+            if rng.random() < 0.8:
+                fields["price"] = float(rng.randint(1, 1000))
+            if rng.random() < 0.9:
+                volumes[identifier] += rng.randint(0, 50)
+                if rng.random() < 0.01:
+                    volumes[identifier] = rng.randint(0, 50)
+                fields["dayVolume"] = volumes[identifier]
+            quotes.append(Quote(**fields))
+
+        streamed = []
+        agg = BarAggregator(intervals=(1, 60), 
+                            on_bar=lambda a, b: streamed.append(b))
+        for quote in quotes:
+            agg.update(None, quote)
+        agg.flush()
+
+        cols = QuoteColumns(fields=["identifier", "time", "price", 
+                                    "dayVolume"])
+        # order of the recording does not matter
+        for quote in reversed(quotes):
+            cols.append(quote)
+        result = agg.backfill(cols.flush(), cols.strings("identifier"))
+
+        for interval in (1, 60):
+            columns = result[interval]
+            computed = sorted(zip(*(columns[name].tolist() for name in (
+                "identifier", "start", "open", "high", "low", "close", 
+                "volume", "count"))))
+            expected = sorted((astuple(b)[:1] + astuple(b)[2:] 
+                               for b in streamed if b.interval == interval))
+            self.assertGreater(len(expected), 10)
+            self.assertListEqual(computed, expected)
+
+        empty = QuoteColumns(fields=["identifier", "time", "price", 
+                                     "dayVolume"])
+        self.assertEqual(len(backfill(empty.flush(), [])[60]["start"]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import base64
+import threading
+
+import numpy as np
+
+from yflive.columnar import QuoteColumns
+from yflive.streamer import QuoteStreamer
+from yflive._reader import _QuoteReader
+from yflive.yfquote_pb2 import YFQuote
+
+TSLA = "CgRUU0xBFR8FKUQYoMyD1ZVeKgNOTVMwCDgBRSLND8BIpvnwDmXAo3jB2AEE"
+AAPL = base64.b64encode(YFQuote(identifier="AAPL", price=130.5, bid=130.25, 
+                                ask=130.75).SerializeToString()).decode()
+
+class TestColumnar(unittest.TestCase):
+    """"""
+
+    def test_dtypes(self):
+        cols = QuoteColumns(chunk_size=2)
+        cols.append_message(TSLA)
+        view = cols.view()
+
+        self.assertEqual(view["price"].dtype, np.float32)
+        self.assertEqual(view["time"].dtype, np.int64)
+        self.assertEqual(view["dayVolume"].dtype, np.int64)
+        self.assertEqual(view["marketCap"].dtype, np.float64)
+        self.assertEqual(view["identifier"].dtype, np.int32)
+        self.assertEqual(view["_present"].dtype, np.uint64)
+
+    def test_append_and_flush(self):
+        cols = QuoteColumns(chunk_size=2)
+        cols.extend_messages([TSLA, AAPL, TSLA])
+        cols.append(_QuoteReader.parse(AAPL))
+        self.assertEqual(len(cols), 4)
+
+        # grown geometrically from chunk_size
+        self.assertEqual(cols._capacity, 4)
+        batch = cols.flush()
+        self.assertEqual(len(cols), 0)
+        self.assertListEqual(batch["identifier"].tolist(), [0, 1, 0, 1])
+        self.assertListEqual(cols.strings("identifier"), ["TSLA", "AAPL"])
+        self.assertEqual(batch["time"][0], 1617815434000)
+        self.assertEqual(batch["dayVolume"][0], 15605331)
+        self.assertAlmostEqual(float(batch["price"][1]), 130.5)
+
+        # absent fields
+        self.assertTrue(np.isnan(batch["bid"][0]))
+        self.assertEqual(batch["exchange"][1], -1)
+        self.assertEqual(batch["time"][1], 0)
+        self.assertEqual(int(batch["_present"][1]), 1 | 2 | 1 << 22 | 1 << 24)
+
+        # flushed views are not overwritten by later rows
+        cols.append_message(AAPL)
+        self.assertEqual(batch["identifier"][0], 0)
+        self.assertEqual(cols.flush()["identifier"].tolist(), [1])
+
+    def test_projection(self):
+        cols = QuoteColumns(fields=["identifier", "price"])
+        cols.append_message(TSLA)
+        self.assertSetEqual(set(cols.view()), 
+                            {"identifier", "price", "_present"})
+
+        with self.assertRaises(ValueError):
+            QuoteColumns(fields=["identifier", "unknown"])
+
+    def test_concurrent_append(self):
+        cols = QuoteColumns()
+        msgs = [base64.b64encode(YFQuote(identifier="ID{}".format(i % 100), 
+                                         price=i % 100 + 1).SerializeToString())
+                for i in range(5000)]
+
+        threads = [threading.Thread(target=lambda: [cols.append_message(m) 
+                                                    for m in msgs])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        batch = cols.flush()
+        identifiers = cols.strings("identifier")
+        self.assertEqual(len(batch["price"]), 20000)
+        for identifier, price in zip(batch["identifier"], batch["price"]):
+            self.assertEqual(identifiers[identifier], 
+                             "ID{}".format(int(price) - 1))
+
+    def test_streamer_sink(self):
+        cols = QuoteColumns()
+        qs = QuoteStreamer(sink=cols)
+        qs._ws_message(None, TSLA)
+        self.assertEqual(len(cols), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+
+from yflive.conflate import ConflatingDispatcher
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+class TestConflate(unittest.TestCase):
+    """"""
+
+    def test_merge_and_flush(self):
+        delivered = []
+        conflater = ConflatingDispatcher(
+            on_quote=lambda c, q: delivered.append(q))
+
+        conflater.update(None, Quote(identifier="AAPL", price=1.0, bid=0.5))
+        conflater.update(None, Quote(identifier="TSLA", price=7.0))
+        conflater.update(None, Quote(identifier="AAPL", price=2.0))
+        conflater.update(None, Quote(identifier="AAPL", ask=2.5))
+
+        quotes = conflater.flush()
+        self.assertListEqual([q.identifier for q in quotes], ["AAPL", "TSLA"])
+        self.assertDictEqual(quotes[0]._raw, {"identifier": "AAPL", 
+                                              "price": 2.0, "bid": 0.5, 
+                                              "ask": 2.5})
+        self.assertEqual(len(delivered), 2)
+        self.assertEqual(conflater.conflated, 2)
+
+        # nothing changed since
+        self.assertListEqual(conflater.flush(), [])
+
+        conflater.update(None, Quote(identifier="TSLA", bid=6.5))
+        self.assertDictEqual(conflater.flush()[0]._raw, 
+                             {"identifier": "TSLA", "price": 7.0, "bid": 6.5})
+        self.assertEqual(conflater.latest("AAPL").price, 2.0)
+        self.assertIsNone(conflater.latest("MSFT"))
+        self.assertSetEqual(set(conflater.snapshot()), {"AAPL", "TSLA"})
+
+    def test_timed_delivery(self):
+        delivered = threading.Event()
+        qs = QuoteStreamer()
+        conflater = ConflatingDispatcher(
+            on_quote=lambda c, q: delivered.set(), interval=0.01, streamer=qs)
+        self.assertEqual(qs.on_quote, conflater.update)
+
+        conflater.start()
+        qs._callback(qs.on_quote, Quote(identifier="AAPL", price=1.0))
+        self.assertTrue(delivered.wait(5))
+        conflater.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
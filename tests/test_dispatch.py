@@ -0,0 +1,99 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import base64
+import threading
+
+from yflive._dispatch import _Dispatcher, _RingBuffer
+from yflive.enums import OverflowPolicy
+from yflive.streamer import QuoteStreamer
+from yflive.yfquote_pb2 import YFQuote
+
+def _frame(identifier: str, time: int) -> str:
+    yfquote = YFQuote(identifier=identifier, time=time)
+    return base64.b64encode(yfquote.SerializeToString()).decode()
+
+class TestDispatch(unittest.TestCase):
+    """"""
+
+    def test_overflow_policies(self):
+        buf = _RingBuffer(2, OverflowPolicy.DROP_NEWEST)
+        self.assertListEqual([buf.put(i) for i in range(4)], 
+                             [True, True, False, False])
+        self.assertListEqual([buf.get(), buf.get()], [0, 1])
+        self.assertEqual(buf.dropped, 2)
+
+        buf = _RingBuffer(2, OverflowPolicy.DROP_OLDEST)
+        for i in range(4):
+            buf.put(i)
+        self.assertListEqual([buf.get(), buf.get()], [2, 3])
+        self.assertEqual(buf.dropped, 2)
+
+    def test_block(self):
+        buf = _RingBuffer(1, OverflowPolicy.BLOCK)
+        buf.put(0)
+        producer = threading.Thread(target=buf.put, args=(1,))
+        producer.start()
+        producer.join(0.05)
+        self.assertTrue(producer.is_alive())
+
+        self.assertEqual(buf.get(), 0)
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(buf.get(), 1)
+        self.assertEqual(buf.dropped, 0)
+
+        buf.close()
+        with self.assertRaises(IndexError):
+            buf.get()
+
+    def test_per_identifier_order(self):
+        received = []
+        lock = threading.Lock()
+
+        def on_quote(qs, quote):
+            with lock:
+                received.append((quote.identifier, quote.time))
+
+        qs = QuoteStreamer(on_quote=on_quote, workers=4, queue_size=8)
+        qs._dispatcher = _Dispatcher(qs._handle_message, 4, 8)
+        qs._dispatcher.start()
+
+        identifiers = ["AAPL", "TSLA", "MSFT", "BTC-USD", "EURUSD=X"]
+        for t in range(1, 201):
+            for identifier in identifiers:
+                qs._ws_message(None, _frame(identifier, t))
+        qs._dispatcher.stop()
+
+        self.assertEqual(len(received), 1000)
+        self.assertEqual(qs.dropped, 0)
+        for identifier in identifiers:
+            times = [t for i, t in received if i == identifier]
+            self.assertListEqual(times, list(range(1, 201)))
+
+    def test_handler_errors(self):
+        errors = []
+        dispatcher = _Dispatcher(lambda m: 1 / 0, 1, 4, 
+                                 on_error=errors.append)
+        dispatcher.start()
+        dispatcher.put(_frame("AAPL", 1))
+        dispatcher.stop()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from unittest import mock
+
+from stand_in import StandIn
+
+from yflive.hub import HubClient, QuoteHub
+from yflive.quote import Quote
+
+class Upstream:
+    """Records subscription changes instead of connecting."""
+
+    def __init__(self):
+        self.on_quote = None
+        self.requests = []
+
+    def start(self, should_thread: bool=False):
+        pass
+
+    def stop(self):
+        pass
+
+    def subscribe(self, identifiers):
+        self.requests.append(("subscribe", sorted(identifiers)))
+
+    def unsubscribe(self, identifiers):
+        self.requests.append(("unsubscribe", sorted(identifiers)))
+
+def wait_for(condition, timeout: float=5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"),
+                     "hub requires Unix domain sockets")
+class TestHub(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "hub.sock")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def client(self, subscribe: list) -> tuple:
+        received = []
+        client = HubClient(self.path, subscribe=subscribe, 
+                           on_quote=lambda c, q: received.append(q))
+        client.start(should_thread=True)
+        return client, received
+
+    def test_fan_out(self):
+        upstream = Upstream()
+        hub = QuoteHub(self.path, streamer=upstream)
+        hub.start(should_thread=True)
+
+        a, received_a = self.client(["AAPL", "TSLA"])
+        b, received_b = self.client(["TSLA"])
+        self.assertTrue(wait_for(lambda: hub.subscribed == {"AAPL": 1, 
+                                                            "TSLA": 2}))
+        self.assertEqual(hub.clients, 2)
+
+        for t in range(1, 101):
+            for identifier in ["AAPL", "TSLA", "MSFT"]:
+                upstream.on_quote(upstream, Quote(identifier=identifier, 
+                                                  time=t, marketState=0))
+        self.assertTrue(wait_for(lambda: len(received_a) == 200 
+                                 and len(received_b) == 100))
+        self.assertListEqual([q.time for q in received_b], 
+                             list(range(1, 101)))
+        self.assertDictEqual(received_a[0]._raw, {"identifier": "AAPL", 
+                                                  "time": 1, 
+                                                  "marketState": 0})
+
+        # upstream only changes for the first and last client
+        b.unsubscribe(["TSLA"])
+        a.unsubscribe(["AAPL"])
+        self.assertTrue(wait_for(lambda: hub.subscribed == {"TSLA": 1}))
+        b.subscribe(["AAPL"])
+        self.assertTrue(wait_for(
+            lambda: hub.subscribed == {"TSLA": 1, "AAPL": 1}))
+        a.stop()
+        b.stop()
+        self.assertTrue(wait_for(lambda: hub.clients == 0))
+        self.assertDictEqual(hub.subscribed, {})
+        hub.stop()
+
+        self.assertListEqual(upstream.requests[:3], [
+            ("subscribe", ["AAPL", "TSLA"]), ("unsubscribe", ["AAPL"]), 
+            ("subscribe", ["AAPL"])])
+        self.assertCountEqual(upstream.requests[3:], [
+            ("unsubscribe", ["TSLA"]), ("unsubscribe", ["AAPL"])])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_slow_client(self):
+        upstream = Upstream()
+        hub = QuoteHub(self.path, streamer=upstream, queue_size=8)
+        hub.start(should_thread=True)
+        client, received = self.client(["AAPL"])
+        self.assertTrue(wait_for(lambda: hub.subscribed == {"AAPL": 1}))
+
+        blocked = threading.Event()
+        client.on_quote = lambda c, q: blocked.wait(5)
+        for t in range(1, 100001):
+            upstream.on_quote(upstream, Quote(identifier="AAPL", time=t))
+            if hub.dropped > 0:
+                break
+        # the upstream thread is never held up by a full client
+        self.assertGreater(hub.dropped, 0)
+        blocked.set()
+        client.stop()
+        hub.stop()
+
+    def test_upstream(self):
+        received = []
+        with StandIn(ticks=3) as stand_in, \
+                mock.patch("yflive.streamer.YAHOO_FINANCE_SOCKET", 
+                           stand_in.url):
+            hub = QuoteHub(self.path)
+            hub.start(should_thread=True)
+            client, received = self.client(["AAPL"])
+            self.assertTrue(wait_for(lambda: len(received) == 3))
+            client.stop()
+            hub.stop()
+
+        self.assertListEqual([q.time for q in received], [1, 2, 3])
+        self.assertIn({"subscribe": ["AAPL"]}, stand_in.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import time
+import urllib.error
+import urllib.request
+
+from stand_in import frame
+
+from yflive.metrics import _Histogram
+from yflive.streamer import QuoteStreamer
+
+class TestMetrics(unittest.TestCase):
+    """"""
+
+    def test_histogram(self):
+        histogram = _Histogram((1.0, 2.0, 5.0))
+        for value in (0.5, 1.0, 1.5, 3.0, 10.0):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 5)
+        self.assertEqual(snapshot["sum"], 16.0)
+        self.assertListEqual(list(snapshot["buckets"].values()), [2, 3, 4, 5])
+        self.assertEqual(snapshot["p50"], 2.0)
+        self.assertEqual(snapshot["p99"], float("inf"))
+        self.assertIsNone(_Histogram((1.0,)).quantile(0.5))
+
+    def test_snapshot(self):
+        now = int(time.time() * 1000)
+        qs = QuoteStreamer(on_quote=lambda qs, q: None, metrics=True)
+        msgs = [frame("AAPL", time=now - 2000, price=1.0),
+                frame("AAPL", time=now - 2000, price=1.1),
+                frame("TSLA", time=now - 2000, price=2.0)]
+        for msg in msgs:
+            qs._ws_message(None, msg)
+
+        snapshot = qs.metrics.snapshot()
+        self.assertEqual(snapshot["frames"], 3)
+        self.assertEqual(snapshot["bytes"], sum(len(m) for m in msgs))
+        self.assertGreater(snapshot["frame_rate"], 0)
+        self.assertEqual(snapshot["decode"]["count"], 3)
+        self.assertEqual(snapshot["callback"]["count"], 3)
+        self.assertEqual(snapshot["latency"]["p50"], 2.5)
+        self.assertDictEqual(snapshot["ticks"], {"AAPL": 2, "TSLA": 1})
+        self.assertEqual(snapshot["reconnects"], 0)
+        self.assertDictEqual(snapshot["queue_depths"], {})
+
+        # rates are measured since the previous snapshot
+        snapshot = qs.metrics.snapshot()
+        self.assertEqual(snapshot["frame_rate"], 0.0)
+        self.assertDictEqual(snapshot["tick_rates"], 
+                             {"AAPL": 0.0, "TSLA": 0.0})
+
+        self.assertIsNone(QuoteStreamer().metrics)
+
+    def test_prometheus(self):
+        qs = QuoteStreamer(metrics=True)
+        qs.batches()
+        qs._ws_message(None, frame('A"B', time=1, price=1.0))
+        port = qs.metrics.serve(port=0)
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(port)
+            with urllib.request.urlopen(url) as response:
+                self.assertIn("text/plain", response.headers["Content-Type"])
+                text = response.read().decode("utf-8")
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url[:-len("metrics")])
+        finally:
+            qs.metrics.close()
+
+        lines = text.splitlines()
+        self.assertIn("# TYPE yflive_frames_total counter", lines)
+        self.assertIn("yflive_frames_total 1", lines)
+        self.assertIn('yflive_decode_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('yflive_decode_seconds_count 1', lines)
+        self.assertIn('yflive_queue_depth{queue="iteration"} 1', lines)
+        self.assertIn('yflive_ticks_total{identifier="A\\"B"} 1', lines)
+        self.assertIn("yflive_reconnects_total 0", lines)
+        self.assertIn("yflive_dropped_total 0", lines)
+        for line in lines:
+            if not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1])
+
+if __name__ == '__main__':
+    unittest.main()
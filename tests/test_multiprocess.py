@@ -0,0 +1,136 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+
+from stand_in import frame
+
+from yflive._reader import _Projection
+from yflive.enums import OverflowPolicy
+
+try:
+    from yflive._multiprocess import _ProcessDispatcher, _SharedRing
+except ImportError:
+    # multiprocessing.shared_memory requires Python 3.8+
+    _SharedRing = None
+
+@unittest.skipIf(_SharedRing is None, "requires Python 3.8+")
+class TestMultiprocess(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.ring = _SharedRing(64)
+
+    def tearDown(self):
+        self.ring.close()
+        self.ring.unlink()
+
+    def test_ring_wrap_around(self):
+        attached = _SharedRing(name=self.ring.name)
+        records = [bytes([i]) * (i % 23 + 1) for i in range(200)]
+        received = []
+        for record in records:
+            while not self.ring.put(record):
+                received.append(attached.get())
+        while len(self.ring) > 0:
+            received.append(attached.get())
+        attached.close()
+
+        self.assertListEqual(received, records)
+        self.assertIsNone(self.ring.get())
+
+    def test_ring_full(self):
+        self.assertTrue(self.ring.put(b"x" * 28))
+        self.assertTrue(self.ring.put(b"x" * 28))
+        self.assertFalse(self.ring.put(b"x"))
+        with self.assertRaises(ValueError):
+            self.ring.put(b"x" * 29)
+        self.assertEqual(self.ring.get(), b"x" * 28)
+        self.assertTrue(self.ring.put(b"x" * 28))
+
+    def test_ring_skip(self):
+        for _ in range(2):
+            self.assertTrue(self.ring.put(b"x" * 20))
+            self.assertEqual(self.ring.get(), b"x" * 20)
+        # does not fit before the end, skip and record are written at once
+        self.assertTrue(self.ring.put(b"y" * 28))
+        self.assertEqual(self.ring.get(), b"y" * 28)
+        self.assertEqual(len(self.ring), 0)
+
+    def test_process_dispatcher(self):
+        received = []
+        errors = []
+        dispatcher = _ProcessDispatcher(received.append, 2, 4096, 
+                                        on_error=errors.append, batch_size=16)
+        dispatcher.start()
+        identifiers = ["AAPL", "TSLA", "MSFT", "BTC-USD"]
+        for t in range(1, 301):
+            for identifier in identifiers:
+                dispatcher.put(frame(identifier, time=t))
+        dispatcher.put("not a frame")
+        dispatcher.stop()
+
+        self.assertEqual(len(received), 1200)
+        self.assertEqual(len(errors), 1)
+        for identifier in identifiers:
+            times = [q.time for q in received if q.identifier == identifier]
+            self.assertListEqual(times, list(range(1, 301)))
+
+    def test_projection(self):
+        received = []
+        projection = _Projection(fields=["identifier", "time"], 
+                                 where={"identifier": ["AAPL", "MSFT"]})
+        dispatcher = _ProcessDispatcher(received.append, 2, 4096, 
+                                        projection=projection)
+        dispatcher.start()
+        for t in range(1, 101):
+            for identifier in ["AAPL", "TSLA", "MSFT"]:
+                dispatcher.put(frame(identifier, time=t, price=1.0))
+        dispatcher.stop()
+
+        self.assertEqual(len(received), 200)
+        self.assertSetEqual({tuple(q._raw) for q in received}, 
+                            {("identifier", "time")})
+        self.assertListEqual([q.time for q in received 
+                              if q.identifier == "MSFT"], list(range(1, 101)))
+
+    def test_dispatcher_wrap_around(self):
+        received = []
+        errors = []
+        dispatcher = _ProcessDispatcher(received.append, 1, 512,
+                                        on_error=errors.append)
+        dispatcher.start()
+        # messages of up to the maximum size, wrapping around at every offset
+        frames = [frame("AAPL", time=t, shortName="x" * (t * 7 % 130))
+                  for t in range(1, 401)]
+        self.assertTrue(all(len(f) <= 252 for f in frames))
+        sender = threading.Thread(
+            target=lambda: [dispatcher.put(f) for f in frames], daemon=True)
+        sender.start()
+        sender.join(30)
+        self.assertFalse(sender.is_alive())
+        dispatcher.put("x" * 253)
+        dispatcher.stop()
+
+        self.assertListEqual([q.time for q in received], list(range(1, 401)))
+        self.assertEqual(len(errors), 1)
+
+    def test_drop_newest(self):
+        with self.assertRaises(ValueError):
+            _ProcessDispatcher(None, 1, 64, OverflowPolicy.DROP_OLDEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+from stand_in import frame
+
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from yflive.parquet import ParquetSink, quote_schema
+except ImportError:
+    # parquet extra
+    pa = None
+
+@unittest.skipIf(pa is None, "requires pyarrow")
+class TestParquet(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "quotes.parquet")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_schema(self):
+        schema = quote_schema()
+        self.assertListEqual(schema.names, Quote.__fields__)
+        self.assertEqual(schema.field("identifier").type, 
+                         pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(schema.field("shortName").type, pa.string())
+        self.assertEqual(schema.field("price").type, pa.float32())
+        self.assertEqual(schema.field("marketCap").type, pa.float64())
+        self.assertEqual(schema.field("time").type, pa.int64())
+        self.assertEqual(schema.field("marketState").type, pa.int32())
+        self.assertTrue(all(f.nullable for f in schema))
+
+    def test_row_groups(self):
+        with ParquetSink(self.path, row_group_size=4) as sink:
+            qs = QuoteStreamer(sink=sink)
+            for i in range(10):
+                qs._ws_message(None, frame("SYM{}".format(i % 2), time=i + 1,
+                                           price=float(i), exchange="NMS"))
+            sink.append(Quote(identifier="AAPL", shortName="Apple", 
+                              marketState=0))
+            self.assertEqual(sink.row_groups, 2)
+            self.assertEqual(len(sink), 3)
+
+        f = pq.ParquetFile(self.path)
+        self.assertEqual(f.metadata.num_row_groups, 3)
+        self.assertEqual(f.metadata.num_rows, 11)
+
+        table = f.read()
+        self.assertListEqual(table.column("identifier").to_pylist(), 
+                             ["SYM0", "SYM1"] * 5 + ["AAPL"])
+        self.assertListEqual(table.column("time").to_pylist(), 
+                             list(range(1, 11)) + [None])
+        # absent fields are null, also if proto3 defaults were sent
+        self.assertListEqual(table.column("price").to_pylist()[:3], 
+                             [None, 1.0, 2.0])
+        self.assertListEqual(table.column("marketState").to_pylist(), 
+                             [None] * 10 + [0])
+        self.assertListEqual(table.column("shortName").to_pylist(), 
+                             [None] * 10 + ["Apple"])
+        self.assertListEqual(table.column("exchange").to_pylist(), 
+                             ["NMS"] * 10 + [None])
+        self.assertTrue(pa.types.is_dictionary(
+            table.schema.field("exchange").type))
+
+    def test_fields(self):
+        with ParquetSink(self.path, fields=["identifier", "bid"]) as sink:
+            sink.append(Quote(identifier="AAPL", bid=1.5, ask=2.0))
+            batch = sink.record_batch()
+            self.assertListEqual(batch.schema.names, ["identifier", "bid"])
+            self.assertEqual(batch.num_rows, 1)
+        self.assertListEqual(pq.read_table(self.path).to_pylist(), 
+                             [{"identifier": "AAPL", "bid": 1.5}])
+
+        with self.assertRaises(ValueError):
+            ParquetSink(self.path, fields=["nope"])
+
+    def test_flush_interval(self):
+        sink = ParquetSink(self.path, flush_interval=0.01)
+        sink.append(Quote(identifier="AAPL", bid=1.5))
+        deadline = time.monotonic() + 5
+        while sink.row_groups == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sink.row_groups, 1)
+        sink.close()
+        self.assertEqual(pq.ParquetFile(self.path).metadata.num_rows, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
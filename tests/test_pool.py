@@ -0,0 +1,100 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+
+from unittest import mock
+
+from stand_in import StandIn
+
+from yflive.pool import QuoteStreamerPool, _HashRing
+
+IDENTIFIERS = ["SYM{}".format(i) for i in range(40)]
+
+class TestPool(unittest.TestCase):
+    """"""
+
+    def test_hash_ring(self):
+        ring = _HashRing(4)
+        for identifier in IDENTIFIERS:
+            shards = list(ring.walk(identifier))
+            self.assertListEqual(sorted(shards), [0, 1, 2, 3])
+            self.assertListEqual(shards, list(_HashRing(4).walk(identifier)))
+
+    def test_bounded_load(self):
+        pool = QuoteStreamerPool(shards=4, subscribe=IDENTIFIERS, 
+                                 load_factor=1.25)
+        loads = [s["identifiers"] for s in pool.stats()]
+        self.assertEqual(sum(loads), 40)
+        self.assertLessEqual(max(loads), 13)
+        for shard, streamer in enumerate(pool.shards):
+            for identifier in streamer.subscribed:
+                self.assertEqual(pool.shard_of(identifier), shard)
+
+        # unsubscribing a whole shard leaves others above the new bound
+        busiest = max(range(4), key=lambda s: loads[s])
+        pool.unsubscribe([i for i in IDENTIFIERS 
+                          if pool.shard_of(i) != busiest][:20])
+        loads = [len(s.subscribed) for s in pool.shards]
+        self.assertEqual(sum(loads), 20)
+        self.assertLessEqual(max(loads), 7)
+        self.assertSetEqual(set(pool.subscribed), 
+                            {i for s in pool.shards for i in s.subscribed})
+
+    def test_merged_stream(self):
+        received = []
+        done = threading.Event()
+
+        def on_quote(pool, quote):
+            received.append(quote.identifier)
+            if len(received) == 40:
+                done.set()
+
+        with StandIn(ticks=1) as stand_in, \
+                mock.patch("yflive.streamer.YAHOO_FINANCE_SOCKET", stand_in.url):
+            pool = QuoteStreamerPool(shards=3, subscribe=IDENTIFIERS, 
+                                     on_quote=on_quote)
+            pool.start(should_thread=True)
+            self.assertTrue(done.wait(5))
+            stats = pool.stats()
+            pool.stop()
+
+        self.assertEqual(stand_in.connections, 3)
+        self.assertListEqual(sorted(received), sorted(IDENTIFIERS))
+        self.assertEqual(sum(s["messages"] for s in stats), 40)
+        self.assertListEqual([s["messages"] for s in stats], 
+                             [s["identifiers"] for s in stats])
+
+    def test_iterate(self):
+        quotes = []
+        with StandIn(ticks=2) as stand_in, \
+                mock.patch("yflive.streamer.YAHOO_FINANCE_SOCKET", stand_in.url):
+            pool = QuoteStreamerPool(shards=2, subscribe=IDENTIFIERS[:5], 
+                                     queue_size=2)
+            iterator = iter(pool)
+            pool.start(should_thread=True)
+            for quote in iterator:
+                quotes.append(quote)
+                if len(quotes) == 10:
+                    break
+            pool.stop()
+
+        self.assertEqual(len(quotes), 10)
+        self.assertSetEqual({q.identifier for q in quotes}, 
+                            set(IDENTIFIERS[:5]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import pickle
+
+from yflive.quote import Quote
+
+from yflive.enums.market_state import MarketState
+from yflive.enums.option_type import OptionType
+from yflive.enums.quote_type import QuoteType
+
+class TestQuote(unittest.TestCase):
+    """"""
+
+    def test_attributes(self):
+        quote = Quote(identifier="AAPL", price=130.5, quoteType=8, 
+                      marketState=0, optionType=1)
+
+        self.assertEqual(quote.identifier, "AAPL")
+        self.assertEqual(quote.price, 130.5)
+        self.assertIsNone(quote.bid)
+        self.assertEqual(quote.quoteType, QuoteType.EQUITY)
+        self.assertIs(quote.quoteType, quote.quoteType)
+        self.assertEqual(quote.marketState, MarketState.PRE)
+        self.assertEqual(quote.optionType, OptionType.PUT)
+
+        with self.assertRaises(ValueError):
+            quote.unknown
+        with self.assertRaises(TypeError):
+            Quote(unknown=1)
+
+    def test_raw(self):
+        raw = {"identifier": "AAPL", "quoteType": 8, "bid": 1.5}
+        quote = Quote(**raw)
+        quote.quoteType
+
+        self.assertDictEqual(quote._raw, raw)
+        self.assertDictEqual(pickle.loads(pickle.dumps(quote))._raw, raw)
+
+    def test_compact(self):
+        quote = Quote(identifier="AAPL")
+
+        self.assertFalse(hasattr(quote, "__dict__"))
+        self.assertEqual(quote._uuid, quote._uuid)
+        self.assertNotEqual(quote._uuid, Quote()._uuid)
+
+
+if __name__ == '__main__':
+    unittest.main()
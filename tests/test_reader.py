@@ -13,8 +13,12 @@
 # limitations under the License.
 
 import unittest
+import base64
 
-from yflive._reader import _QuoteReader
+from google.protobuf.message import DecodeError
+
+from yflive._reader import _Projection, _QuoteReader, parse_quotes
+from yflive.yfquote_pb2 import YFQuote
 
 from yflive.enums.market_state import MarketState
 from yflive.enums.quote_type import QuoteType
@@ -48,6 +52,96 @@ class TestReader(unittest.TestCase):
         self.assertAlmostEqual(quote.change, -15.53997802734375)
         self.assertAlmostEqual(quote.changePercent, -2.2468953132629395)
 
+    def test_available_fields_all_wire_types(self):
+        yfquote = YFQuote(identifier="BTC-USD", price=1.5, time=-3, 
+                          quoteType=41, dayVolume=2**40, lastMarket="x" * 300, 
+                          circulatingSupply=2.5, marketCap=1e12)
+        msg = base64.b64encode(yfquote.SerializeToString()).decode()
+
+        self.assertListEqual(_QuoteReader.available_fields(msg), 
+                             ["identifier", "price", "time", "quoteType", 
+                              "dayVolume", "lastMarket", "circulatingSupply", 
+                              "marketCap"])
+
+        quote = _QuoteReader.parse(msg)
+        self.assertEqual(quote.dayVolume, 2**40)
+        self.assertEqual(quote.lastMarket, "x" * 300)
+        self.assertEqual(quote.marketCap, 1e12)
+        self.assertIsNone(quote.bid)
+
+    def test_parse_explicit_default(self):
+        # marketState PRE (0) sent explicitly must not be dropped
+        msg = base64.b64encode(b"\x0a\x04TSLA\x38\x00").decode()
+        quote = _QuoteReader.parse(msg)
+
+        self.assertEqual(quote.marketState, MarketState.PRE)
+        self.assertDictEqual(quote._raw, {"identifier": "TSLA", 
+                                          "marketState": 0})
+
+    def test_parse_many(self):
+        msgs = ["CgRUU0xBFR8FKUQYoMyD1ZVeKgNOTVMwCDgBRSLND8BIpvnwDmXAo3jB2AEE",
+                base64.b64encode(YFQuote(identifier="AAPL", 
+                                         bid=1.25).SerializeToString()),
+                base64.b64encode(b"\x0a\x04TSLA\x38\x00").decode()]
+        quotes = parse_quotes(iter(msgs))
+
+        self.assertEqual(len(quotes), 3)
+        for msg, quote in zip(msgs, quotes):
+            self.assertDictEqual(quote._raw, _QuoteReader.parse(msg)._raw)
+        self.assertListEqual(parse_quotes([]), [])
+
+    def test_projection(self):
+        yfquote = YFQuote(identifier="BTC-USD", price=1.5, time=-3, 
+                          quoteType=41, priceHint=-2, dayVolume=2**40, 
+                          lastMarket="x" * 300, shortName="Bitcoin", 
+                          circulatingSupply=2.5, marketCap=1e12)
+        msgs = [base64.b64encode(yfquote.SerializeToString()).decode(), 
+                "CgRUU0xBFR8FKUQYoMyD1ZVeKgNOTVMwCDgBRSLND8BIpvnwDmXAo3jB2AEE",
+                base64.b64encode(b"\x0a\x04TSLA\x38\x00").decode()]
+
+        # all fields decode like the protobuf runtime
+        for msg in msgs:
+            self.assertDictEqual(_QuoteReader.parse(msg, _Projection())._raw, 
+                                 _QuoteReader.parse(msg)._raw)
+
+        quotes = parse_quotes(msgs, fields=["identifier", "price", "time"])
+        self.assertDictEqual(quotes[0]._raw, {"identifier": "BTC-USD", 
+                                              "price": 1.5, "time": -3})
+        self.assertDictEqual(quotes[2]._raw, {"identifier": "TSLA"})
+
+        # filtered fields need not be projected, missing ones never match
+        quotes = parse_quotes(msgs, fields=["identifier"], 
+                              where={"quoteType": QuoteType.EQUITY})
+        self.assertListEqual([q._raw for q in quotes], [{"identifier": "TSLA"}])
+        quotes = parse_quotes(msgs, where={"marketState": [MarketState.PRE, 
+                                                           MarketState.POST]})
+        self.assertListEqual([q.identifier for q in quotes], ["TSLA"])
+        self.assertEqual(quotes[0].marketState, MarketState.PRE)
+        quotes = _QuoteReader.parse_many_bytes(
+            [base64.b64decode(msg) for msg in msgs], 
+            _Projection(where={"identifier": "BTC-USD"}))
+        self.assertEqual(quotes[0].priceHint, -2)
+        self.assertEqual(len(quotes), 1)
+
+        with self.assertRaises(ValueError):
+            _Projection(fields=["identifier", "nope"])
+        with self.assertRaises(DecodeError):
+            _QuoteReader.parse_bytes(yfquote.SerializeToString()[:-3], 
+                                     _Projection())
+
+    def test_peek_identifier(self):
+        msg = "CgRUU0xBFR8FKUQYoMyD1ZVeKgNOTVMwCDgBRSLND8BIpvnwDmXAo3jB2AEE"
+        self.assertEqual(_QuoteReader.peek_identifier(msg), "TSLA")
+
+        long_id = "X" * 40 + "=F"
+        msg = base64.b64encode(YFQuote(identifier=long_id, 
+                                       price=1.0).SerializeToString())
+        self.assertEqual(_QuoteReader.peek_identifier(msg), long_id)
+
+        # identifier not leading
+        msg = base64.b64encode(b"\x38\x01\x0a\x04TSLA")
+        self.assertEqual(_QuoteReader.peek_identifier(msg), "TSLA")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,164 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+from stand_in import frame
+
+from yflive._reader import _QuoteReader
+from yflive.quote import Quote
+from yflive.recorder import TickReader, TickRecorder, TickReplayer
+from yflive.streamer import QuoteStreamer
+
+class TestRecorder(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, n: int, segment_size: int=256, 
+               index_interval: int=256) -> list:
+        msgs = [frame("SYM{}".format(i % 3), time=i + 1, price=float(i + 1)) 
+                for i in range(n)]
+        with TickRecorder(self.directory, segment_size=segment_size, 
+                          index_interval=index_interval) as rec:
+            for i, msg in enumerate(msgs):
+                rec.append_message(msg, timestamp=i * 1000000)
+        return msgs
+
+    def test_segments(self):
+        self.record(50)
+        reader = TickReader(self.directory)
+        self.assertGreater(len(reader.segments), 1)
+        for segment in reader.segments:
+            self.assertLessEqual(os.path.getsize(segment), 256 + 40)
+
+        records = list(reader.records())
+        self.assertListEqual([t for t, _ in records], 
+                             [i * 1000000 for i in range(50)])
+
+        # recording continues in a new segment
+        with TickRecorder(self.directory) as rec:
+            qs = QuoteStreamer(sink=rec)
+            qs._ws_message(None, frame("TSLA", time=1))
+            rec.append(Quote(identifier="AAPL", bid=1.5))
+            self.assertTrue(rec.path.endswith(
+                "-{:06d}.yft".format(len(reader.segments))))
+        quotes = list(TickReader(self.directory))
+        self.assertEqual(len(quotes), 52)
+        self.assertDictEqual(quotes[-2]._raw, {"identifier": "TSLA", 
+                                               "time": 1})
+        self.assertDictEqual(quotes[-1]._raw, {"identifier": "AAPL", 
+                                               "bid": 1.5})
+
+    def test_append_defaults(self):
+        # fields holding default values are recorded as well
+        fields = {"identifier": "AAPL", "price": 1.5, "time": -5, 
+                  "marketState": 0, "changePercent": 0.0, "dayVolume": 0,
+                  "miniOption": -1, "shortName": ""}
+        with TickRecorder(self.directory) as rec:
+            rec.append(Quote(**fields))
+        quotes = list(TickReader(self.directory))
+        self.assertDictEqual(quotes[0]._raw, fields)
+
+    def test_batches(self):
+        msgs = self.record(50)
+        reader = TickReader(self.directory)
+        batches = list(reader.batches(size=16))
+
+        self.assertListEqual([len(b) for b in batches], [16, 16, 16, 2])
+        quotes = [q for b in batches for q in b]
+        self.assertListEqual([q._raw for q in quotes], 
+                             [q._raw for q in reader])
+        self.assertEqual(quotes[49].time, 50)
+        self.assertEqual(len(msgs), 50)
+
+    def test_partial_record(self):
+        self.record(3, segment_size=1024)
+        segment = TickReader(self.directory).segments[0]
+        with open(segment, "ab") as f:
+            f.write(b"\x00" * 5)
+        self.assertEqual(len(list(TickReader(segment).records())), 3)
+
+    def test_index(self):
+        self.record(500, segment_size=4096, index_interval=16)
+        reader = TickReader(self.directory)
+        self.assertGreater(len(reader.segments), 2)
+        for segment in reader.segments:
+            self.assertTrue(os.path.exists(segment + ".idx"))
+
+        everything = list(reader.records())
+
+        def expected(start, end, identifiers):
+            return [(t, buf) for t, buf in everything 
+                    if (start is None or t >= start) 
+                    and (end is None or t < end) 
+                    and (identifiers is None or 
+                         _QuoteReader.parse_bytes(buf).identifier 
+                         in identifiers)]
+
+        queries = [(None, None, None), (123000000, 321000000, None), 
+                   (None, 50000000, ["SYM1"]), (499000000, None, ["SYM2"]), 
+                   (7000000, 408000000, ["SYM0", "SYM2", "MISSING"]), 
+                   (600000000, None, None)]
+        for start, end, identifiers in queries:
+            self.assertListEqual(
+                list(reader.records(start, end, identifiers)), 
+                expected(start, end, identifiers))
+
+        quotes = [q for b in reader.batches(start=100000000, end=110000000, 
+                                            identifiers=["SYM1"]) for q in b]
+        self.assertListEqual([q.time for q in quotes], [101, 104, 107, 110])
+
+        # without an index segments are scanned, reindex restores it
+        for segment in reader.segments:
+            os.remove(segment + ".idx")
+        reader = TickReader(self.directory)
+        for start, end, identifiers in queries:
+            self.assertListEqual(
+                list(reader.records(start, end, identifiers)), 
+                expected(start, end, identifiers))
+        self.assertEqual(reader.reindex(16), len(reader.segments))
+        self.assertEqual(reader.reindex(), 0)
+        for start, end, identifiers in queries:
+            self.assertListEqual(
+                list(reader.records(start, end, identifiers)), 
+                expected(start, end, identifiers))
+
+    def test_replay(self):
+        self.record(20)
+        received = []
+        replayer = TickReplayer(TickReader(self.directory), 
+                                on_quote=lambda r, q: received.append(q.time))
+        replayer.start()
+        self.assertListEqual(received, list(range(1, 21)))
+
+        # 20 records, 1ms apart at 10x speed
+        received.clear()
+        replayer.speed = 10.0
+        started = time.monotonic()
+        replayer.start()
+        self.assertGreaterEqual(time.monotonic() - started, 0.0019)
+        self.assertEqual(len(received), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
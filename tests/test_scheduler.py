@@ -0,0 +1,84 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from yflive.quote import Quote
+from yflive.scheduler import SubscriptionScheduler
+from yflive.streamer import QuoteStreamer
+
+UNIVERSE = ["SYM{}".format(i) for i in range(10)]
+
+class TestScheduler(unittest.TestCase):
+    """"""
+
+    def test_rotation(self):
+        qs = QuoteStreamer(subscribe=["OTHER"])
+        received = []
+        scheduler = SubscriptionScheduler(
+            qs, UNIVERSE, budget=4, rotation=2, dwell=5, 
+            on_quote=lambda qs, q: received.append(q.identifier))
+
+        # nothing measured yet, the stalest identifiers are rotated in
+        scheduler.step(now=0)
+        self.assertCountEqual(scheduler.cold, UNIVERSE[:4])
+        self.assertCountEqual(qs.subscribed, ["OTHER"] + UNIVERSE[:4])
+
+        for _ in range(50):
+            qs.on_quote(qs, Quote(identifier="SYM0"), now=0.5)
+        qs.on_quote(qs, Quote(identifier="SYM1"), now=0.5)
+        qs.on_quote(qs, Quote(identifier="OTHER"), now=0.5)
+        self.assertEqual(len(received), 52)
+
+        # SYM0 turns hot, SYM1 delivered its quote and is rotated out
+        scheduler.step(now=1)
+        self.assertGreater(scheduler.rates()["SYM0"], 
+                           scheduler.rates()["SYM1"])
+        self.assertIn("SYM0", scheduler.hot)
+        self.assertNotIn("SYM1", scheduler.cold)
+        self.assertEqual(len(qs.subscribed), 5)
+
+        # after dwell, waiting identifiers make room for the stalest ones
+        scheduler.step(now=7)
+        self.assertIn("SYM0", scheduler.hot)
+        self.assertCountEqual(scheduler.cold, ["SYM4", "SYM5"])
+        self.assertLessEqual(len(scheduler.hot) + len(scheduler.cold), 4)
+        self.assertIn("OTHER", qs.subscribed)
+
+        staleness = scheduler.staleness(now=7)
+        self.assertEqual(staleness["SYM0"], 6.5)
+        self.assertIsNone(staleness["SYM9"])
+
+        scheduler.remove(["SYM0"])
+        scheduler.step(now=8)
+        self.assertNotIn("SYM0", qs.subscribed)
+        self.assertIn("SYM6", scheduler.cold)
+        self.assertEqual(len(qs.subscribed), 5)
+
+    def test_small_universe(self):
+        qs = QuoteStreamer()
+        scheduler = SubscriptionScheduler(qs, UNIVERSE[:3], budget=4)
+        scheduler.step()
+        self.assertCountEqual(qs.subscribed, UNIVERSE[:3])
+        self.assertCountEqual(scheduler.hot, UNIVERSE[:3])
+
+        scheduler.add(UNIVERSE[3:6])
+        scheduler.step()
+        self.assertEqual(len(qs.subscribed), 4)
+
+        with self.assertRaises(ValueError):
+            SubscriptionScheduler(qs, budget=4, rotation=5)
+
+if __name__ == '__main__':
+    unittest.main()
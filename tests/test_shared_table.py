@@ -0,0 +1,128 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import multiprocessing
+import threading
+
+from stand_in import frame
+
+from yflive.quote import Quote
+
+try:
+    from yflive.shared_table import SharedQuoteReader, SharedQuoteTable
+except ImportError:
+    # multiprocessing.shared_memory requires Python 3.8+
+    SharedQuoteTable = None
+
+def _read(name, identifier, results):
+    with SharedQuoteReader(name) as reader:
+        results.put(reader.get(identifier))
+
+@unittest.skipIf(SharedQuoteTable is None, "requires Python 3.8+")
+class TestSharedTable(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.table = SharedQuoteTable(capacity=2)
+
+    def tearDown(self):
+        self.table.close()
+
+    def test_merge(self):
+        reader = SharedQuoteReader(self.table.name)
+        self.assertIsNone(reader.get("AAPL"))
+
+        self.table.append_message(frame("AAPL", price=1.5, time=3))
+        self.table.append(Quote(identifier="AAPL", bid=1.25))
+        self.table.update(None, Quote(identifier="TSLA", price=2.0))
+
+        self.assertEqual(reader.get("AAPL"),
+                         {"price": 1.5, "bid": 1.25, "time": 3})
+        self.assertEqual(reader.quote("TSLA").price, 2.0)
+        self.assertEqual(reader.identifiers, ["AAPL", "TSLA"])
+        self.assertEqual(len(reader.snapshot()), 2)
+
+        # full table and oversized identifiers are dropped
+        self.table.append(Quote(identifier="MSFT", price=3.0))
+        self.assertEqual(self.table.dropped, 1)
+        self.assertEqual(len(self.table), 2)
+        reader.close()
+
+    def test_consistent_rows(self):
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                self.table.append(Quote(identifier="AAPL", price=float(i),
+                                        bid=float(i), time=i))
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        reader = SharedQuoteReader(self.table.name)
+        try:
+            for _ in range(2000):
+                fields = reader.get("AAPL")
+                if fields is not None:
+                    self.assertEqual(fields["price"], fields["bid"])
+                    self.assertEqual(fields["price"], fields["time"])
+        finally:
+            stop.set()
+            writer.join()
+            reader.close()
+
+    def test_concurrent_writers(self):
+        table = SharedQuoteTable(capacity=4000)
+        reader = SharedQuoteReader(table.name)
+
+        def write(offset):
+            for i in range(offset, 4000, 4):
+                table.append(Quote(identifier="ID{}".format(i), time=i))
+
+        writers = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        self.assertEqual(len(reader), 4000)
+        for i in range(4000):
+            self.assertEqual(reader.get("ID{}".format(i)), {"time": i})
+        reader.close()
+        table.close()
+
+    def test_other_process(self):
+        self.table.append(Quote(identifier="AAPL", price=1.5))
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_read, args=(self.table.name, "AAPL", results))
+        process.start()
+        self.assertEqual(results.get(timeout=30), {"price": 1.5})
+        process.join()
+
+        # the table outlives readers of other processes
+        with SharedQuoteReader(self.table.name) as reader:
+            self.assertEqual(reader.get("AAPL"), {"price": 1.5})
+
+    def test_incompatible(self):
+        self.table._shm.buf[:4] = b"YFT0"
+        with self.assertRaises(ValueError):
+            SharedQuoteReader(self.table.name)
+        with self.assertRaises(ValueError):
+            SharedQuoteTable(capacity=0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+
+from stand_in import frame
+
+from yflive.quote import Quote
+from yflive.snapshot import SnapshotStore
+
+class TestSnapshot(unittest.TestCase):
+    """"""
+
+    def test_merge(self):
+        store = SnapshotStore(capacity=1)
+        store.append(Quote(identifier="AAPL", price=1.5, exchange="NMS"))
+        store.append_message(frame("TSLA", time=5, dayVolume=100))
+        store.update(None, Quote(identifier="AAPL", bid=1.25, quoteType=8))
+
+        self.assertEqual(len(store), 2)
+        self.assertIn("TSLA", store)
+        self.assertDictEqual(store.get("AAPL")._raw, 
+                             {"identifier": "AAPL", "price": 1.5, 
+                              "exchange": "NMS", "quoteType": 8, 
+                              "bid": 1.25})
+        self.assertDictEqual(store.get("TSLA")._raw, 
+                             {"identifier": "TSLA", "time": 5, 
+                              "dayVolume": 100})
+        self.assertIsNone(store.get("MSFT"))
+
+    def test_versions(self):
+        store = SnapshotStore()
+        store.append(Quote(identifier="AAPL", price=1.0))
+        store.append(Quote(identifier="TSLA", price=2.0))
+        changed, version = store.changed_since(0)
+        self.assertListEqual(changed, ["AAPL", "TSLA"])
+        self.assertEqual(version, 2)
+
+        store.append(Quote(identifier="TSLA", price=3.0))
+        changed, version = store.changed_since(version)
+        self.assertListEqual(changed, ["TSLA"])
+        self.assertEqual(store.row_version("TSLA"), version)
+        self.assertListEqual(store.changed_since(version)[0], [])
+
+    def test_export(self):
+        store = SnapshotStore()
+        store.append(Quote(identifier="AAPL", price=1.0, exchange="NMS"))
+        store.append(Quote(identifier="TSLA", price=2.0))
+
+        table = store.export()
+        self.assertListEqual(table["identifier"].tolist(), ["AAPL", "TSLA"])
+        self.assertListEqual(table["exchange"].tolist(), ["NMS", None])
+        self.assertListEqual(table["price"].tolist(), [1.0, 2.0])
+        self.assertListEqual(table["_version"].tolist(), [1, 2])
+
+        table = store.export(since=1)
+        self.assertListEqual(table["identifier"].tolist(), ["TSLA"])
+
+    def test_concurrent_writers(self):
+        store = SnapshotStore(capacity=2)
+
+        def write(n):
+            for t in range(1, 501):
+                store.append(Quote(identifier="SYM{}".format(t % 50), 
+                                   time=t, lastSize=n))
+
+        writers = [threading.Thread(target=write, args=(n,)) 
+                   for n in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        self.assertEqual(len(store), 50)
+        self.assertEqual(store.version, 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
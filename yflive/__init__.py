@@ -13,13 +13,30 @@
 # limitations under the License.
 
 from yflive.quote import Quote
+from yflive._reader import parse_quotes
 from yflive.streamer import QuoteStreamer
+from yflive.pool import QuoteStreamerPool
+from yflive.conflate import ConflatingDispatcher
+from yflive.recorder import TickReader, TickRecorder, TickReplayer
+from yflive.hub import HubClient, QuoteHub
+from yflive.scheduler import SubscriptionScheduler
 
 from yflive.enums.market_state import MarketState
 from yflive.enums.option_type import OptionType
 from yflive.enums.quote_type import QuoteType
+from yflive.enums.overflow_policy import OverflowPolicy
 
 __version__ = "1.0.0"
 __author__ = "Max Beinlich"
 
-__all__ = ['QuoteType', 'MarketState', 'OptionType', 'Quote', 'QuoteStreamer']
\ No newline at end of file
+__all__ = ['QuoteType', 'MarketState', 'OptionType', 'OverflowPolicy', 'Quote', 
+           'QuoteStreamer', 'QuoteStreamerPool', 'ConflatingDispatcher', 
+           'TickRecorder', 'TickReader', 'TickReplayer', 'QuoteHub', 
+           'HubClient', 'SubscriptionScheduler', 'parse_quotes']
+
+try:
+    from yflive.shared_table import SharedQuoteReader, SharedQuoteTable
+    __all__ += ['SharedQuoteTable', 'SharedQuoteReader']
+except ImportError:
+    # multiprocessing.shared_memory requires Python 3.8+
+    pass
\ No newline at end of file
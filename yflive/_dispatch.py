@@ -0,0 +1,168 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable, List, Union
+
+import collections
+import threading
+import logging
+
+from yflive._reader import _QuoteReader
+from yflive.enums import OverflowPolicy
+
+class _RingBuffer:
+    """
+    Bounded FIFO buffer shared between the websocket thread and one worker.
+    """
+
+    def __init__(self, capacity: int, overflow: OverflowPolicy):
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+
+        self._items = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any) -> bool:
+        """Queue item, returns False if a message was dropped."""
+        with self._cond:
+            if len(self._items) >= self.capacity and not self._closed:
+                if self.overflow is OverflowPolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                elif self.overflow is OverflowPolicy.DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                    self._items.append(item)
+                    self._cond.notify_all()
+                    return False
+                while len(self._items) >= self.capacity and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self) -> Any:
+        """Get next item, blocks until one is available or the buffer closes"""
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    raise IndexError("buffer closed")
+                self._cond.wait()
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Reject further items, queued items can still be taken."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class _Dispatcher:
+    """
+    Decouples the websocket thread from decoding and callbacks.
+
+    Raw messages are routed to one of several workers by identifier, so 
+    quotes of one identifier are always handled by the same worker and keep
+    their order, while different identifiers are processed concurrently.
+    """
+
+    def __init__(self, handler: Callable, workers: int, queue_size: int,
+                 overflow: Union[OverflowPolicy, str]=OverflowPolicy.BLOCK, 
+                 on_error: Callable=None):
+        """
+        Args:
+            handler (Callable): called with each raw message on a worker
+            workers (int): number of worker threads
+            queue_size (int): capacity of each worker's buffer
+            overflow (OverflowPolicy): handling of messages for a full buffer
+            on_error (Callable): called with exceptions raised by handler
+        """
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        if queue_size <= 0:
+            raise ValueError("queue_size must be positive")
+
+        self.handler = handler
+        self.on_error = on_error
+
+        overflow = OverflowPolicy(overflow)
+        self._buffers = [_RingBuffer(queue_size, overflow) 
+                         for _ in range(workers)]
+        self._threads = []
+
+        self._logger = logging.getLogger("yflive")
+
+    def start(self):
+        """Start all worker threads."""
+        self._threads = [
+            threading.Thread(target=self._work, args=(buf,), daemon=True,
+                             name="yflive-worker-{}".format(i))
+            for i, buf in enumerate(self._buffers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Finish queued messages and stop all worker threads."""
+        for buf in self._buffers:
+            buf.close()
+        current = threading.current_thread()
+        for thread in self._threads:
+            if thread is not current:
+                thread.join()
+        self._threads = []
+
+    def put(self, message: Union[str, bytes]) -> bool:
+        """
+        Route a raw message to the worker owning its identifier.
+
+        Returns:
+            bool: False if a message was dropped
+        """
+        buffers = self._buffers
+        if len(buffers) == 1:
+            return buffers[0].put(message)
+        identifier = _QuoteReader.peek_identifier(message)
+        return buffers[hash(identifier) % len(buffers)].put(message)
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages dropped on overflow."""
+        return sum(buf.dropped for buf in self._buffers)
+
+    @property
+    def depths(self) -> List[int]:
+        """Number of messages currently queued per worker."""
+        return [len(buf) for buf in self._buffers]
+
+    def _work(self, buf: _RingBuffer):
+        handler = self.handler
+        while True:
+            try:
+                message = buf.get()
+            except IndexError:
+                return
+            try:
+                handler(message)
+            except Exception as e:
+                self._logger.error(e)
+                if self.on_error is not None:
+                    self.on_error(e)
@@ -0,0 +1,340 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, List, Optional, Union
+
+import base64
+import marshal
+import multiprocessing
+import struct
+import threading
+import time
+import logging
+
+from multiprocessing import shared_memory
+
+from yflive._reader import _Projection, _QuoteReader
+from yflive.enums import OverflowPolicy
+from yflive.quote import Quote
+from yflive.yfquote_pb2 import YFQuote
+
+# ==============================================================================
+# Shared memory ring buffer
+# ==============================================================================
+
+_HEADER = struct.Struct("<QQ")
+_LENGTH = struct.Struct("<I")
+_WRAP = 0xFFFFFFFF
+
+class _SharedRing:
+    """
+    Single producer, single consumer ring buffer in shared memory.
+
+    The buffer starts with two uint64 counters, the total number of bytes 
+    written (head) and read (tail), followed by the data area. Records are 
+    length prefixed, a record not fitting before the end of the data area 
+    starts over at its beginning. The skipped end and the record are 
+    published together, so records are limited to half the data area, which
+    lets any record be written into an empty ring.
+
+    The ring itself does no signalling: producers release a semaphore per 
+    record written, consumers acquire it before reading one, which also orders
+    the memory accesses of both processes.
+    """
+
+    def __init__(self, size: int=None, name: str=None):
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=_HEADER.size + size)
+            _HEADER.pack_into(self._shm.buf, 0, 0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.capacity = self._shm.size - _HEADER.size
+        self.max_record = self.capacity // 2 - _LENGTH.size
+        self._data = self._shm.buf[_HEADER.size:]
+
+    def __len__(self) -> int:
+        head, tail = _HEADER.unpack_from(self._shm.buf, 0)
+        return head - tail
+
+    def put(self, record: bytes) -> bool:
+        """Write record, returns False if there is not enough space."""
+        if len(record) > self.max_record:
+            raise ValueError("record of {} bytes exceeds ring capacity"
+                             .format(len(record)))
+        n = _LENGTH.size + len(record)
+
+        head, tail = _HEADER.unpack_from(self._shm.buf, 0)
+        pos = head % self.capacity
+        contiguous = self.capacity - pos
+        skip = contiguous if n > contiguous else 0
+        if skip + n > self.capacity - (head - tail):
+            return False
+        if skip:
+            if contiguous >= _LENGTH.size:
+                _LENGTH.pack_into(self._data, pos, _WRAP)
+            head += skip
+            pos = 0
+
+        _LENGTH.pack_into(self._data, pos, len(record))
+        self._data[pos + _LENGTH.size:pos + n] = record
+        struct.pack_into("<Q", self._shm.buf, 0, head + n)
+        return True
+
+    def get(self) -> Optional[bytes]:
+        """Read the next record, None if the ring is empty."""
+        head, tail = _HEADER.unpack_from(self._shm.buf, 0)
+        if head == tail:
+            return None
+
+        pos = tail % self.capacity
+        contiguous = self.capacity - pos
+        if contiguous < _LENGTH.size \
+                or _LENGTH.unpack_from(self._data, pos)[0] == _WRAP:
+            tail += contiguous
+            pos = 0
+        length = _LENGTH.unpack_from(self._data, pos)[0]
+        start = pos + _LENGTH.size
+        record = bytes(self._data[start:start + length])
+        struct.pack_into("<Q", self._shm.buf, 8, tail + _LENGTH.size + length)
+        return record
+
+    def close(self):
+        self._data.release()
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+# ==============================================================================
+# Decoder processes
+# ==============================================================================
+
+def _put_blocking(ring: _SharedRing, record: bytes):
+    while not ring.put(record):
+        time.sleep(0.0005)
+
+def _put_batch(ring: _SharedRing, ready, batch: list):
+    """
+    Write a batch of decoded fields, split into as many records as needed to
+    fit the ring, releasing ready for each record.
+    """
+    record = marshal.dumps(batch)
+    if len(record) > ring.max_record:
+        if len(batch) == 1:
+            record = marshal.dumps(["ValueError: decoded quote of {} bytes "
+                                    "exceeds ring capacity".format(len(record))])
+        else:
+            middle = len(batch) // 2
+            _put_batch(ring, ready, batch[:middle])
+            _put_batch(ring, ready, batch[middle:])
+            return
+    _put_blocking(ring, record)
+    ready.release()
+
+def _decode_worker(frames_name: str, results_name: str, frames_ready, 
+                   results_ready, batch_size: int, 
+                   projection: _Projection=None):
+    """
+    Decode frames from one ring and write batches of decoded fields to another.
+
+    Frames rejected by the filter of projection are left out. An empty frame 
+    stops the worker.
+    """
+    frames = _SharedRing(name=frames_name)
+    results = _SharedRing(name=results_name)
+    b64decode = base64.b64decode
+    decode = _QuoteReader._fields
+    yfquote = YFQuote()
+
+    running = True
+    while running:
+        frames_ready.acquire()
+        batch = []
+        while True:
+            frame = frames.get()
+            if frame == b"":
+                running = False
+                break
+            try:
+                buf = b64decode(frame)
+                if projection is None:
+                    batch.append(decode(yfquote, buf))
+                else:
+                    fields = projection.decode(buf)
+                    if fields is not None:
+                        batch.append(fields)
+            except Exception as e:
+                batch.append("{}: {}".format(type(e).__name__, e))
+            if len(batch) >= batch_size \
+                    or not frames_ready.acquire(block=False):
+                break
+        if batch:
+            _put_batch(results, results_ready, batch)
+
+    frames.close()
+    results.close()
+
+class _ProcessDispatcher:
+    """
+    Decodes messages in a pool of processes.
+
+    Raw messages are routed by identifier into one shared memory ring per 
+    decoder process, so quotes of one identifier keep their order. Decoders 
+    send the decoded fields back in batches through a second ring per process,
+    from which a collector thread builds Quote objects and calls handler.
+    """
+
+    def __init__(self, handler: Callable, processes: int, ring_size: int,
+                 overflow: Union[OverflowPolicy, str]=OverflowPolicy.BLOCK,
+                 on_error: Callable=None, batch_size: int=256, 
+                 projection: _Projection=None):
+        """
+        Args:
+            handler (Callable): called with each decoded Quote
+            processes (int): number of decoder processes
+            ring_size (int): bytes of each shared memory ring
+            overflow (OverflowPolicy): BLOCK or DROP_NEWEST
+            on_error (Callable): called with errors decoding a message
+            batch_size (int): maximum number of quotes sent back at once
+            projection (_Projection): fields to decode and filter to apply
+        """
+        if processes <= 0:
+            raise ValueError("processes must be positive")
+        overflow = OverflowPolicy(overflow)
+        if overflow is OverflowPolicy.DROP_OLDEST:
+            raise ValueError("DROP_OLDEST is not supported with processes")
+
+        self.handler = handler
+        self.on_error = on_error
+        self.processes = processes
+        self.ring_size = ring_size
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.projection = projection
+        self.dropped = 0
+
+        self._frames = []
+        self._results = []
+        self._frames_ready = []
+        self._results_ready = None
+        self._workers = []
+        self._collector = None
+        self._stopped = threading.Event()
+
+        self._logger = logging.getLogger("yflive")
+
+    def start(self):
+        """Start decoder processes and the collector thread."""
+        ctx = multiprocessing.get_context()
+        self._stopped.clear()
+        self._results_ready = ctx.Semaphore(0)
+        for _ in range(self.processes):
+            frames = _SharedRing(self.ring_size)
+            results = _SharedRing(self.ring_size)
+            frames_ready = ctx.Semaphore(0)
+            worker = ctx.Process(
+                target=_decode_worker, daemon=True,
+                args=(frames.name, results.name, frames_ready, 
+                      self._results_ready, self.batch_size, 
+                      self.projection))
+            worker.start()
+            self._frames.append(frames)
+            self._results.append(results)
+            self._frames_ready.append(frames_ready)
+            self._workers.append(worker)
+
+        self._collector = threading.Thread(target=self._collect, daemon=True,
+                                           name="yflive-collector")
+        self._collector.start()
+
+    def stop(self):
+        """Decode queued messages, then stop all processes."""
+        if not self._workers:
+            return
+        for frames, frames_ready in zip(self._frames, self._frames_ready):
+            _put_blocking(frames, b"")
+            frames_ready.release()
+        for worker in self._workers:
+            worker.join()
+        self._stopped.set()
+        if self._collector is not threading.current_thread():
+            self._collector.join()
+        for ring in self._frames + self._results:
+            ring.close()
+            ring.unlink()
+        self._frames, self._results, self._frames_ready = [], [], []
+        self._workers = []
+
+    def put(self, message: Union[str, bytes]) -> bool:
+        """
+        Route a raw message to the decoder owning its identifier.
+
+        Returns:
+            bool: False if the message was dropped
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        i = 0
+        if self.processes > 1:
+            identifier = _QuoteReader.peek_identifier(message)
+            i = hash(identifier) % self.processes
+
+        frames = self._frames[i]
+        if len(message) > frames.max_record:
+            self._error(ValueError("message of {} bytes exceeds ring capacity"
+                                   .format(len(message))))
+            return False
+        if not frames.put(message):
+            if self.overflow is OverflowPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return False
+            _put_blocking(frames, message)
+        self._frames_ready[i].release()
+        return True
+
+    @property
+    def depths(self) -> List[int]:
+        """Number of bytes currently queued per decoder."""
+        return [len(frames) for frames in self._frames]
+
+    def _collect(self):
+        handler = self.handler
+        results = self._results
+        start = 0
+        while True:
+            if not self._results_ready.acquire(timeout=0.1):
+                if self._stopped.is_set():
+                    return
+                continue
+            # one batch is available in any of the rings, start looking at 
+            # the ring following the last one read from
+            batch = None
+            while batch is None:
+                start = (start + 1) % len(results)
+                batch = results[start].get()
+            for fields in marshal.loads(batch):
+                if isinstance(fields, str):
+                    self._error(ValueError(fields))
+                    continue
+                try:
+                    handler(Quote(**fields))
+                except Exception as e:
+                    self._error(e)
+
+    def _error(self, error: Exception):
+        self._logger.error(error)
+        if self.on_error is not None:
+            self.on_error(error)
@@ -12,13 +12,209 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List
+from typing import Any, Iterable, List, Mapping, Union
 
 import base64
+import struct
+
+from enum import Enum
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import DecodeError
 
 from yflive.yfquote_pb2 import YFQuote
 from yflive.quote import Quote
 
+# Field number -> field name, as declared in yfquote.proto
+_FIELD_NAMES = {f.number: f.name for f in YFQuote.DESCRIPTOR.fields}
+
+# Field name -> (field number, proto type)
+_FIELD_TYPES = {f.name: (f.number, f.type) for f in YFQuote.DESCRIPTOR.fields}
+
+# Wire type of every proto type used by YFQuote
+_WIRE_TYPES = {
+    FieldDescriptor.TYPE_STRING: 2,
+    FieldDescriptor.TYPE_FLOAT: 5,
+    FieldDescriptor.TYPE_DOUBLE: 1,
+    FieldDescriptor.TYPE_SINT64: 0,
+    FieldDescriptor.TYPE_INT32: 0,
+}
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+
+class _Projection:
+    """
+    Fields to decode from messages and a filter on their values.
+
+    Messages are decoded straight from the wire format, fields outside of 
+    the projection are skipped without being converted to Python objects.
+    Messages not matching the filter are rejected before any Quote is built.
+    """
+
+    __slots__ = ("fields", "where", "_decoders", "_hidden")
+
+    def __init__(self, fields: Iterable[str]=None, 
+                 where: Mapping[str, Any]=None):
+        """
+        Args:
+            fields (Iterable): fields to decode, defaults to all fields
+            where (Mapping): field name -> allowed value or collection of 
+                allowed values. Messages without the field are rejected
+        """
+        fields = list(_FIELD_TYPES if fields is None else fields)
+        where = {} if where is None else dict(where)
+        unknown = (set(fields) | set(where)) - set(_FIELD_TYPES)
+        if len(unknown) > 0:
+            raise ValueError("unknown fields {}".format(sorted(unknown)))
+
+        self.fields = fields
+        self.where = {name: self._allowed(value) 
+                      for name, value in where.items()}
+        # where fields are decoded for the filter, but not handed out
+        self._hidden = tuple(set(where) - set(fields))
+        # field number -> (name, proto type, wire type)
+        self._decoders = {}
+        for name in set(fields) | set(where):
+            number, proto_type = _FIELD_TYPES[name]
+            self._decoders[number] = (name, proto_type, 
+                                      _WIRE_TYPES[proto_type])
+
+    @staticmethod
+    def _allowed(value: Any) -> frozenset:
+        if isinstance(value, (str, bytes, Enum)) \
+                or not isinstance(value, Iterable):
+            value = (value,)
+        return frozenset(v.value if isinstance(v, Enum) else v for v in value)
+
+    def decode(self, buf: bytes) -> dict:
+        """
+        Decode the projected fields of a message.
+
+        Args:
+            buf (bytes): serialized YFQuote message
+
+        Returns:
+            dict: field name -> value of present fields, None if the message
+                does not match the filter
+        """
+        try:
+            fields = self._decode(buf)
+        except (IndexError, struct.error):
+            raise DecodeError("Truncated message") from None
+
+        for name, allowed in self.where.items():
+            if fields.get(name) not in allowed:
+                return None
+        for name in self._hidden:
+            fields.pop(name, None)
+        return fields
+
+    def _decode(self, buf: bytes) -> dict:
+        decoders = self._decoders
+        fields = {}
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            b = buf[pos]
+            pos += 1
+            tag = b & 127
+            shift = 7
+            while b & 128:
+                b = buf[pos]
+                pos += 1
+                tag |= (b & 127) << shift
+                shift += 7
+
+            wire_type = tag & 7
+            decoder = decoders.get(tag >> 3)
+            if decoder is not None and decoder[2] != wire_type:
+                raise DecodeError(
+                    "Unexpected wire type for {}".format(decoder[0]))
+
+            if wire_type == 0:
+                b = buf[pos]
+                pos += 1
+                value = b & 127
+                shift = 7
+                while b & 128:
+                    b = buf[pos]
+                    pos += 1
+                    value |= (b & 127) << shift
+                    shift += 7
+                if decoder is not None:
+                    if decoder[1] == FieldDescriptor.TYPE_SINT64:
+                        value = (value >> 1) ^ -(value & 1)
+                    else:
+                        # int32, negative values are sign extended to 64 bits
+                        value &= 0xffffffff
+                        if value & 0x80000000:
+                            value -= 0x100000000
+                    fields[decoder[0]] = value
+            elif wire_type == 1:
+                if decoder is not None:
+                    fields[decoder[0]] = _DOUBLE.unpack_from(buf, pos)[0]
+                pos += 8
+            elif wire_type == 2:
+                b = buf[pos]
+                pos += 1
+                length = b & 127
+                shift = 7
+                while b & 128:
+                    b = buf[pos]
+                    pos += 1
+                    length |= (b & 127) << shift
+                    shift += 7
+                if pos + length > end:
+                    raise IndexError
+                if decoder is not None:
+                    fields[decoder[0]] = bytes(buf[pos:pos + length]).decode()
+                pos += length
+            elif wire_type == 5:
+                if decoder is not None:
+                    fields[decoder[0]] = _FLOAT.unpack_from(buf, pos)[0]
+                pos += 4
+            else:
+                raise DecodeError("Unsupported wire type {}".format(wire_type))
+        if pos > end:
+            raise IndexError
+        return fields
+
+def _varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _encode(fields: Mapping[str, Any]) -> bytes:
+    """
+    Serialize fields to a YFQuote message, in field number order.
+
+    Unlike YFQuote.SerializeToString(), every present field is written, also
+    when it holds the default value, so decoding gives back the same fields.
+    """
+    out = bytearray()
+    for number, name in sorted(_FIELD_NAMES.items()):
+        value = fields.get(name)
+        if value is None:
+            continue
+        proto_type = _FIELD_TYPES[name][1]
+        _varint(number << 3 | _WIRE_TYPES[proto_type], out)
+        if proto_type == FieldDescriptor.TYPE_STRING:
+            data = value.encode()
+            _varint(len(data), out)
+            out += data
+        elif proto_type == FieldDescriptor.TYPE_FLOAT:
+            out += _FLOAT.pack(value)
+        elif proto_type == FieldDescriptor.TYPE_DOUBLE:
+            out += _DOUBLE.pack(value)
+        elif proto_type == FieldDescriptor.TYPE_SINT64:
+            _varint(value << 1 if value >= 0 else (-value << 1) - 1, out)
+        else:
+            # int32, negative values are sign extended to 64 bits
+            _varint(value & 0xFFFFFFFFFFFFFFFF, out)
+    return bytes(out)
+
 class _QuoteReader:
     """
     Reader class for Yahoo! Finance websocket messages.
@@ -27,35 +223,102 @@ class _QuoteReader:
     by Yahoo! Finance.
     """
 
-    def __init__(self, buf: List[int], pos: int, length: int):
-        self.buf = buf
-        self.pos = pos
-        self.length = length
-
     # ==========================================================================
     # Parse Yahoo! Finance websocket message to Quote
     # ==========================================================================
 
     @staticmethod
-    def parse(msg: str) -> Quote:
+    def parse(msg: str, projection: _Projection=None) -> Quote:
         """
         Parse Yahoo! Finance websocket message to Quote object
 
         Args:
             msg (str): websocket message
+            projection (_Projection): fields to decode and filter to apply
+
+        Returns:
+            Quote: Quote object of underlying data from message, None if 
+                rejected by the filter of projection
+        """
+        return _QuoteReader.parse_bytes(base64.b64decode(msg), projection)
+
+    @staticmethod
+    def parse_bytes(buf: bytes, projection: _Projection=None) -> Quote:
+        """
+        Parse an already base64 decoded message to Quote object
+
+        Args:
+            buf (bytes): serialized YFQuote message
+            projection (_Projection): fields to decode and filter to apply
+
+        Returns:
+            Quote: Quote object of underlying data from message, None if 
+                rejected by the filter of projection
+        """
+        if projection is None:
+            return Quote(**_QuoteReader._fields(YFQuote(), buf))
+        fields = projection.decode(buf)
+        return None if fields is None else Quote(**fields)
+
+    @staticmethod
+    def parse_many(msgs: Iterable[Union[str, bytes]], 
+                   projection: _Projection=None) -> List[Quote]:
+        """
+        Parse a batch of Yahoo! Finance websocket messages to Quote objects
+
+        A single YFQuote instance is reused for the whole batch and all lookups
+        are hoisted out of the loop, which makes replaying captured frames
+        considerably cheaper than calling parse for every message.
+
+        Args:
+            msgs (Iterable): websocket messages
+            projection (_Projection): fields to decode and filter to apply
 
         Returns:
-            Quote: Quote object of underlying data from message
+            List[Quote]: Quote objects in the order of the given messages, 
+                without messages rejected by the filter of projection
         """
-        message_bytes = base64.b64decode(msg)
+        b64decode = base64.b64decode
+        if projection is not None:
+            return _QuoteReader.parse_many_bytes(
+                (b64decode(msg) for msg in msgs), projection)
+
+        fields = _QuoteReader._fields
         yfquote = YFQuote()
-        yfquote.ParseFromString(message_bytes)
 
-        fields = {}
-        for f in _QuoteReader.available_fields(msg):
-            fields[f] = getattr(yfquote, f, None)
+        quotes = []
+        append = quotes.append
+        for msg in msgs:
+            append(Quote(**fields(yfquote, b64decode(msg))))
+        return quotes
+
+    @staticmethod
+    def parse_many_bytes(bufs: Iterable[bytes], 
+                         projection: _Projection=None) -> List[Quote]:
+        """
+        Parse a batch of already base64 decoded messages to Quote objects
+
+        Args:
+            bufs (Iterable): serialized YFQuote messages
+            projection (_Projection): fields to decode and filter to apply
+
+        Returns:
+            List[Quote]: Quote objects in the order of the given messages, 
+                without messages rejected by the filter of projection
+        """
+        if projection is not None:
+            decode = projection.decode
+            quotes = []
+            append = quotes.append
+            for buf in bufs:
+                fields = decode(buf)
+                if fields is not None:
+                    append(Quote(**fields))
+            return quotes
 
-        return Quote(**fields)
+        fields = _QuoteReader._fields
+        yfquote = YFQuote()
+        return [Quote(**fields(yfquote, buf)) for buf in bufs]
 
     @staticmethod
     def available_fields(msg: str) -> list: 
@@ -68,78 +331,145 @@ class _QuoteReader:
         Returns:
             list: List of available datapoints in message
         """
-        buffer = list(base64.b64decode(msg))
-        reader = _QuoteReader(buffer, 0, len(buffer))
-        c = reader.length
-        available_fields = []
-        while reader.pos < c:
-            t = reader._uint32()
-            available_fields.append(Quote.__fields__[(t >> 3) - 1])
-            reader._skipType(t & 7)
-        return available_fields
+        return _QuoteReader._scan(base64.b64decode(msg))
+
+    @staticmethod
+    def peek_identifier(msg: Union[str, bytes]) -> str:
+        """
+        Get the identifier of a message without decoding all of it
+
+        Yahoo! Finance sends the identifier as first field, so only the head 
+        of the message needs to be base64 decoded. Messages not starting with
+        the identifier are fully decoded.
+
+        Args:
+            msg (str): websocket message
+
+        Returns:
+            str: identifier of the message, None if it cannot be decoded
+        """
+        try:
+            head = base64.b64decode(msg[:24])
+            if len(head) >= 2 and head[0] == 0x0a and head[1] < 128:
+                end = head[1] + 2
+                if end > len(head):
+                    head = base64.b64decode(msg[:(end + 2) // 3 * 4])
+                try:
+                    return head[2:end].decode()
+                except UnicodeDecodeError:
+                    pass
+            buf = base64.b64decode(msg)
+            return _QuoteReader._fields(YFQuote(), buf).get("identifier")
+        except (ValueError, IndexError, DecodeError):
+            return None
+
+    @staticmethod
+    def peek_identifier_bytes(buf: bytes) -> str:
+        """
+        Get the identifier of an already base64 decoded message
+
+        Args:
+            buf (bytes): serialized YFQuote message
+
+        Returns:
+            str: identifier of the message, None if it cannot be decoded
+        """
+        try:
+            if len(buf) >= 2 and buf[0] == 0x0a and buf[1] < 128:
+                try:
+                    return bytes(buf[2:buf[1] + 2]).decode()
+                except UnicodeDecodeError:
+                    pass
+            return _QuoteReader._fields(YFQuote(), buf).get("identifier")
+        except (ValueError, IndexError, DecodeError):
+            return None
 
     # ==========================================================================
     # Helper methods
     # ==========================================================================    
 
-    def _incr(self):
-        self.pos += 1
-        return self.pos - 1
-
-    def _uint32(self):
-        value = 4294967295
-        value = (self.buf[self.pos] & 127) >> 0
-        if (self.buf[self._incr()] < 128): 
-            return value
-
-        value = (value | (self.buf[self.pos] & 127) << 7) >> 0
-        if (self.buf[self._incr()] < 128): 
-            return value
-
-        value = (value | (self.buf[self.pos] & 127) << 14) >> 0
-        if (self.buf[self._incr()] < 128): 
-            return value
-
-        value = (value | (self.buf[self.pos] & 127) << 21) >> 0 
-        if (self.buf[self._incr()] < 128): 
-            return value
-
-        value = (value | (self.buf[self.pos] &  15) << 28) >> 0 
-        if (self.buf[self._incr()] < 128): 
-            return value
-
-        self.pos += 5
-        if ((self.pos) > self.length):
-            self.pos = self.length
-        return value
-
-    def _skip(self, length=None):
-        if isinstance(length, int):
-            if self.pos + length > self.length:
-                return IndexError("index out of range")
-            self.pos += length
-        else:
-            while True:
-                if self.pos >= self.length:
-                    return IndexError("index out of range")
-                if self.buf[self._incr()] & 128 == 0:
-                    break
-        return
-
-    def _skipType(self, wireType):
-        if wireType == 0:
-            self._skip()
-        elif wireType == 1:
-            self._skip(8)
-        elif wireType == 2:
-            self._skip(self._uint32())
-        elif wireType == 3:
-            wireType = self._uint32() & 7
-            while wireType != 4:
-                self._skipType(wireType)
-                wireType = self._uint32() & 7
-        elif wireType == 5:
-            self._skip(4)
-        else:
-            return 
-        return
\ No newline at end of file
+    @staticmethod
+    def _fields(yfquote: YFQuote, buf: bytes) -> dict:
+        """
+        Decode buf into yfquote and return a dict of all fields present.
+        """
+        yfquote.ParseFromString(buf)
+        return {f: getattr(yfquote, f) for f in _QuoteReader._scan(buf)}
+
+    @staticmethod
+    def _scan(buf: bytes) -> List[str]:
+        """
+        Walk the wire format once and collect the names of all fields present.
+
+        Proto3 does not track presence of scalar fields, so a field explicitly
+        sent with its default value (e.g. marketState PRE = 0) can only be told
+        apart from an absent one by looking at the encoded tags.
+        """
+        names = _FIELD_NAMES
+        fields = []
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            b = buf[pos]
+            pos += 1
+            tag = b & 127
+            shift = 7
+            while b & 128:
+                b = buf[pos]
+                pos += 1
+                tag |= (b & 127) << shift
+                shift += 7
+
+            wire_type = tag & 7
+            if wire_type == 0:
+                while buf[pos] & 128:
+                    pos += 1
+                pos += 1
+            elif wire_type == 1:
+                pos += 8
+            elif wire_type == 2:
+                b = buf[pos]
+                pos += 1
+                length = b & 127
+                shift = 7
+                while b & 128:
+                    b = buf[pos]
+                    pos += 1
+                    length |= (b & 127) << shift
+                    shift += 7
+                pos += length
+            elif wire_type == 5:
+                pos += 4
+            else:
+                # groups are not used by YFQuote, nothing sensible follows
+                break
+
+            name = names.get(tag >> 3)
+            if name is not None:
+                fields.append(name)
+        return fields
+
+
+def parse_quotes(messages: Iterable[Union[str, bytes]], 
+                 fields: Iterable[str]=None, 
+                 where: Mapping[str, Any]=None) -> List[Quote]:
+    """
+    Decode captured Yahoo! Finance websocket messages to Quote objects.
+
+    Messages are decoded exactly like QuoteStreamer decodes live messages, so 
+    replayed and live quotes are identical.
+
+    Args:
+        messages (Iterable): base64 encoded websocket messages
+        fields (Iterable): fields to decode, defaults to all fields
+        where (Mapping): field name -> allowed value or collection of allowed
+            values, e.g. {"quoteType": QuoteType.EQUITY}
+
+    Returns:
+        List[Quote]: Quote objects in the order of the given messages, 
+            without messages rejected by where
+    """
+    projection = None
+    if fields is not None or where is not None:
+        projection = _Projection(fields, where)
+    return _QuoteReader.parse_many(messages, projection)
@@ -0,0 +1,272 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Tuple
+
+import collections
+import math
+import threading
+
+import numpy as np
+
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+__all__ = ['RollingAnalytics', 'METRICS']
+
+# Metrics reported per identifier
+METRICS = ("price", "vwap", "spread", "spread_std", "volatility", "ticks")
+
+class _Window:
+    """
+    Sliding window of samples keeping running sums of their values.
+
+    Samples are evicted once more than size samples are held, or once they
+    are duration ms older than the latest sample. The sums are recomputed from
+    the held samples after as many evictions as samples are held, so rounding
+    errors do not accumulate while updates stay amortized O(1).
+    """
+
+    __slots__ = ("size", "duration", "sums", "_samples", "_evicted")
+
+    def __init__(self, width: int, size: int=None, duration: int=None):
+        self.size = size
+        self.duration = duration
+        self.sums = [0.0] * width
+        self._samples = collections.deque()
+        self._evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, timestamp: int, values: Tuple[float, ...]):
+        self._samples.append((timestamp, values))
+        sums = self.sums
+        for i, value in enumerate(values):
+            sums[i] += value
+        self.evict(timestamp)
+
+    def evict(self, timestamp: int):
+        samples = self._samples
+        evicted = 0
+        if self.size is not None:
+            while len(samples) > self.size:
+                self._subtract(samples.popleft()[1])
+                evicted += 1
+        if self.duration is not None:
+            oldest = timestamp - self.duration
+            while samples and samples[0][0] <= oldest:
+                self._subtract(samples.popleft()[1])
+                evicted += 1
+        if evicted:
+            self._evicted += evicted
+            if self._evicted >= len(samples):
+                self._recompute()
+
+    def _subtract(self, values: Tuple[float, ...]):
+        sums = self.sums
+        for i, value in enumerate(values):
+            sums[i] -= value
+
+    def _recompute(self):
+        self._evicted = 0
+        self.sums = [math.fsum(column) for column in
+                     zip(*(values for _, values in self._samples))] \
+            if self._samples else [0.0] * len(self.sums)
+
+class _Series:
+    """
+    Rolling state of an identifier.
+    """
+
+    __slots__ = ("price", "day_volume", "trades", "spreads", "returns")
+
+    def __init__(self, size: int, duration: int):
+        self.price = None
+        self.day_volume = None
+        # price * volume, volume
+        self.trades = _Window(2, size, duration)
+        # spread, spread ** 2
+        self.spreads = _Window(2, size, duration)
+        # log return ** 2
+        self.returns = _Window(1, size, duration)
+
+class RollingAnalytics:
+    """
+    The RollingAnalytics maintain rolling statistics of every identifier over
+    a count or time based window.
+
+    For every identifier the following metrics are kept up to date with O(1)
+    work per quote:
+
+        price       last price
+        vwap        volume weighted average price, with volume taken from
+                    dayVolume differences
+        spread      mean ask - bid
+        spread_std  standard deviation of ask - bid
+        volatility  realized volatility, the square root of the summed squared
+                    log returns between consecutive prices
+        ticks       number of prices in the window
+
+    Windows hold the last window samples, the samples of the last duration
+    seconds by quote time, or both. Time based windows of all identifiers 
+    move with the latest quote time received. Quotes without time are 
+    ignored.
+
+        analytics = RollingAnalytics(duration=300)
+        qs = QuoteStreamer(subscribe=["AAPL"], on_quote=analytics.update)
+        qs.start(should_thread=True)
+        ...
+        table = analytics.snapshot()
+    """
+
+    def __init__(self, window: int=None, duration: float=None,
+                 streamer: QuoteStreamer=None):
+        """
+        Constructor method for RollingAnalytics.
+
+        Args:
+            window (int): number of samples per window
+            duration (float): seconds of quote time per window
+            streamer (QuoteStreamer): streamer whose on_quote is set to update
+        """
+        if window is None and duration is None:
+            raise ValueError("window or duration is required")
+        if (window is not None and window <= 0) or \
+                (duration is not None and duration <= 0):
+            raise ValueError("window and duration must be positive")
+
+        self.window = window
+        self.duration = duration
+
+        self._duration_ms = None if duration is None else int(duration * 1000)
+        self._series = {}
+        self._latest = 0
+        self._lock = threading.Lock()
+
+        if streamer is not None:
+            streamer.on_quote = self.update
+
+    def update(self, streamer: QuoteStreamer, quote: Quote):
+        """
+        Add a quote to the windows of its identifier.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+        """
+        identifier = quote.identifier
+        timestamp = quote.time
+        if identifier is None or timestamp is None:
+            return
+        price = quote.price
+        day_volume = quote.dayVolume
+        bid = quote.bid
+        ask = quote.ask
+
+        with self._lock:
+            if timestamp > self._latest:
+                self._latest = timestamp
+            series = self._series.get(identifier)
+            if series is None:
+                series = self._series[identifier] = \
+                    _Series(self.window, self._duration_ms)
+
+            volume = 0
+            if day_volume is not None:
+                last = series.day_volume
+                if last is not None:
+                    volume = day_volume - last if day_volume >= last \
+                        else day_volume
+                series.day_volume = day_volume
+
+            if price is not None and price > 0:
+                series.trades.add(timestamp, (price * volume, volume))
+                if series.price is not None:
+                    r = math.log(price / series.price)
+                    series.returns.add(timestamp, (r * r,))
+                series.price = price
+            else:
+                series.trades.evict(timestamp)
+                series.returns.evict(timestamp)
+
+            if bid is not None and ask is not None:
+                spread = ask - bid
+                series.spreads.add(timestamp, (spread, spread * spread))
+            else:
+                series.spreads.evict(timestamp)
+
+    def get(self, identifier: str) -> Dict[str, float]:
+        """
+        Get the metrics of an identifier.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            dict: metric name -> value, None if nothing was received yet
+        """
+        with self._lock:
+            series = self._series.get(identifier)
+            if series is None:
+                return None
+            return dict(zip(METRICS, self._metrics(series, self._latest)))
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """
+        Get the metrics of all identifiers as arrays.
+
+        Metrics without samples in their window are NaN.
+
+        Returns:
+            dict: "identifier" and metric name -> array, one row per
+                identifier
+        """
+        with self._lock:
+            identifiers = list(self._series)
+            rows = [self._metrics(s, self._latest) 
+                    for s in self._series.values()]
+        values = np.array(rows, dtype=np.float64).reshape(-1, len(METRICS))
+        table = {"identifier": np.array(identifiers, dtype=object)}
+        for i, metric in enumerate(METRICS):
+            table[metric] = values[:, i]
+        table["ticks"] = table["ticks"].astype(np.int64)
+        return table
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    @staticmethod
+    def _metrics(series: _Series, latest: int) -> tuple:
+        for window in (series.trades, series.spreads, series.returns):
+            window.evict(latest)
+
+        nan = math.nan
+        notional, volume = series.trades.sums
+        vwap = notional / volume if volume > 0 else nan
+
+        n = len(series.spreads)
+        spread = spread_std = nan
+        if n:
+            total, squares = series.spreads.sums
+            spread = total / n
+            spread_std = math.sqrt(max(squares / n - spread * spread, 0.0))
+
+        volatility = math.sqrt(max(series.returns.sums[0], 0.0)) \
+            if len(series.returns) else nan
+
+        price = nan if series.price is None else series.price
+        return (price, vwap, spread, spread_std, volatility,
+                len(series.trades))
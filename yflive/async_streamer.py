@@ -0,0 +1,241 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Iterable, Mapping
+
+import asyncio
+import json
+import ssl
+import logging
+
+import websockets
+
+from ._reader import _Projection, _QuoteReader
+from .quote import Quote
+from .streamer import YAHOO_FINANCE_SOCKET
+
+__all__ = ['AsyncQuoteStreamer']
+
+# ==============================================================================
+# AsyncQuoteStreamer
+# ==============================================================================
+
+_CLOSED = object()
+
+class AsyncQuoteStreamer:
+    """
+    The AsyncQuoteStreamer streams live quote data from Yahoo! Finance on an
+    asyncio event loop.
+
+    Instead of callbacks, quotes are consumed by iterating the streamer:
+
+        async with AsyncQuoteStreamer(subscribe=["AAPL"]) as streamer:
+            async for quote in streamer:
+                print(quote)
+
+    Decoded quotes are kept in a bounded queue. Once it is full, reading from 
+    the websocket pauses until the consumer catches up, so a slow consumer 
+    applies backpressure to the connection instead of buffering without limit.
+    """
+
+    def __init__(self, subscribe: Iterable=None, url: str=YAHOO_FINANCE_SOCKET,
+                 max_queue: int=1024, fields: Iterable[str]=None, 
+                 where: Mapping[str, Any]=None, 
+                 ssl_context: ssl.SSLContext=None, ping_interval: float=20, 
+                 ping_timeout: float=20, compression: str="deflate"):
+        """
+        Constructor method for AsyncQuoteStreamer.
+
+        Args:
+            subscribe (Iterable): identifiers to subscribe to after connecting
+            url (str): websocket to connect to
+            max_queue (int): number of decoded quotes buffered for the consumer
+            fields (Iterable): fields to decode, defaults to all fields
+            where (Mapping): field name -> allowed value or collection of 
+                allowed values, see QuoteStreamer
+            ssl_context (SSLContext): TLS context of wss connections, by 
+                default certificates are not verified
+            ping_interval (float): seconds between websocket pings, None 
+                sends no pings
+            ping_timeout (float): seconds to wait for a pong, None waits 
+                forever
+            compression (str): "deflate" negotiates permessage-deflate, None
+                disables compression
+        """
+        self.url = url
+        self.max_queue = max_queue
+        self.ssl_context = ssl_context
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.compression = compression
+
+        self._projection = None
+        if fields is not None or where is not None:
+            self._projection = _Projection(fields, where)
+
+        self._subscribed = set(subscribe) if subscribe is not None else set()
+
+        self._websocket = None
+        self._reader = None
+        self._queue = None
+        self._closed = False
+        self._stopping = False
+
+        self._logger = logging.getLogger("yflive")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Quote:
+        if self._queue is None:
+            raise StopAsyncIteration
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        quote = await self._queue.get()
+        if quote is _CLOSED:
+            self._closed = True
+            raise StopAsyncIteration
+        return quote
+
+    async def start(self):
+        """
+        Connect to the Yahoo! Finance websocket.
+        """
+        kwargs = {"max_queue": 16, "ping_interval": self.ping_interval, 
+                  "ping_timeout": self.ping_timeout, 
+                  "compression": self.compression}
+        if self.url.startswith("wss://"):
+            context = self.ssl_context
+            if context is None:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            kwargs["ssl"] = context
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closed = False
+        self._stopping = False
+        self._websocket = await websockets.connect(self.url, **kwargs)
+        self._logger.debug("Yahoo! Finance connection opened")
+
+        if len(self._subscribed) > 0:
+            await self._send({"subscribe": list(self._subscribed)})
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def stop(self):
+        """
+        Disconnect the Yahoo! Finance websocket.
+
+        Quotes already queued can still be consumed after stopping.
+        """
+        self._stopping = True
+        if self._reader is not None and self._queue.full():
+            # wake the reader waiting on a queue nobody consumes any more
+            self._reader.cancel()
+        if self._websocket is not None:
+            self._logger.debug("Stopping AsyncQuoteStreamer...")
+            await self._websocket.close()
+            self._websocket = None
+        if self._reader is not None:
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+    async def subscribe(self, identifiers: Iterable=None):
+        """
+        Subscribe to identifiers.
+        
+        Args:
+            identifiers (Iterable): identifiers to subscribe to
+        """
+        if identifiers is None:
+            return
+        identifiers = set(identifiers) - self._subscribed
+        self._subscribed = self._subscribed | identifiers
+        self._logger.debug(f"Subscribing to {list(identifiers)}")
+        if self.is_streaming and len(identifiers) > 0:
+            await self._send({"subscribe": list(identifiers)})
+
+    async def unsubscribe(self, identifiers: Iterable=None):
+        """
+        Unsubscribe from identifiers.
+        
+        Args:
+            identifiers (Iterable): identifiers to unsubscribe from
+        """
+        if identifiers is None:
+            return
+        identifiers = self._subscribed & set(identifiers)
+        self._subscribed = self._subscribed - identifiers
+        self._logger.debug(f"Unsubscribing from {list(identifiers)}")
+        if self.is_streaming and len(identifiers) > 0:
+            await self._send({"unsubscribe": list(identifiers)})
+
+    @property
+    def subscribed(self) -> list:
+        """Get all currently tracked identifiers."""
+        return list(self._subscribed)
+
+    @property
+    def is_streaming(self) -> bool:
+        """Get current streaming state."""
+        return self._reader is not None and not self._reader.done()
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    async def _send(self, payload: dict):
+        await self._websocket.send(json.dumps(payload))
+
+    async def _read(self):
+        try:
+            async for message in self._websocket:
+                if self._stopping:
+                    # messages left unread would hold up closing
+                    continue
+                try:
+                    quote = _QuoteReader.parse(message, self._projection)
+                except Exception as e:
+                    self._logger.error("error decoding message: {}".format(e))
+                    continue
+                if quote is None:
+                    continue
+                try:
+                    await self._queue.put(quote)
+                except asyncio.CancelledError:
+                    if not self._stopping:
+                        raise
+        except websockets.exceptions.ConnectionClosed as e:
+            self._logger.debug("Connection closed: {}".format(e))
+        except Exception as e:
+            self._logger.error(e)
+        finally:
+            self._logger.debug("Connection closed")
+            self._closed = True
+            try:
+                # wakes up a consumer waiting on an empty queue, a full queue
+                # ends iteration once drained
+                self._queue.put_nowait(_CLOSED)
+            except asyncio.QueueFull:
+                pass
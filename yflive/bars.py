@@ -0,0 +1,319 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import queue
+import threading
+import logging
+
+import numpy as np
+
+from yflive.columnar import PRESENT, _BITS
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+__all__ = ['Bar', 'BarAggregator', 'backfill']
+
+_CLOSED = object()
+
+class Bar:
+    """
+    OHLCV bar of an identifier.
+
+    start is the begin of the bar in ms since the epoch, like Quote.time, and
+    interval its length in seconds. count is the number of prices in the bar.
+    """
+
+    __slots__ = ("identifier", "interval", "start", "open", "high", "low",
+                 "close", "volume", "count")
+
+    def __init__(self, identifier: str, interval: int, start: int,
+                 price: float, volume: int=0):
+        self.identifier = identifier
+        self.interval = interval
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+        self.count = 1
+
+    @property
+    def end(self) -> int:
+        """Get end of the bar in ms since the epoch, exclusive."""
+        return self.start + self.interval * 1000
+
+    def __repr__(self):
+        return '{name}({fields})'.format(
+            name=self.__class__.__name__,
+            fields=", ".join("{}={!r}".format(s, getattr(self, s))
+                             for s in self.__slots__),
+        )
+
+class BarAggregator:
+    """
+    The BarAggregator turns quotes into OHLCV bars per identifier, for
+    several intervals at once.
+
+    Bars are aligned to multiples of their interval and built from price and
+    time of every quote. Volume is the difference of consecutive dayVolume
+    values of an identifier; a decreasing dayVolume starts a new session and
+    counts in full. A bar is emitted once a quote of a later interval arrives
+    for its identifier, or on flush(). Intervals without any price produce no
+    bar, volume received in them is dropped. Quotes older than the open bar
+    only add their volume to it.
+
+    Bars are passed to on_bar, or, without callback, queued for iteration:
+
+        bars = BarAggregator(intervals=(1, 60))
+        qs = QuoteStreamer(subscribe=["AAPL"], on_quote=bars.update)
+        qs.start(should_thread=True)
+        for bar in bars:
+            ...
+
+    Callbacks:
+        on_bar -> args: (barAggregator, bar)
+    """
+
+    def __init__(self, intervals: Iterable[int]=(60,), on_bar: Callable=None,
+                 streamer: QuoteStreamer=None):
+        """
+        Constructor method for BarAggregator.
+
+        Args:
+            intervals (Iterable): bar lengths in seconds
+            on_bar (Callable): callback method for every closed bar
+            streamer (QuoteStreamer): streamer whose on_quote is set to update
+        """
+        self.intervals = tuple(intervals)
+        if not self.intervals or min(self.intervals) <= 0:
+            raise ValueError("intervals must be positive")
+        self.on_bar = on_bar
+
+        # identifier -> interval -> open bar
+        self._bars = {}
+        # identifier -> interval -> (start, volume) of an interval without bar
+        self._pending = {}
+        self._day_volume = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+        self._logger = logging.getLogger("yflive")
+
+        if streamer is not None:
+            streamer.on_quote = self.update
+
+    def __iter__(self) -> Iterator[Bar]:
+        while True:
+            bar = self._queue.get()
+            if bar is _CLOSED:
+                return
+            yield bar
+
+    def update(self, streamer: QuoteStreamer, quote: Quote):
+        """
+        Add a quote to the bars of its identifier.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+        """
+        identifier = quote.identifier
+        timestamp = quote.time
+        if identifier is None or timestamp is None:
+            return
+        price = quote.price
+        day_volume = quote.dayVolume
+
+        closed = []
+        with self._lock:
+            volume = 0
+            if day_volume is not None:
+                last = self._day_volume.get(identifier)
+                if last is not None:
+                    volume = day_volume - last if day_volume >= last \
+                        else day_volume
+                self._day_volume[identifier] = day_volume
+
+            bars = self._bars.setdefault(identifier, {})
+            pending = self._pending.setdefault(identifier, {})
+            for interval in self.intervals:
+                length = interval * 1000
+                start = timestamp - timestamp % length
+                bar = bars.get(interval)
+                if bar is not None and start < bar.start:
+                    bar.volume += volume
+                    continue
+                if bar is not None and start == bar.start:
+                    if price is not None:
+                        bar.high = max(bar.high, price)
+                        bar.low = min(bar.low, price)
+                        bar.close = price
+                        bar.count += 1
+                    bar.volume += volume
+                    continue
+
+                if bar is not None:
+                    closed.append(bar)
+                    del bars[interval]
+                carried = pending.pop(interval, None)
+                total = volume
+                if carried is not None and carried[0] == start:
+                    total += carried[1]
+                if price is None:
+                    pending[interval] = (start, total)
+                else:
+                    bars[interval] = Bar(identifier, interval, start, price,
+                                         total)
+
+        for bar in closed:
+            self._emit(bar)
+
+    def flush(self, until: int=None) -> List[Bar]:
+        """
+        Emit open bars, e.g. of identifiers without recent quotes.
+
+        Args:
+            until (int): only emit bars ending at or before this time in ms
+                since the epoch, None to emit all open bars
+
+        Returns:
+            list: emitted bars
+        """
+        closed = []
+        with self._lock:
+            for bars in self._bars.values():
+                for interval, bar in list(bars.items()):
+                    if until is None or bar.end <= until:
+                        closed.append(bar)
+                        del bars[interval]
+        for bar in closed:
+            self._emit(bar)
+        return closed
+
+    def close(self):
+        """
+        Emit all open bars and end iteration.
+        """
+        self.flush()
+        self._queue.put(_CLOSED)
+
+    def backfill(self, columns: Dict[str, np.ndarray],
+                 identifiers: List[str]) -> Dict[int, Dict[str, np.ndarray]]:
+        """
+        Compute bars of recorded data for the intervals of this aggregator,
+        see backfill().
+        """
+        return backfill(columns, identifiers, self.intervals)
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _emit(self, bar: Bar):
+        if self.on_bar is None:
+            self._queue.put(bar)
+            return
+        try:
+            self.on_bar(self, bar)
+        except Exception as e:
+            self._logger.error(
+                "error from callback {}: {}".format(self.on_bar, e))
+
+def backfill(columns: Dict[str, np.ndarray], identifiers: List[str],
+             intervals: Iterable[int]=(60,)) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Compute bars of recorded quotes in a vectorized way.
+
+    Produces the same bars as feeding the quotes to a BarAggregator in order
+    of time, without building Quote objects.
+
+        cols = QuoteColumns(fields=["identifier", "time", "price", "dayVolume"])
+        cols.extend_messages(messages)
+        bars = backfill(cols.flush(), cols.strings("identifier"), (1, 60))
+
+    Args:
+        columns (dict): identifier, time, price and dayVolume columns and the
+            "_present" mask, as returned by QuoteColumns.flush()
+        identifiers (list): string table of the identifier column
+        intervals (Iterable): bar lengths in seconds
+
+    Returns:
+        dict: interval -> columns identifier, start, open, high, low, close,
+            volume and count, sorted by identifier code and start
+    """
+    present = columns[PRESENT]
+
+    def has(field: str) -> np.ndarray:
+        return (present & np.uint64(_BITS[field])) != 0
+
+    rows = has("identifier") & has("time")
+    codes = columns["identifier"][rows]
+    time = columns["time"][rows]
+    price = columns["price"][rows].astype(np.float64)
+    has_price = has("price")[rows]
+    day_volume = columns["dayVolume"][rows]
+    has_volume = has("dayVolume")[rows]
+
+    order = np.lexsort((time, codes))
+    codes, time, price = codes[order], time[order], price[order]
+    has_price, day_volume = has_price[order], day_volume[order]
+    has_volume = has_volume[order]
+
+    # volume from dayVolume differences within every identifier
+    volume = np.zeros(len(codes), dtype=np.int64)
+    known = np.flatnonzero(has_volume)
+    if len(known) > 1:
+        current = day_volume[known]
+        diff = np.diff(current)
+        diff = np.where(diff >= 0, diff, current[1:])
+        same = codes[known[1:]] == codes[known[:-1]]
+        volume[known[1:]] = np.where(same, diff, 0)
+
+    strings = np.asarray(identifiers, dtype=object)
+    result = {}
+    for interval in intervals:
+        length = interval * 1000
+        start = time - time % length
+
+        # volume per interval, kept for intervals with at least one price
+        key = np.empty(len(codes), dtype=bool)
+        key[:1] = True
+        key[1:] = (codes[1:] != codes[:-1]) | (start[1:] != start[:-1])
+        groups = np.cumsum(key) - 1
+        group_volume = np.bincount(groups, weights=volume).astype(np.int64)
+
+        priced = np.flatnonzero(has_price)
+        p = price[priced]
+        g = groups[priced]
+        if len(g):
+            bounds = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+            last = np.r_[bounds[1:], len(g)] - 1
+            high = np.maximum.reduceat(p, bounds)
+            low = np.minimum.reduceat(p, bounds)
+        else:
+            bounds = last = np.empty(0, dtype=np.intp)
+            high = low = np.empty(0)
+        first_rows = priced[bounds]
+
+        result[interval] = {
+            "identifier": strings[codes[first_rows]],
+            "start": start[first_rows],
+            "open": p[bounds],
+            "high": high,
+            "low": low,
+            "close": p[last],
+            "volume": group_volume[g[bounds]],
+            "count": (last - bounds + 1).astype(np.int64),
+        }
+    return result
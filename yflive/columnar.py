@@ -0,0 +1,243 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Iterable, List, Union
+
+import base64
+import threading
+
+import numpy as np
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from yflive._reader import _QuoteReader
+from yflive.quote import Quote
+from yflive.yfquote_pb2 import YFQuote
+
+__all__ = ['QuoteColumns']
+
+# ==============================================================================
+# Column layout derived from yfquote.proto
+# ==============================================================================
+
+# proto type -> (numpy dtype, fill value for absent fields)
+_PROTO_DTYPES = {
+    FieldDescriptor.TYPE_FLOAT: (np.float32, np.nan),
+    FieldDescriptor.TYPE_DOUBLE: (np.float64, np.nan),
+    FieldDescriptor.TYPE_SINT64: (np.int64, 0),
+    FieldDescriptor.TYPE_INT32: (np.int32, 0),
+    # strings are interned, the column holds codes into a string table
+    FieldDescriptor.TYPE_STRING: (np.int32, -1),
+}
+
+_LAYOUT = {f.name: _PROTO_DTYPES[f.type] for f in YFQuote.DESCRIPTOR.fields}
+_STRINGS = {f.name for f in YFQuote.DESCRIPTOR.fields 
+            if f.type == FieldDescriptor.TYPE_STRING}
+
+# Bit of each field within the per-row presence mask
+_BITS = {name: 1 << i for i, name in enumerate(Quote.__fields__)}
+
+PRESENT = "_present"
+
+class QuoteColumns:
+    """
+    Columnar sink accumulating quotes into typed NumPy arrays.
+
+    Every field of Quote.__fields__ maps to one array typed after 
+    yfquote.proto (float -> float32, double -> float64, sint64 -> int64, 
+    int32 -> int32). String fields such as identifier or exchange are interned
+    and stored as int32 codes into a per field string table, see strings().
+
+    Absent fields are NaN for floating point columns, 0 for integer columns and
+    -1 for string codes. The additional uint64 column "_present" holds a bit
+    mask of the fields present in each row, with bit i set for 
+    Quote.__fields__[i].
+
+    Arrays are preallocated with chunk_size rows and double in size whenever
+    they are full, so appending takes amortized constant time. flush() hands 
+    out zero-copy views of the accumulated rows and continues on fresh 
+    arrays, so returned views are never written to again.
+
+    A QuoteColumns can be passed to QuoteStreamer as sink to decode frames
+    straight into columns.
+    """
+
+    def __init__(self, fields: Iterable[str]=None, chunk_size: int=4096):
+        """
+        Constructor method for QuoteColumns.
+
+        Args:
+            fields (Iterable): fields to keep, defaults to all Quote fields
+            chunk_size (int): number of rows allocated after every flush,
+                arrays double in size whenever full
+        """
+        fields = list(Quote.__fields__ if fields is None else fields)
+        unknown = set(fields) - set(Quote.__fields__)
+        if len(unknown) > 0:
+            raise ValueError("unknown fields {}".format(sorted(unknown)))
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        self.fields = fields
+        self.chunk_size = chunk_size
+
+        self._codes = {f: {} for f in fields if f in _STRINGS}
+        self._strings = {f: [] for f in self._codes}
+
+        self._yfquote = YFQuote()
+        self._lock = threading.Lock()
+        self._allocate()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ==========================================================================
+    # Appending
+    # ==========================================================================
+
+    def append(self, quote: Quote):
+        """
+        Append a Quote as new row.
+
+        Args:
+            quote (Quote): quote to append
+        """
+        with self._lock:
+            self._write(quote._raw)
+
+    def append_message(self, msg: Union[str, bytes]):
+        """
+        Decode a websocket message and append it as new row, without 
+        constructing a Quote.
+
+        Args:
+            msg (str): base64 encoded websocket message
+        """
+        # decoded outside the lock, into a message of its own per call
+        fields = _QuoteReader._fields(YFQuote(), base64.b64decode(msg))
+        with self._lock:
+            self._write(fields)
+
+    def extend_messages(self, msgs: Iterable[Union[str, bytes]]):
+        """
+        Decode websocket messages and append them as new rows.
+
+        Args:
+            msgs (Iterable): base64 encoded websocket messages
+        """
+        b64decode = base64.b64decode
+        decode = _QuoteReader._fields
+        yfquote = self._yfquote
+        with self._lock:
+            write = self._write
+            for msg in msgs:
+                write(decode(yfquote, b64decode(msg)))
+
+    # ==========================================================================
+    # Reading
+    # ==========================================================================
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """
+        Get zero-copy views of all rows accumulated since the last flush.
+
+        Views may go stale once more rows are appended, use flush() for views
+        that stay valid.
+
+        Returns:
+            dict: field name -> array, including the "_present" mask
+        """
+        with self._lock:
+            return self._views()
+
+    def flush(self) -> Dict[str, np.ndarray]:
+        """
+        Hand out all rows accumulated since the last flush and start over.
+
+        Returns:
+            dict: field name -> array, including the "_present" mask
+        """
+        with self._lock:
+            views = self._views()
+            self._allocate()
+            return views
+
+    def strings(self, field: str) -> List[str]:
+        """
+        Get the string table of an interned field.
+
+        Codes are stable for the lifetime of the sink, i.e. across flushes.
+
+        Args:
+            field (str): name of a string field, e.g. "identifier"
+
+        Returns:
+            list: strings indexed by code
+        """
+        return list(self._strings[field])
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _allocate(self):
+        self._size = 0
+        self._capacity = self.chunk_size
+        self._columns = {
+            f: np.full(self.chunk_size, _LAYOUT[f][1], dtype=_LAYOUT[f][0])
+            for f in self.fields}
+        self._present = np.zeros(self.chunk_size, dtype=np.uint64)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        for f, col in self._columns.items():
+            grown = np.full(capacity, _LAYOUT[f][1], dtype=col.dtype)
+            grown[:self._capacity] = col
+            self._columns[f] = grown
+        present = np.zeros(capacity, dtype=np.uint64)
+        present[:self._capacity] = self._present
+        self._present = present
+        self._capacity = capacity
+
+    def _views(self) -> Dict[str, np.ndarray]:
+        size = self._size
+        views = {f: col[:size] for f, col in self._columns.items()}
+        views[PRESENT] = self._present[:size]
+        return views
+
+    def _intern(self, field: str, value: str) -> int:
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._strings[field].append(value)
+        return code
+
+    def _write(self, fields: dict):
+        row = self._size
+        if row == self._capacity:
+            self._grow()
+
+        columns = self._columns
+        mask = 0
+        for name, value in fields.items():
+            mask |= _BITS[name]
+            col = columns.get(name)
+            if col is None:
+                continue
+            if name in self._codes:
+                value = self._intern(name, value)
+            col[row] = value
+        self._present[row] = mask
+        self._size = row + 1
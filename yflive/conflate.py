@@ -0,0 +1,174 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, List
+
+import threading
+import logging
+
+from .quote import Quote
+from .streamer import QuoteStreamer
+
+__all__ = ['ConflatingDispatcher']
+
+class ConflatingDispatcher:
+    """
+    The ConflatingDispatcher keeps the latest quote per identifier and 
+    delivers it at a fixed rate or on demand, instead of every single quote.
+
+    Yahoo! Finance only sends the fields that changed, so incoming quotes are
+    merged into the state of their identifier: fields absent from a quote keep
+    their previous value. Every delivery contains one merged quote per 
+    identifier updated since the previous delivery.
+
+    The dispatcher is fed through update, which has the signature of the 
+    QuoteStreamer on_quote callback:
+
+        conflater = ConflatingDispatcher(on_quote=print, interval=1.0)
+        qs = QuoteStreamer(subscribe=["AAPL"], on_quote=conflater.update)
+
+    Callbacks:
+        on_quote -> args: (conflatingDispatcher, quote)
+    """
+
+    def __init__(self, on_quote: Callable=None, interval: float=None, 
+                 streamer: QuoteStreamer=None):
+        """
+        Constructor method for ConflatingDispatcher.
+
+        Args:
+            on_quote (Callable): callback method for every delivered quote
+            interval (float): seconds between deliveries after start, None 
+                delivers on flush only
+            streamer (QuoteStreamer): streamer whose on_quote is set to update
+        """
+        self.on_quote = on_quote
+        self.interval = interval
+
+        self.updates = 0
+        self.delivered = 0
+
+        self._state = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._logger = logging.getLogger("yflive")
+
+        if streamer is not None:
+            streamer.on_quote = self.update
+
+    def update(self, streamer: QuoteStreamer, quote: Quote):
+        """
+        Merge a quote into the state of its identifier.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+        """
+        raw = quote._raw
+        identifier = raw.get("identifier")
+        if identifier is None:
+            return
+        with self._lock:
+            self.updates += 1
+            fields = self._state.get(identifier)
+            if fields is None:
+                self._state[identifier] = raw
+            else:
+                fields.update(raw)
+            self._dirty[identifier] = None
+
+    def flush(self) -> List[Quote]:
+        """
+        Deliver the latest quote of every identifier updated since the last 
+        delivery.
+
+        Returns:
+            list: delivered quotes, in order of their first update
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            quotes = [Quote(**self._state[i]) for i in dirty]
+            self.delivered += len(quotes)
+        for quote in quotes:
+            self._callback(self.on_quote, quote)
+        return quotes
+
+    def latest(self, identifier: str) -> Quote:
+        """
+        Get the merged state of an identifier.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            Quote: merged quote, None if nothing was received yet
+        """
+        with self._lock:
+            fields = self._state.get(identifier)
+            return Quote(**fields) if fields is not None else None
+
+    def snapshot(self) -> Dict[str, Quote]:
+        """
+        Get the merged state of all identifiers.
+
+        Returns:
+            dict: identifier -> merged quote
+        """
+        with self._lock:
+            return {i: Quote(**f) for i, f in self._state.items()}
+
+    @property
+    def conflated(self) -> int:
+        """Get number of quotes superseded before being delivered."""
+        return self.updates - self.delivered - len(self._dirty)
+
+    def start(self):
+        """
+        Deliver every interval seconds on a background thread.
+        """
+        if self.interval is None:
+            raise ValueError("interval is required for timed delivery")
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop timed delivery and deliver pending updates.
+        """
+        self._stopped.set()
+        if self._thread is not None \
+                and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.flush()
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def _callback(self, callback, *args):
+        if callback and callable(callback):
+            try:
+                callback(self, *args)
+            except Exception as e:
+                self._logger.error(
+                    "error from callback {}: {}".format(callback, e))
@@ -14,4 +14,5 @@
 
 from .market_state import MarketState
 from .option_type import OptionType
-from .quote_type import QuoteType
\ No newline at end of file
+from .quote_type import QuoteType
+from .overflow_policy import OverflowPolicy
\ No newline at end of file
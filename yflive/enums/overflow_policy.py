@@ -0,0 +1,30 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from enum import Enum
+
+class OverflowPolicy(Enum):
+    """
+    The OverflowPolicy decides what happens to a message arriving while the 
+    buffer it is queued in is full.
+
+    BLOCK stops reading from the websocket until there is room again, which 
+    pushes back on the connection. DROP_OLDEST discards the oldest queued 
+    message and DROP_NEWEST discards the arriving message. Dropped messages 
+    are counted.
+    """
+
+    BLOCK           = "block"
+    DROP_OLDEST     = "drop_oldest"
+    DROP_NEWEST     = "drop_newest"
@@ -0,0 +1,473 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, Iterable, Union
+
+import json
+import marshal
+import os
+import socket
+import stat
+import struct
+import threading
+import logging
+
+from yflive._dispatch import _RingBuffer
+from yflive.enums import OverflowPolicy
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+__all__ = ['QuoteHub', 'HubClient']
+
+# ==============================================================================
+# Wire format
+# ==============================================================================
+#
+# Every frame is prefixed with its length as uint32. Clients send JSON
+# requests like the Yahoo! Finance websocket, {"subscribe": [...]} and
+# {"unsubscribe": [...]}. The hub sends the fields of every quote as
+# marshalled dict.
+
+_HEADER = struct.Struct("<I")
+
+def _recv(sock: socket.socket, size: int) -> bytes:
+    """Read exactly size bytes, None once the connection is closed."""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    header = _recv(sock, _HEADER.size)
+    if header is None:
+        return None
+    return _recv(sock, _HEADER.unpack(header)[0])
+
+def _shutdown(sock: socket.socket):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def _require_unix_sockets():
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("QuoteHub and HubClient require Unix domain sockets, "
+                      "which are not available on this platform")
+
+class _Subscriber:
+    """
+    Connection of a local consumer to the hub.
+    """
+
+    def __init__(self, sock: socket.socket, queue_size: int,
+                 overflow: OverflowPolicy):
+        self.sock = sock
+        self.identifiers = set()
+        self.buffer = _RingBuffer(queue_size, overflow)
+        self.threads = []
+
+class QuoteHub:
+    """
+    The QuoteHub shares one upstream connection with many local consumers.
+
+    Quotes are received and decoded once by the upstream QuoteStreamer (or
+    QuoteStreamerPool) and republished over a Unix domain socket to every
+    HubClient subscribed to their identifier. Subscriptions are reference
+    counted: an identifier is subscribed upstream when the first client asks
+    for it and unsubscribed when the last client drops it.
+
+    Every client has its own bounded buffer, so a slow client does not hold
+    up the upstream connection or other clients. overflow decides what
+    happens to quotes for a full buffer.
+
+    The hub is POSIX only, it requires Unix domain sockets.
+
+        hub = QuoteHub("/tmp/yflive.sock", reconnect=True)
+        hub.start()
+
+        # in any number of other processes
+        client = HubClient("/tmp/yflive.sock", subscribe=["AAPL"],
+                           on_quote=lambda c, q: print(q))
+        client.start()
+    """
+
+    def __init__(self, path: str, streamer: QuoteStreamer=None,
+                 queue_size: int=10000,
+                 overflow: Union[OverflowPolicy, str]=OverflowPolicy.DROP_OLDEST,
+                 **kwargs):
+        """
+        Constructor method for QuoteHub.
+
+        Args:
+            path (str): path of the Unix domain socket
+            streamer (QuoteStreamer): upstream streamer or streamer pool, its
+                on_quote is replaced. Created from kwargs if not given
+            queue_size (int): number of quotes buffered per client
+            overflow (OverflowPolicy): what to do with quotes for a full
+                client buffer
+            **kwargs: passed on to the upstream QuoteStreamer
+        """
+        _require_unix_sockets()
+        if queue_size <= 0:
+            raise ValueError("queue_size must be positive")
+
+        self.path = path
+        self.queue_size = queue_size
+        self.overflow = OverflowPolicy(overflow)
+        self.streamer = streamer if streamer is not None \
+            else QuoteStreamer(**kwargs)
+        self.streamer.on_quote = self._publish
+
+        # identifier -> subscribed clients, replaced on every change so
+        # quotes are published without taking the lock
+        self._subscribers = {}
+        self._clients = set()
+        self._dropped = 0
+        self._server = None
+        self._accepting = None
+        self._stopped = threading.Event()
+        self._lock = threading.RLock()
+
+        self._logger = logging.getLogger("yflive")
+
+    def start(self, should_thread: bool=False):
+        """
+        Listen for clients and connect upstream.
+
+        Args:
+            should_thread (bool): Should return instead of blocking until
+                stopped
+        """
+        self._stopped.clear()
+        try:
+            if stat.S_ISSOCK(os.stat(self.path).st_mode):
+                # left behind by a hub that did not stop properly
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        self._server.settimeout(0.1)
+        self._accepting = threading.Thread(target=self._accept, daemon=True,
+                                           name="yflive-hub")
+        self._accepting.start()
+
+        self.streamer.start(should_thread=True)
+        if not should_thread:
+            try:
+                self._stopped.wait()
+            except KeyboardInterrupt:
+                self.stop()
+
+    def stop(self):
+        """
+        Disconnect all clients and the upstream connection.
+        """
+        self._stopped.set()
+        if self._accepting is not None \
+                and self._accepting is not threading.current_thread():
+            self._accepting.join()
+        self._accepting = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            self._drop(client)
+        current = threading.current_thread()
+        for client in clients:
+            for thread in client.threads:
+                if thread is not current:
+                    thread.join()
+        self.streamer.stop()
+
+    @property
+    def subscribed(self) -> Dict[str, int]:
+        """Get number of clients subscribed to each identifier."""
+        return {i: len(c) for i, c in self._subscribers.items()}
+
+    @property
+    def clients(self) -> int:
+        """Get number of connected clients."""
+        return len(self._clients)
+
+    @property
+    def dropped(self) -> int:
+        """Get number of quotes dropped for full client buffers."""
+        with self._lock:
+            return self._dropped + sum(c.buffer.dropped for c in self._clients)
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _publish(self, streamer: QuoteStreamer, quote: Quote):
+        clients = self._subscribers.get(quote.identifier)
+        if not clients:
+            return
+        payload = marshal.dumps(quote._raw)
+        frame = _HEADER.pack(len(payload)) + payload
+        for client in clients:
+            client.buffer.put(frame)
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            sock.settimeout(None)
+            client = _Subscriber(sock, self.queue_size, self.overflow)
+            with self._lock:
+                self._clients.add(client)
+            client.threads = [
+                threading.Thread(target=target, args=(client,), daemon=True)
+                for target in (self._read, self._write)]
+            for thread in client.threads:
+                thread.start()
+            self._logger.debug("Hub client connected")
+
+    def _read(self, client: _Subscriber):
+        try:
+            while True:
+                frame = _recv_frame(client.sock)
+                if frame is None:
+                    break
+                request = json.loads(frame)
+                if "subscribe" in request:
+                    self._subscribe(client, request["subscribe"])
+                if "unsubscribe" in request:
+                    self._unsubscribe(client, request["unsubscribe"])
+        except (OSError, ValueError) as e:
+            self._logger.debug("Hub client failed: {}".format(e))
+        finally:
+            self._drop(client)
+
+    def _write(self, client: _Subscriber):
+        buffer = client.buffer
+        try:
+            while True:
+                frames = [buffer.get()]
+                # send whatever queued up meanwhile at once
+                while len(buffer) > 0 and len(frames) < 256:
+                    frames.append(buffer.get())
+                client.sock.sendall(b"".join(frames))
+        except IndexError:
+            # buffer closed
+            pass
+        except OSError as e:
+            self._logger.debug("Hub client failed: {}".format(e))
+        finally:
+            self._drop(client)
+
+    def _drop(self, client: _Subscriber):
+        with self._lock:
+            if client not in self._clients:
+                return
+            self._clients.remove(client)
+            self._dropped += client.buffer.dropped
+            self._unsubscribe(client, list(client.identifiers))
+        client.buffer.close()
+        _shutdown(client.sock)
+        client.sock.close()
+        self._logger.debug("Hub client disconnected")
+
+    def _subscribe(self, client: _Subscriber, identifiers: Iterable[str]):
+        with self._lock:
+            if client not in self._clients:
+                return
+            added = []
+            for identifier in identifiers:
+                if identifier in client.identifiers:
+                    continue
+                client.identifiers.add(identifier)
+                clients = self._subscribers.get(identifier, ())
+                self._subscribers = dict(self._subscribers)
+                self._subscribers[identifier] = clients + (client,)
+                if not clients:
+                    added.append(identifier)
+            if added:
+                self.streamer.subscribe(added)
+
+    def _unsubscribe(self, client: _Subscriber, identifiers: Iterable[str]):
+        with self._lock:
+            removed = []
+            for identifier in identifiers:
+                if identifier not in client.identifiers:
+                    continue
+                client.identifiers.remove(identifier)
+                clients = tuple(c for c in self._subscribers[identifier]
+                                if c is not client)
+                self._subscribers = dict(self._subscribers)
+                if clients:
+                    self._subscribers[identifier] = clients
+                else:
+                    del self._subscribers[identifier]
+                    removed.append(identifier)
+            if removed:
+                self.streamer.unsubscribe(removed)
+
+class HubClient:
+    """
+    The HubClient receives quotes from a QuoteHub, with the callback
+    interface of QuoteStreamer. Like the hub, it is POSIX only.
+
+    Callbacks:
+        on_connect -> args: (hubClient)
+        on_quote -> args: (hubClient, quote)
+        on_error -> args: (hubClient, error)
+        on_close -> args: (hubClient)
+    """
+
+    def __init__(self, path: str, subscribe: Iterable=None,
+                 on_connect: Callable=None, on_quote: Callable=None,
+                 on_error: Callable=None, on_close: Callable=None):
+        """
+        Constructor method for HubClient.
+
+        Args:
+            path (str): path of the hub's Unix domain socket
+            subscribe (Iterable): identifiers to subscribe to after connecting
+            on_connect (Callable): callback method after connecting to the hub
+            on_quote (Callable): callback method for receiving a quote
+            on_error (Callable): callback method for encountering an error
+            on_close (Callable): callback method after the connection closes
+        """
+        _require_unix_sockets()
+        self.path = path
+        self.on_connect = on_connect
+        self.on_quote = on_quote
+        self.on_error = on_error
+        self.on_close = on_close
+
+        self._subscribed = set(subscribe) if subscribe is not None else set()
+        self._sock = None
+        self._thread = None
+        self._send_lock = threading.Lock()
+
+        self._logger = logging.getLogger("yflive")
+
+    def start(self, should_thread: bool=False):
+        """
+        Connect to the hub.
+
+        Args:
+            should_thread (bool): Should run on non blocking thread
+        """
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.path)
+        self._callback(self.on_connect)
+        if self._subscribed:
+            self._send({"subscribe": list(self._subscribed)})
+
+        if should_thread:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            self._run()
+
+    def stop(self):
+        """
+        Disconnect from the hub.
+        """
+        sock = self._sock
+        if sock is not None:
+            _shutdown(sock)
+        if self._thread is not None \
+                and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def subscribe(self, identifiers: Iterable=None):
+        """
+        Subscribe to identifiers.
+
+        Args:
+            identifiers (Iterable): identifiers to subscribe to
+        """
+        if identifiers is None:
+            return
+        identifiers = set(identifiers) - self._subscribed
+        self._subscribed |= identifiers
+        if self.is_streaming and identifiers:
+            self._send({"subscribe": list(identifiers)})
+
+    def unsubscribe(self, identifiers: Iterable=None):
+        """
+        Unsubscribe from identifiers.
+
+        Args:
+            identifiers (Iterable): identifiers to unsubscribe from
+        """
+        if identifiers is None:
+            return
+        identifiers = self._subscribed & set(identifiers)
+        self._subscribed -= identifiers
+        if self.is_streaming and identifiers:
+            self._send({"unsubscribe": list(identifiers)})
+
+    @property
+    def subscribed(self) -> list:
+        """Get all currently tracked identifiers."""
+        return list(self._subscribed)
+
+    @property
+    def is_streaming(self) -> bool:
+        """Get current connection state."""
+        return self._sock is not None
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _send(self, request: dict):
+        payload = json.dumps(request).encode()
+        with self._send_lock:
+            self._sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+    def _run(self):
+        sock = self._sock
+        try:
+            while True:
+                frame = _recv_frame(sock)
+                if frame is None:
+                    break
+                self._callback(self.on_quote, Quote(**marshal.loads(frame)))
+        except OSError as e:
+            self._callback(self.on_error, e)
+        finally:
+            self._sock = None
+            sock.close()
+            self._callback(self.on_close)
+
+    def _callback(self, callback, *args):
+        if callback and callable(callback):
+            try:
+                callback(self, *args)
+            except Exception as e:
+                self._logger.error(
+                    "error from callback {}: {}".format(callback, e))
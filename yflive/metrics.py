@@ -0,0 +1,379 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Sequence, Tuple
+
+import bisect
+import socketserver
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from yflive.quote import Quote
+
+__all__ = ['StreamerMetrics', 'DURATION_BUCKETS', 'LATENCY_BUCKETS']
+
+# Upper bounds in seconds of the decode and callback time buckets
+DURATION_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                    5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25,
+                    0.5, 1.0)
+
+# Upper bounds in seconds of the exchange to receive latency buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0)
+
+class _Histogram:
+    """
+    Histogram of observations in fixed buckets, like a Prometheus histogram.
+
+    counts holds one count per bucket and one for observations above the
+    last bound, not cumulated.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile, None if empty."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(self.bounds + (float("inf"),),
+                                self._cumulative())),
+        }
+
+    def _cumulative(self) -> List[int]:
+        total = 0
+        cumulative = []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+class StreamerMetrics:
+    """
+    Throughput and latency metrics of a QuoteStreamer.
+
+    Created by QuoteStreamer(metrics=True) and available as
+    QuoteStreamer.metrics. Counts received frames and bytes, times decoding
+    and the on_quote callback, measures the latency between the exchange time
+    of a quote (Quote.time) and its delivery by the local clock, and counts
+    quotes per identifier. Queue depths, drops and reconnects are read from
+    the streamer.
+
+        qs = QuoteStreamer(subscribe=["AAPL"], metrics=True)
+        qs.start(should_thread=True)
+        qs.metrics.serve(9100)  # Prometheus text format on /metrics
+        ...
+        qs.metrics.snapshot()
+
+    Decoding done by decoder processes is not timed.
+    """
+
+    def __init__(self, streamer):
+        """
+        Constructor method for StreamerMetrics.
+
+        Args:
+            streamer (QuoteStreamer): streamer to report on
+        """
+        self.streamer = streamer
+
+        self.frames = 0
+        self.bytes = 0
+        self.decode = _Histogram(DURATION_BUCKETS)
+        self.callback = _Histogram(DURATION_BUCKETS)
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.ticks = {}
+
+        self._sampled = (time.monotonic(), 0, 0, {})
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # ==========================================================================
+    # Recording
+    # ==========================================================================
+
+    def record_frame(self, size: int):
+        """
+        Count a received websocket frame.
+
+        Args:
+            size (int): length of the frame
+        """
+        # only ever called from the websocket thread
+        self.frames += 1
+        self.bytes += size
+
+    def record_decode(self, seconds: float):
+        """
+        Add the time taken to decode a message.
+
+        Args:
+            seconds (float): decode time
+        """
+        with self._lock:
+            self.decode.observe(seconds)
+
+    def record_delivery(self, quote: Quote, seconds: float,
+                        received: float=None):
+        """
+        Add a delivered quote with the time taken by its callback.
+
+        Args:
+            quote (Quote): delivered quote
+            seconds (float): callback time
+            received (float): seconds since the epoch at delivery, defaults
+                to now
+        """
+        identifier = quote.identifier
+        timestamp = quote.time
+        with self._lock:
+            self.callback.observe(seconds)
+            if identifier is not None:
+                self.ticks[identifier] = self.ticks.get(identifier, 0) + 1
+            if timestamp is not None:
+                if received is None:
+                    received = time.time()
+                self.latency.observe(received - timestamp / 1000)
+
+    # ==========================================================================
+    # Reporting
+    # ==========================================================================
+
+    def snapshot(self) -> Dict:
+        """
+        Get all metrics.
+
+        Rates are measured since the previous call of snapshot, or since the
+        metrics were created.
+
+        Returns:
+            dict: frames, bytes, frame_rate, byte_rate, decode, callback and
+                latency histograms (count, sum, p50, p99 and cumulative
+                buckets), queue_depths (messages per worker, bytes per
+                decoder, quotes queued for iteration), dropped,
+                reconnects, downtime, subscribed, ticks and tick_rates per
+                identifier
+        """
+        now = time.monotonic()
+        with self._lock:
+            frames, size = self.frames, self.bytes
+            ticks = dict(self.ticks)
+            histograms = {name: getattr(self, name).snapshot()
+                          for name in ("decode", "callback", "latency")}
+
+        sampled_at, sampled_frames, sampled_bytes, sampled_ticks = \
+            self._sampled
+        self._sampled = (now, frames, size, ticks)
+        elapsed = now - sampled_at
+
+        def rate(current: int, previous: int) -> float:
+            return (current - previous) / elapsed if elapsed > 0 else 0.0
+
+        streamer = self.streamer
+        snapshot = {
+            "frames": frames,
+            "bytes": size,
+            "frame_rate": rate(frames, sampled_frames),
+            "byte_rate": rate(size, sampled_bytes),
+        }
+        snapshot.update(histograms)
+        snapshot.update({
+            "queue_depths": dict(self._depths()),
+            "dropped": streamer.dropped,
+            "reconnects": streamer.reconnects,
+            "downtime": streamer.downtime,
+            "subscribed": len(streamer.subscribed),
+            "ticks": ticks,
+            "tick_rates": {identifier: rate(count,
+                                            sampled_ticks.get(identifier, 0))
+                           for identifier, count in ticks.items()},
+        })
+        return snapshot
+
+    def prometheus(self) -> str:
+        """
+        Get all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: metrics prefixed with yflive_
+        """
+        with self._lock:
+            frames, size = self.frames, self.bytes
+            ticks = dict(self.ticks)
+            histograms = [(name, getattr(self, name).bounds,
+                           getattr(self, name)._cumulative(),
+                           getattr(self, name).sum)
+                          for name in ("decode", "callback", "latency")]
+
+        streamer = self.streamer
+        lines = []
+
+        def metric(name: str, kind: str, text: str,
+                   samples: List[Tuple[str, float]]):
+            lines.append("# HELP yflive_{} {}".format(name, text))
+            lines.append("# TYPE yflive_{} {}".format(name, kind))
+            for labels, value in samples:
+                lines.append("yflive_{}{} {}".format(name, labels,
+                                                     _number(value)))
+
+        metric("frames_total", "counter", "Websocket frames received.",
+               [("", frames)])
+        metric("bytes_total", "counter", "Websocket bytes received.",
+               [("", size)])
+        for name, bounds, cumulative, total in histograms:
+            text = {
+                "decode": "Seconds spent decoding a message.",
+                "callback": "Seconds spent in the on_quote callback.",
+                "latency": "Seconds between exchange time and delivery.",
+            }[name]
+            samples = [('_bucket{{le="{}"}}'.format(_number(bound)), count)
+                       for bound, count in zip(bounds + (float("inf"),),
+                                               cumulative)]
+            samples.append(("_sum", total))
+            samples.append(("_count", cumulative[-1]))
+            lines.append("# HELP yflive_{}_seconds {}".format(name, text))
+            lines.append("# TYPE yflive_{}_seconds histogram".format(name))
+            for suffix, value in samples:
+                lines.append("yflive_{}_seconds{} {}".format(
+                    name, suffix, _number(value)))
+        metric("queue_depth", "gauge", "Items currently queued.",
+               [('{{queue="{}"}}'.format(_escape(queue)), depth)
+                for queue, depth in self._depths()])
+        metric("dropped_total", "counter",
+               "Messages dropped on buffer overflow.",
+               [("", streamer.dropped)])
+        metric("reconnects_total", "counter", "Reconnects of the websocket.",
+               [("", streamer.reconnects)])
+        metric("downtime_seconds_total", "counter",
+               "Seconds spent disconnected while reconnecting.",
+               [("", streamer.downtime)])
+        metric("subscribed", "gauge", "Identifiers subscribed to.",
+               [("", len(streamer.subscribed))])
+        metric("ticks_total", "counter", "Quotes delivered per identifier.",
+               [('{{identifier="{}"}}'.format(_escape(identifier)), count)
+                for identifier, count in sorted(ticks.items())])
+        return "\n".join(lines) + "\n"
+
+    # ==========================================================================
+    # HTTP endpoint
+    # ==========================================================================
+
+    def serve(self, port: int=9100, host: str="127.0.0.1") -> int:
+        """
+        Serve the metrics in Prometheus text format on /metrics from a
+        background thread.
+
+        Args:
+            port (int): port to listen on, 0 picks a free port
+            host (str): address to listen on
+
+        Returns:
+            int: port listened on
+        """
+        if self._server is not None:
+            return self._server.server_address[1]
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _Server((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self._server.server_address[1]
+
+    def close(self):
+        """
+        Stop serving the metrics.
+        """
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            self._thread.join()
+            self._thread = None
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _depths(self) -> List[Tuple[str, int]]:
+        depths = []
+        dispatcher = self.streamer._dispatcher
+        if dispatcher is not None:
+            # messages per worker thread, bytes per decoder process
+            kind = "decoder" if self.streamer.processes > 0 else "worker"
+            depths.extend(("{}{}".format(kind, i), depth)
+                          for i, depth in enumerate(dispatcher.depths))
+        quotes = self.streamer._queue
+        if quotes is not None:
+            depths.append(("iteration", quotes.qsize()))
+        return depths
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
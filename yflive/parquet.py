@@ -0,0 +1,246 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Iterable, Union
+
+import threading
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from yflive.columnar import PRESENT, QuoteColumns, _BITS
+from yflive.quote import Quote
+from yflive.yfquote_pb2 import YFQuote
+
+__all__ = ['ParquetSink', 'quote_schema']
+
+# ==============================================================================
+# Arrow schema derived from yfquote.proto
+# ==============================================================================
+
+_ARROW_TYPES = {
+    FieldDescriptor.TYPE_FLOAT: pa.float32(),
+    FieldDescriptor.TYPE_DOUBLE: pa.float64(),
+    FieldDescriptor.TYPE_SINT64: pa.int64(),
+    FieldDescriptor.TYPE_INT32: pa.int32(),
+    FieldDescriptor.TYPE_STRING: pa.string(),
+}
+
+# String fields with few distinct values, stored dictionary encoded
+DICTIONARY_FIELDS = ("identifier", "exchange", "currency")
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+_ARROW_LAYOUT = {
+    f.name: _DICTIONARY if f.name in DICTIONARY_FIELDS
+    else _ARROW_TYPES[f.type] for f in YFQuote.DESCRIPTOR.fields}
+
+def quote_schema(fields: Iterable[str]=None) -> pa.Schema:
+    """
+    Get the Arrow schema of quotes.
+
+    Columns are typed after yfquote.proto and nullable, absent fields are
+    null. identifier, exchange and currency are dictionary encoded.
+
+    Args:
+        fields (Iterable): fields to include, defaults to all Quote fields
+
+    Returns:
+        pyarrow.Schema: schema with one column per field
+    """
+    fields = Quote.__fields__ if fields is None else fields
+    return pa.schema([pa.field(f, _ARROW_LAYOUT[f]) for f in fields])
+
+class ParquetSink:
+    """
+    Sink writing quotes to a Parquet file.
+
+    Quotes are decoded into typed columns (see QuoteColumns) and written as
+    one row group once row_group_size rows are buffered, or every
+    flush_interval seconds. The file uses the schema of quote_schema().
+    Buffered rows are written on flush() and close().
+
+    A ParquetSink can be passed to QuoteStreamer as sink:
+
+        with ParquetSink("quotes.parquet", flush_interval=60) as sink:
+            qs = QuoteStreamer(subscribe=["AAPL"], sink=sink)
+            qs.start()
+    """
+
+    def __init__(self, path: str, fields: Iterable[str]=None,
+                 row_group_size: int=65536, flush_interval: float=None,
+                 compression: str="snappy"):
+        """
+        Constructor method for ParquetSink.
+
+        Args:
+            path (str): path of the Parquet file
+            fields (Iterable): fields to keep, defaults to all Quote fields
+            row_group_size (int): buffered rows after which a row group is
+                written
+            flush_interval (float): seconds after which buffered rows are
+                written, None to write by size only
+            compression (str): Parquet compression codec
+        """
+        if row_group_size <= 0:
+            raise ValueError("row_group_size must be positive")
+
+        self.path = path
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+
+        self._columns = QuoteColumns(fields,
+                                     chunk_size=min(row_group_size, 4096))
+        self.schema = quote_schema(self._columns.fields)
+        self.row_groups = 0
+        self.rows = 0
+
+        self._writer = pq.ParquetWriter(path, self.schema,
+                                        compression=compression)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._logger = logging.getLogger("yflive")
+
+        if flush_interval is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    # ==========================================================================
+    # Appending
+    # ==========================================================================
+
+    def append(self, quote: Quote):
+        """
+        Append a Quote as new row.
+
+        Args:
+            quote (Quote): quote to append
+        """
+        self._columns.append(quote)
+        self._check()
+
+    def append_message(self, msg: Union[str, bytes]):
+        """
+        Decode a websocket message and append it as new row.
+
+        Args:
+            msg (str): base64 encoded websocket message
+        """
+        self._columns.append_message(msg)
+        self._check()
+
+    def extend_messages(self, msgs: Iterable[Union[str, bytes]]):
+        """
+        Decode websocket messages and append them as new rows.
+
+        Args:
+            msgs (Iterable): base64 encoded websocket messages
+        """
+        self._columns.extend_messages(msgs)
+        self._check()
+
+    # ==========================================================================
+    # Writing
+    # ==========================================================================
+
+    def flush(self):
+        """
+        Write all buffered rows as row group.
+        """
+        with self._lock:
+            if self._writer is None:
+                return
+            views = self._columns.flush()
+            if len(views[PRESENT]) == 0:
+                return
+            self._writer.write_batch(self._record_batch(views),
+                                     row_group_size=len(views[PRESENT]))
+            self.row_groups += 1
+            self.rows += len(views[PRESENT])
+
+    def close(self):
+        """
+        Write buffered rows and close the file.
+        """
+        self._stopped.set()
+        if self._thread is not None \
+                and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+        self.flush()
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def record_batch(self) -> pa.RecordBatch:
+        """
+        Get the buffered rows as Arrow record batch, without writing them.
+
+        Returns:
+            pyarrow.RecordBatch: buffered rows
+        """
+        return self._record_batch(self._columns.view())
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _check(self):
+        if len(self._columns) >= self.row_group_size:
+            self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self._logger.error("error writing row group: {}".format(e))
+
+    def _record_batch(self, views: Dict[str, np.ndarray]) -> pa.RecordBatch:
+        present = views[PRESENT]
+        arrays = []
+        for field in self.schema:
+            absent = (present & np.uint64(_BITS[field.name])) == 0
+            values = views[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values, mask=absent, type=pa.int32()),
+                    pa.array(self._columns.strings(field.name),
+                             type=pa.string())))
+            elif field.type == pa.string():
+                # other strings are rare, decode them from their string table
+                strings = pa.array(self._columns.strings(field.name),
+                                   type=pa.string())
+                arrays.append(strings.take(
+                    pa.array(values, mask=absent, type=pa.int32())))
+            else:
+                arrays.append(pa.array(values, mask=absent, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
@@ -0,0 +1,344 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import bisect
+import math
+import queue
+import threading
+import time
+import zlib
+import logging
+
+from .quote import Quote
+from .streamer import QuoteStreamer
+
+__all__ = ['QuoteStreamerPool']
+
+# ==============================================================================
+# Consistent hashing
+# ==============================================================================
+
+class _HashRing:
+    """
+    Consistent hash ring mapping identifiers to shard indices.
+
+    Every shard is placed on the ring several times, an identifier belongs to
+    the first shard found walking clockwise from its own hash. The hash is 
+    stable across processes, so identifiers land on the same shard every run.
+    """
+
+    def __init__(self, shards: int, replicas: int=64):
+        points = sorted(
+            (self._hash("{}:{}".format(shard, replica)), shard)
+            for shard in range(shards) for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+        self.shards = shards
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return zlib.crc32(key.encode())
+
+    def walk(self, identifier: str) -> Iterator[int]:
+        """Yield all shards in ring order, starting at the owner."""
+        start = bisect.bisect(self._points, self._hash(identifier))
+        seen = set()
+        n = len(self._shards)
+        for i in range(n):
+            shard = self._shards[(start + i) % n]
+            if shard not in seen:
+                seen.add(shard)
+                yield shard
+                if len(seen) == self.shards:
+                    return
+
+# ==============================================================================
+# QuoteStreamerPool
+# ==============================================================================
+
+_STOPPED = object()
+
+class QuoteStreamerPool:
+    """
+    The QuoteStreamerPool spreads subscriptions over several QuoteStreamer 
+    connections.
+
+    Identifiers are assigned to shards by consistent hashing with bounded 
+    loads: an identifier goes to the first shard on the hash ring holding less
+    than load_factor times the average number of identifiers. Unsubscribing
+    moves identifiers off shards exceeding that bound again.
+
+    Quotes of all shards are merged into one on_quote callback, or can be
+    consumed by iterating the pool:
+
+        for quote in pool:
+            print(quote)
+
+    Callbacks:
+        on_connect -> args: (quoteStreamerPool, shard)
+        on_quote -> args: (quoteStreamerPool, quote)
+        on_error -> args: (quoteStreamerPool, error)
+        on_close -> args: (quoteStreamerPool, shard)
+    """
+
+    def __init__(self, shards: int=4, subscribe: Iterable=None, 
+                 on_connect: Callable=None, on_quote: Callable=None, 
+                 on_error: Callable=None, on_close: Callable=None, 
+                 load_factor: float=1.25, queue_size: int=10000, **kwargs):
+        """
+        Constructor method for QuoteStreamerPool.
+
+        Args:
+            shards (int): number of websocket connections
+            subscribe (Iterable): identifiers to subscribe to after connecting
+            on_connect (Callable): callback method after a shard connects
+            on_quote (Callable): callback method for receiving a quote
+            on_error (Callable): callback method for encountering an error
+            on_close (Callable): callback method after a shard closes 
+            load_factor (float): maximum shard load relative to the average
+            queue_size (int): number of quotes buffered for iteration
+            **kwargs: passed on to every QuoteStreamer, e.g. reconnect=True
+        """
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+        if load_factor < 1:
+            raise ValueError("load_factor must be at least 1")
+
+        self.on_connect = on_connect
+        self.on_quote = on_quote
+        self.on_error = on_error
+        self.on_close = on_close
+        self.load_factor = load_factor
+        self.queue_size = queue_size
+
+        self._ring = _HashRing(shards)
+        self._streamers = [self._create_streamer(i, kwargs) 
+                           for i in range(shards)]
+        self._assigned = {}
+        self._members = [set() for _ in range(shards)]
+        self._messages = [0] * shards
+        self._sampled = [(time.monotonic(), 0)] * shards
+        self._queue = None
+        self._stopped = threading.Event()
+        self._lock = threading.RLock()
+
+        self._logger = logging.getLogger("yflive")
+
+        if subscribe is not None:
+            self.subscribe(subscribe)
+
+    def __iter__(self) -> Iterator[Quote]:
+        # quotes are queued from the moment iteration is requested
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=self.queue_size)
+        return self._iterate()
+
+    def _iterate(self) -> Iterator[Quote]:
+        while True:
+            quote = self._queue.get()
+            if quote is _STOPPED:
+                return
+            yield quote
+
+    def start(self, should_thread: bool=False):
+        """
+        Connect all shards to the Yahoo! Finance websocket.
+
+        Args:
+            should_thread (bool): Should return instead of blocking until 
+                stopped
+        """
+        self._stopped.clear()
+        for streamer in self._streamers:
+            streamer.start(should_thread=True)
+        if not should_thread:
+            try:
+                self._stopped.wait()
+            except KeyboardInterrupt:
+                self.stop()
+
+    def stop(self):
+        """
+        Disconnect all shards.
+        """
+        self._stopped.set()
+        for streamer in self._streamers:
+            streamer.stop()
+        if self._queue is not None:
+            while True:
+                try:
+                    self._queue.put_nowait(_STOPPED)
+                    return
+                except queue.Full:
+                    self._queue.get_nowait()
+
+    def subscribe(self, identifiers: Iterable=None):
+        """
+        Subscribe to identifiers, each on the shard it is assigned to.
+        
+        Args:
+            identifiers (Iterable): identifiers to subscribe to
+        """
+        if identifiers is None:
+            return
+        with self._lock:
+            added = {}
+            for identifier in identifiers:
+                if identifier in self._assigned:
+                    continue
+                shard = self._place(identifier, len(self._assigned) + 1)
+                self._assign(identifier, shard)
+                added.setdefault(shard, []).append(identifier)
+            for shard, ids in added.items():
+                self._streamers[shard].subscribe(ids)
+
+    def unsubscribe(self, identifiers: Iterable=None):
+        """
+        Unsubscribe from identifiers and rebalance overloaded shards.
+        
+        Args:
+            identifiers (Iterable): identifiers to unsubscribe from
+        """
+        if identifiers is None:
+            return
+        with self._lock:
+            removed = {}
+            for identifier in identifiers:
+                shard = self._assigned.pop(identifier, None)
+                if shard is None:
+                    continue
+                self._members[shard].discard(identifier)
+                removed.setdefault(shard, []).append(identifier)
+            for shard, ids in removed.items():
+                self._streamers[shard].unsubscribe(ids)
+            self._rebalance()
+
+    @property
+    def subscribed(self) -> list:
+        """Get all currently tracked identifiers."""
+        return list(self._assigned)
+
+    @property
+    def shards(self) -> List[QuoteStreamer]:
+        """Get the QuoteStreamer of every shard."""
+        return list(self._streamers)
+
+    def shard_of(self, identifier: str) -> int:
+        """
+        Get the shard an identifier is subscribed on.
+
+        Args:
+            identifier (str): subscribed identifier
+
+        Returns:
+            int: shard index, None if not subscribed
+        """
+        return self._assigned.get(identifier)
+
+    def stats(self) -> List[Dict]:
+        """
+        Get statistics of every shard.
+
+        The rate is measured since the previous call of stats.
+
+        Returns:
+            list: per shard dict with identifiers, messages, rate (messages 
+                per second), streaming, reconnects and dropped
+        """
+        now = time.monotonic()
+        stats = []
+        for i, streamer in enumerate(self._streamers):
+            messages = self._messages[i]
+            sampled_at, sampled = self._sampled[i]
+            elapsed = now - sampled_at
+            self._sampled[i] = (now, messages)
+            stats.append({
+                "shard": i,
+                "identifiers": len(self._members[i]),
+                "messages": messages,
+                "rate": (messages - sampled) / elapsed if elapsed > 0 else 0.0,
+                "streaming": streamer.is_streaming,
+                "reconnects": streamer.reconnects,
+                "dropped": streamer.dropped,
+            })
+        return stats
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _create_streamer(self, shard: int, kwargs: dict) -> QuoteStreamer:
+        return QuoteStreamer(
+            on_connect=lambda qs: self._callback(self.on_connect, shard),
+            on_quote=lambda qs, quote: self._shard_quote(shard, quote),
+            on_error=lambda qs, error: self._callback(self.on_error, error),
+            on_close=lambda qs: self._callback(self.on_close, shard),
+            **kwargs)
+
+    def _bound(self, total: int) -> int:
+        return max(1, math.ceil(self.load_factor * total / len(self._streamers)))
+
+    def _place(self, identifier: str, total: int, exclude: int=None) -> int:
+        bound = self._bound(total)
+        for shard in self._ring.walk(identifier):
+            if shard != exclude and len(self._members[shard]) < bound:
+                return shard
+        # every shard is at the bound, fall back to the least loaded one
+        return min(range(len(self._members)), 
+                   key=lambda s: len(self._members[s]))
+
+    def _assign(self, identifier: str, shard: int):
+        self._assigned[identifier] = shard
+        self._members[shard].add(identifier)
+
+    def _rebalance(self):
+        total = len(self._assigned)
+        bound = self._bound(total)
+        for shard, members in enumerate(self._members):
+            excess = len(members) - bound
+            if excess <= 0:
+                continue
+            moved = {}
+            for identifier in sorted(members)[:excess]:
+                target = self._place(identifier, total, exclude=shard)
+                members.discard(identifier)
+                self._assign(identifier, target)
+                moved.setdefault(target, []).append(identifier)
+            self._logger.debug("Rebalancing {} identifiers off shard {}"
+                               .format(excess, shard))
+            for target, ids in moved.items():
+                self._streamers[shard].unsubscribe(ids)
+                self._streamers[target].subscribe(ids)
+
+    def _shard_quote(self, shard: int, quote: Quote):
+        self._messages[shard] += 1
+        self._callback(self.on_quote, quote)
+        if self._queue is not None:
+            # a full queue blocks the shard until consumed or stopped
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put(quote, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+    def _callback(self, callback, *args):
+        if callback and callable(callback):
+            try:
+                callback(self, *args)
+            except Exception as e:
+                self._logger.error(
+                    "error from callback {}: {}".format(callback, e))
@@ -17,8 +17,14 @@ from typing import Any
 import uuid
 import pprint
 
+from enum import Enum
+
 from yflive.enums import MarketState, OptionType, QuoteType
 
+# Fields converted to their enum type on first access
+_ENUMS = {"quoteType": QuoteType, "marketState": MarketState, 
+          "optionType": OptionType}
+
 class Quote:
     """
     The Quote object is provided for handling market data in a structured way.
@@ -27,6 +33,11 @@ class Quote:
     Yahoo! Finance and offer a common interface for acquiring the data 
     provided.
 
+    Quotes use a fixed slotted layout, so they carry no per instance dict. 
+    Fields absent from a message read as None. quoteType, marketState and 
+    optionType are converted to their enum type once, on first access. A 
+    unique id is only generated when _uuid is accessed.
+
     Object structure adapted from alpaca-trade-api-python Entity object.
     """
 
@@ -40,36 +51,84 @@ class Quote:
                   "priceHint", "vol_24hr", "volAllCurrencies", "fromCurrency", 
                   "lastMarket", "circulatingSupply", "marketCap"]
 
+    # field name -> slot name, enum fields are stored behind a property
+    _slot_names = {f: "_" + f if f in _ENUMS else f for f in __fields__}
+
+    __slots__ = tuple(_slot_names.values()) + ("_id",)
+
     def __init__(self, **kwargs):
         """
         Initialize new Quote object.
 
-        Provides property access to the dictionary object, based on the original
-        object stored in _raw.
+        Provides property access to the fields given, the original values are
+        available as dictionary through _raw.
         """
-        self._uuid = str(uuid.uuid4())
-        self._raw = kwargs
+        slots = self._slot_names
+        for key, val in kwargs.items():
+            try:
+                object.__setattr__(self, slots[key], val)
+            except KeyError:
+                raise TypeError(
+                    "Quote got an unexpected field '{}'".format(key)) from None
 
     def __getattr__(self, key) -> Any:
-        if key not in self.__fields__:
-            raise ValueError
-
-        if key in self._raw:
-            val = self._raw[key]
-            if isinstance(val, int):
-                if key == "quoteType":
-                    return QuoteType(val)
-                elif key == "marketState":
-                    return MarketState(val)
-                elif key == "optionType":
-                    return OptionType(val)
-            return val
-
-        return None
+        # only reached for empty slots and unknown names
+        if key in self._slot_names:
+            return None
+        if key.startswith("_"):
+            raise AttributeError(key)
+        raise ValueError
+
+    @property
+    def _uuid(self) -> str:
+        """Unique id of this quote, generated on first access."""
+        try:
+            return self._id
+        except AttributeError:
+            self._id = str(uuid.uuid4())
+            return self._id
+
+    @property
+    def _raw(self) -> dict:
+        """Dictionary of all fields present, holding the original values."""
+        raw = {}
+        for key, slot in self._slot_names.items():
+            try:
+                val = object.__getattribute__(self, slot)
+            except AttributeError:
+                continue
+            raw[key] = val.value if isinstance(val, Enum) else val
+        return raw
+
+    def __getstate__(self) -> dict:
+        return self._raw
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
 
     def __repr__(self):
         return '{name}({raw})'.format(
             name=self.__class__.__name__,
             raw=pprint.pformat(self._raw, indent=4),
         )
-        
\ No newline at end of file
+
+def _enum_field(key: str, enum: type) -> property:
+    slot = Quote._slot_names[key]
+    member = Quote.__dict__[slot]
+
+    def getter(self):
+        try:
+            val = member.__get__(self, Quote)
+        except AttributeError:
+            return None
+        if isinstance(val, int):
+            val = enum(val)
+            member.__set__(self, val)
+        return val
+
+    return property(getter, doc="{} of the quote".format(enum.__name__))
+
+for _key, _enum in _ENUMS.items():
+    setattr(Quote, _key, _enum_field(_key, _enum))
+
+del _key, _enum
@@ -0,0 +1,619 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+import base64
+import bisect
+import contextlib
+import glob
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import logging
+
+from array import array
+
+from yflive._reader import _QuoteReader, _encode
+from yflive.quote import Quote
+
+__all__ = ['TickRecorder', 'TickReader', 'TickReplayer']
+
+# ==============================================================================
+# Segment file format
+# ==============================================================================
+#
+# Every segment starts with MAGIC followed by records of
+#
+#     int64   receive time in nanoseconds since the epoch
+#     uint32  length of the message
+#     bytes   serialized YFQuote message (base64 decoded)
+
+MAGIC = b"YFT1"
+SUFFIX = ".yft"
+
+_RECORD = struct.Struct("<qI")
+
+try:
+    _time_ns = time.time_ns
+except AttributeError:
+    # Python 3.6
+    def _time_ns() -> int:
+        return int(time.time() * 1e9)
+
+# ==============================================================================
+# Index file format
+# ==============================================================================
+#
+# Closed segments get a sidecar index at <segment>.idx, starting with
+#
+#     4s      INDEX_MAGIC
+#     int64   receive time of the first and last record
+#     uint64  end offset of the last record
+#     uint32  number of time index entries, number of identifiers
+#
+# followed by the sparse time index, the receive times (int64) and offsets
+# (uint64) of every index_interval-th record, and for every identifier
+#
+#     uint16  length of the identifier, uint32 number of records
+#     bytes   identifier
+#     uint64  offsets of all records of the identifier
+#
+# Receive times are expected to be non-decreasing within a recording.
+
+INDEX_MAGIC = b"YFI1"
+INDEX_SUFFIX = ".idx"
+
+_INDEX_HEADER = struct.Struct("<4sqqQII")
+_INDEX_ENTRY = struct.Struct("<HI")
+
+def _segment_path(directory: str, prefix: str, index: int) -> str:
+    return os.path.join(directory, "{}-{:06d}{}".format(prefix, index, SUFFIX))
+
+def _segments(directory: str, prefix: str) -> List[str]:
+    pattern = "{}-{}{}".format(prefix, "[0-9]" * 6, SUFFIX)
+    return sorted(glob.glob(os.path.join(directory, pattern)))
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_little_endian(typecode: str, buf: bytes) -> array:
+    values = array(typecode, buf)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+class _SegmentIndex:
+    """
+    Sparse time index and per identifier record offsets of a segment.
+    """
+
+    def __init__(self, interval: int=256):
+        self.interval = interval
+        self.count = 0
+        self.first = 0
+        self.last = 0
+        self.end = len(MAGIC)
+        self.times = array("q")
+        self.offsets = array("Q")
+        self.identifiers = {}
+
+    def add(self, timestamp: int, offset: int, end: int, identifier: str):
+        if self.count % self.interval == 0:
+            self.times.append(timestamp)
+            self.offsets.append(offset)
+        if self.count == 0:
+            self.first = timestamp
+        self.count += 1
+        self.last = timestamp
+        self.end = end
+        if identifier is not None:
+            offsets = self.identifiers.get(identifier)
+            if offsets is None:
+                offsets = self.identifiers[identifier] = array("Q")
+            offsets.append(offset)
+
+    def seek(self, timestamp: int) -> int:
+        """
+        Offset of an indexed record received before timestamp, all records 
+        before it were received before timestamp as well.
+        """
+        i = bisect.bisect_left(self.times, timestamp)
+        return self.offsets[i - 1] if i else len(MAGIC)
+
+    def dump(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, self.first, self.last, 
+                                       self.end, len(self.times), 
+                                       len(self.identifiers)))
+            f.write(_little_endian(self.times))
+            f.write(_little_endian(self.offsets))
+            for identifier, offsets in self.identifiers.items():
+                name = identifier.encode()
+                f.write(_INDEX_ENTRY.pack(len(name), len(offsets)))
+                f.write(name)
+                f.write(_little_endian(offsets))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "_SegmentIndex":
+        with open(path, "rb") as f:
+            buf = f.read()
+        magic, first, last, end, n, identifiers = \
+            _INDEX_HEADER.unpack_from(buf)
+        if magic != INDEX_MAGIC:
+            raise ValueError("{} is not a tick index".format(path))
+
+        index = cls()
+        index.first, index.last, index.end = first, last, end
+        pos = _INDEX_HEADER.size
+        index.times = _from_little_endian("q", buf[pos:pos + 8 * n])
+        pos += 8 * n
+        index.offsets = _from_little_endian("Q", buf[pos:pos + 8 * n])
+        pos += 8 * n
+        for _ in range(identifiers):
+            length, count = _INDEX_ENTRY.unpack_from(buf, pos)
+            pos += _INDEX_ENTRY.size
+            identifier = buf[pos:pos + length].decode()
+            pos += length
+            index.identifiers[identifier] = \
+                _from_little_endian("Q", buf[pos:pos + 8 * count])
+            pos += 8 * count
+        return index
+
+class TickRecorder:
+    """
+    The TickRecorder appends received messages to binary segment files.
+
+    Messages are stored base64 decoded with their receive time, length 
+    prefixed. Once a segment exceeds segment_size bytes, recording continues 
+    in the next segment. Recording resumes after the last existing segment of
+    the directory.
+
+    While recording, a sparse time index and the record offsets of every 
+    identifier are collected. They are written next to a segment once it is 
+    closed, which lets TickReader seek directly to the records of a time 
+    range or identifier.
+
+    The recorder can be used as QuoteStreamer sink:
+
+        with TickRecorder("ticks/") as recorder:
+            qs = QuoteStreamer(subscribe=["AAPL"], sink=recorder)
+            qs.start()
+    """
+
+    def __init__(self, directory: str, prefix: str="ticks", 
+                 segment_size: int=64 * 1024 * 1024, 
+                 index_interval: int=256):
+        """
+        Constructor method for TickRecorder.
+
+        Args:
+            directory (str): directory segments are written to
+            prefix (str): file name prefix of segments
+            segment_size (int): bytes after which a new segment is started
+            index_interval (int): records between time index entries, None to
+                not index segments
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+
+        os.makedirs(directory, exist_ok=True)
+        existing = _segments(directory, prefix)
+        self._index = 0
+        if existing:
+            self._index = int(existing[-1][-len(SUFFIX) - 6:-len(SUFFIX)]) + 1
+        self._file = None
+        self._size = 0
+        self._segment_index = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def path(self) -> str:
+        """Get path of the segment currently written to."""
+        return None if self._file is None else self._file.name
+
+    def append_message(self, msg: Union[str, bytes], timestamp: int=None):
+        """
+        Record a websocket message.
+
+        Args:
+            msg (str): base64 encoded websocket message
+            timestamp (int): receive time in ns, defaults to now
+        """
+        self.write(base64.b64decode(msg), timestamp)
+
+    def append(self, quote: Quote, timestamp: int=None):
+        """
+        Record a quote. Every field of the quote is written, including
+        fields holding their default value.
+
+        Args:
+            quote (Quote): quote to record
+            timestamp (int): receive time in ns, defaults to now
+        """
+        self.write(_encode(quote._raw), timestamp)
+
+    def write(self, buf: bytes, timestamp: int=None):
+        """
+        Record a serialized YFQuote message.
+
+        Args:
+            buf (bytes): base64 decoded message
+            timestamp (int): receive time in ns, defaults to now
+        """
+        if timestamp is None:
+            timestamp = _time_ns()
+        with self._lock:
+            if self._file is None or self._size >= self.segment_size:
+                self._rotate()
+            offset = self._size
+            self._file.write(_RECORD.pack(timestamp, len(buf)))
+            self._file.write(buf)
+            self._size += _RECORD.size + len(buf)
+            if self._segment_index is not None:
+                self._segment_index.add(
+                    timestamp, offset, self._size, 
+                    _QuoteReader.peek_identifier_bytes(buf))
+
+    def flush(self):
+        """
+        Flush buffered records to the current segment.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """
+        Close the current segment.
+        """
+        with self._lock:
+            self._close_segment()
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _rotate(self):
+        self._close_segment()
+        path = _segment_path(self.directory, self.prefix, self._index)
+        self._index += 1
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._size = len(MAGIC)
+        if self.index_interval is not None:
+            self._segment_index = _SegmentIndex(self.index_interval)
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            if self._segment_index is not None \
+                    and self._segment_index.count:
+                self._segment_index.dump(self._file.name + INDEX_SUFFIX)
+            self._file = None
+            self._segment_index = None
+
+class TickReader:
+    """
+    The TickReader reads recorded segments through memory maps.
+
+    Iterating a reader yields decoded Quote objects, records() yields the 
+    receive time and raw message of every record. Records can be limited to 
+    a range of receive times and a set of identifiers. Segments with an index
+    are only read from the first record of the range on, or at the offsets of
+    the requested identifiers. Segments without one, like the segment still 
+    being recorded, are scanned.
+
+        reader = TickReader("ticks/")
+        for quotes in reader.batches(start=t0, end=t1, identifiers=["AAPL"]):
+            ...
+    """
+
+    def __init__(self, path: str, prefix: str="ticks"):
+        """
+        Constructor method for TickReader.
+
+        Args:
+            path (str): segment file or directory of segments
+            prefix (str): file name prefix of segments in a directory
+        """
+        if os.path.isdir(path):
+            self.segments = _segments(path, prefix)
+        else:
+            self.segments = [path]
+        self._indexes = {}
+
+    def __iter__(self) -> Iterator[Quote]:
+        parse = _QuoteReader.parse_bytes
+        for _, buf in self.records():
+            yield parse(buf)
+
+    def records(self, start: int=None, end: int=None, 
+                identifiers: Iterable[str]=None
+                ) -> Iterator[Tuple[int, bytes]]:
+        """
+        Iterate records of all segments.
+
+        Args:
+            start (int): first receive time in ns to include
+            end (int): receive time in ns to stop before
+            identifiers (Iterable): identifiers to include, None for all
+
+        Yields:
+            tuple: receive time and serialized YFQuote message
+        """
+        if identifiers is not None:
+            identifiers = set(identifiers)
+        for segment in self.segments:
+            with self._open(segment) as mm:
+                if mm is None:
+                    continue
+                index = self._index(segment, len(mm))
+                if index is None:
+                    records = self._scan(mm, start, identifiers)
+                elif (start is not None and index.last < start) or \
+                        (end is not None and index.first >= end):
+                    continue
+                else:
+                    records = self._seek(mm, index, start, identifiers)
+
+                for timestamp, buf in records:
+                    if end is not None and timestamp >= end:
+                        return
+                    yield timestamp, buf
+
+    def batches(self, size: int=4096, start: int=None, end: int=None, 
+                identifiers: Iterable[str]=None) -> Iterator[List[Quote]]:
+        """
+        Iterate decoded quotes in batches.
+
+        Args:
+            size (int): maximum number of quotes per batch
+            start (int): first receive time in ns to include
+            end (int): receive time in ns to stop before
+            identifiers (Iterable): identifiers to include, None for all
+
+        Yields:
+            list: Quote objects
+        """
+        parse = _QuoteReader.parse_many_bytes
+        bufs = []
+        for _, buf in self.records(start, end, identifiers):
+            bufs.append(buf)
+            if len(bufs) >= size:
+                yield parse(bufs)
+                bufs = []
+        if bufs:
+            yield parse(bufs)
+
+    def reindex(self, interval: int=256) -> int:
+        """
+        Write the index of segments without one, e.g. after a recorder did 
+        not close properly.
+
+        Args:
+            interval (int): records between time index entries
+
+        Returns:
+            int: number of segments indexed
+        """
+        indexed = 0
+        for segment in self.segments:
+            if os.path.exists(segment + INDEX_SUFFIX):
+                continue
+            index = _SegmentIndex(interval)
+            with self._open(segment) as mm:
+                if mm is None:
+                    continue
+                pos = len(MAGIC)
+                for timestamp, buf in self._read(mm, pos):
+                    offset = pos
+                    pos += _RECORD.size + len(buf)
+                    index.add(timestamp, offset, pos, 
+                              _QuoteReader.peek_identifier_bytes(buf))
+            if index.count:
+                index.dump(segment + INDEX_SUFFIX)
+                self._indexes.pop(segment, None)
+                indexed += 1
+        return indexed
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _index(self, segment: str, size: int) -> _SegmentIndex:
+        index = self._indexes.get(segment)
+        if index is None:
+            try:
+                index = _SegmentIndex.load(segment + INDEX_SUFFIX)
+            except (OSError, ValueError, struct.error):
+                return None
+            self._indexes[segment] = index
+        # an index not covering the segment is ignored
+        return index if index.end == size else None
+
+    def _seek(self, mm: mmap.mmap, index: _SegmentIndex, start: int, 
+              identifiers: set) -> Iterator[Tuple[int, bytes]]:
+        pos = len(MAGIC) if start is None else index.seek(start)
+        if identifiers is None:
+            records = self._read(mm, pos)
+        else:
+            offsets = []
+            for identifier in identifiers:
+                found = index.identifiers.get(identifier)
+                if found is not None:
+                    offsets.append(found[bisect.bisect_left(found, pos):])
+            records = self._read_at(mm, heapq.merge(*offsets))
+
+        for timestamp, buf in records:
+            if start is None or timestamp >= start:
+                yield timestamp, buf
+
+    def _scan(self, mm: mmap.mmap, start: int, 
+              identifiers: set) -> Iterator[Tuple[int, bytes]]:
+        peek = _QuoteReader.peek_identifier_bytes
+        for timestamp, buf in self._read(mm, len(MAGIC)):
+            if start is not None and timestamp < start:
+                continue
+            if identifiers is not None and peek(buf) not in identifiers:
+                continue
+            yield timestamp, buf
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _open(segment: str) -> Iterator[mmap.mmap]:
+        with open(segment, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= len(MAGIC):
+                yield None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(MAGIC)] != MAGIC:
+                    raise ValueError("{} is not a tick segment".format(segment))
+                yield mm
+
+    @staticmethod
+    def _read(mm: mmap.mmap, pos: int) -> Iterator[Tuple[int, bytes]]:
+        size = len(mm)
+        while pos + _RECORD.size <= size:
+            timestamp, length = _RECORD.unpack_from(mm, pos)
+            pos += _RECORD.size
+            if pos + length > size:
+                # record still being written
+                return
+            yield timestamp, mm[pos:pos + length]
+            pos += length
+
+    @staticmethod
+    def _read_at(mm: mmap.mmap, 
+                 offsets: Iterable[int]) -> Iterator[Tuple[int, bytes]]:
+        unpack_from = _RECORD.unpack_from
+        for pos in offsets:
+            timestamp, length = unpack_from(mm, pos)
+            pos += _RECORD.size
+            yield timestamp, mm[pos:pos + length]
+
+class TickReplayer:
+    """
+    The TickReplayer replays recorded ticks through the QuoteStreamer callback 
+    interface.
+
+    With speed None, quotes are replayed as fast as possible. Otherwise they
+    are paced by their receive times, speed 1.0 being real time and 10.0 ten
+    times faster.
+
+    Callbacks:
+        on_quote -> args: (tickReplayer, quote)
+        on_close -> args: (tickReplayer)
+    """
+
+    def __init__(self, reader: TickReader, on_quote: Callable=None, 
+                 on_close: Callable=None, speed: float=None, sink=None):
+        """
+        Constructor method for TickReplayer.
+
+        Args:
+            reader (TickReader): recorded ticks to replay
+            on_quote (Callable): callback method for every replayed quote
+            on_close (Callable): callback method after the replay ended
+            speed (float): replay speed relative to real time, None for no 
+                pacing
+            sink (QuoteColumns): sink receiving every quote through 
+                append(quote)
+        """
+        self.reader = reader
+        self.on_quote = on_quote
+        self.on_close = on_close
+        self.speed = speed
+        self.sink = sink
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._logger = logging.getLogger("yflive")
+
+    def start(self, should_thread: bool=False):
+        """
+        Start the replay.
+
+        Args:
+            should_thread (bool): Should run on non blocking thread
+        """
+        self._stopped.clear()
+        if should_thread:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            self._run()
+
+    def stop(self):
+        """
+        Stop the replay.
+        """
+        self._stopped.set()
+        if self._thread is not None \
+                and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def is_streaming(self) -> bool:
+        """Get current replay state."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        parse = _QuoteReader.parse_bytes
+        started = None
+        try:
+            for timestamp, buf in self.reader.records():
+                if self._stopped.is_set():
+                    break
+                if self.speed is not None:
+                    now = time.monotonic()
+                    if started is None:
+                        started = (now, timestamp)
+                    elapsed = (timestamp - started[1]) / 1e9 / self.speed
+                    due = started[0] + elapsed
+                    if due > now and self._stopped.wait(due - now):
+                        break
+                quote = parse(buf)
+                if self.sink is not None:
+                    self.sink.append(quote)
+                self._callback(self.on_quote, quote)
+        finally:
+            self._callback(self.on_close)
+
+    def _callback(self, callback, *args):
+        if callback and callable(callback):
+            try:
+                callback(self, *args)
+            except Exception as e:
+                self._logger.error(
+                    "error from callback {}: {}".format(callback, e))
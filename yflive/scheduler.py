@@ -0,0 +1,335 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, Iterable
+
+import math
+import threading
+import time
+import logging
+
+from .quote import Quote
+from .streamer import QuoteStreamer
+
+__all__ = ['SubscriptionScheduler']
+
+# Rate advantage of hot identifiers over challengers, so that identifiers of
+# similar rates do not flap between hot and cold
+_HYSTERESIS = 1.25
+
+class _Activity:
+    """
+    Tick statistics of an identifier.
+
+    ticks and exposure are exponentially decayed sums of the ticks received
+    and the seconds spent subscribed, so their ratio is the recent tick rate
+    while subscribed. Exposure is taken as at least floor seconds, so a single
+    quote shortly after subscribing does not look like a high rate.
+    """
+
+    __slots__ = ("ticks", "exposure", "last_tick", "subscribed_at")
+
+    def __init__(self):
+        self.ticks = 0.0
+        self.exposure = 0.0
+        self.last_tick = None
+        self.subscribed_at = None
+
+    def rate(self, floor: float) -> float:
+        return self.ticks / max(self.exposure, floor) if self.ticks else 0.0
+
+class SubscriptionScheduler:
+    """
+    The SubscriptionScheduler covers a universe larger than a connection
+    should carry, keeping at most budget identifiers subscribed at once.
+
+    The tick rate of every identifier is measured while it is subscribed. The
+    most active identifiers form the hot set and stay subscribed. The
+    remaining slots, at least rotation of them, are used to rotate through the
+    quiet rest of the universe: the identifiers whose latest quote, or latest
+    attempt to get one, is oldest are subscribed in batches, and unsubscribed
+    again once they delivered a quote or after dwell seconds. Cold identifiers
+    turning out to be active are promoted to the hot set, hot identifiers
+    going quiet are demoted.
+
+    Every interval seconds after start (or on every call of step) the
+    scheduler updates the subscriptions of the streamer. Its quotes have to
+    pass through update, which is set as on_quote of the streamer; quotes
+    are forwarded to on_quote:
+
+        scheduler = SubscriptionScheduler(qs, universe, budget=500,
+                                          on_quote=lambda qs, q: print(q))
+        scheduler.start()
+        qs.start()
+
+    Identifiers the streamer is subscribed to outside of the universe are left
+    alone. A universe not larger than the budget is subscribed to entirely.
+
+    Callbacks:
+        on_quote -> args: (quoteStreamer, quote)
+    """
+
+    def __init__(self, streamer: QuoteStreamer, identifiers: Iterable=None,
+                 budget: int=500, rotation: int=None, dwell: float=10.0,
+                 interval: float=1.0, window: float=300.0,
+                 on_quote: Callable=None):
+        """
+        Constructor method for SubscriptionScheduler.
+
+        Args:
+            streamer (QuoteStreamer): streamer to manage the subscriptions of
+            identifiers (Iterable): universe of identifiers
+            budget (int): maximum identifiers subscribed at once
+            rotation (int): slots kept for rotating cold identifiers,
+                defaults to a quarter of the budget
+            dwell (float): seconds a cold identifier stays subscribed
+                waiting for a quote
+            interval (float): seconds between scheduling steps after start
+            window (float): seconds over which tick rates are averaged
+            on_quote (Callable): callback method for every received quote
+        """
+        if budget <= 0:
+            raise ValueError("budget must be positive")
+        if rotation is None:
+            rotation = max(1, budget // 4)
+        if not 0 < rotation <= budget:
+            raise ValueError("rotation must be positive and within budget")
+
+        self.streamer = streamer
+        self.budget = budget
+        self.rotation = rotation
+        self.dwell = dwell
+        self.interval = interval
+        self.window = window
+        self.on_quote = on_quote
+
+        self._activity = {}
+        self._hot = set()
+        self._cold = set()
+        self._subscribed = set()
+        self._stepped = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._logger = logging.getLogger("yflive")
+
+        self.add(identifiers if identifiers is not None else ())
+        streamer.on_quote = self.update
+
+    # ==========================================================================
+    # Universe
+    # ==========================================================================
+
+    def add(self, identifiers: Iterable):
+        """
+        Add identifiers to the universe, they are scheduled on the next step.
+
+        Args:
+            identifiers (Iterable): identifiers to add
+        """
+        with self._lock:
+            for identifier in identifiers:
+                if identifier not in self._activity:
+                    self._activity[identifier] = _Activity()
+
+    def remove(self, identifiers: Iterable):
+        """
+        Remove identifiers from the universe, unsubscribing them on the next
+        step.
+
+        Args:
+            identifiers (Iterable): identifiers to remove
+        """
+        with self._lock:
+            for identifier in identifiers:
+                self._activity.pop(identifier, None)
+                self._hot.discard(identifier)
+                self._cold.discard(identifier)
+
+    @property
+    def universe(self) -> list:
+        """Get all identifiers scheduled."""
+        return list(self._activity)
+
+    @property
+    def hot(self) -> list:
+        """Get identifiers permanently subscribed."""
+        return list(self._hot)
+
+    @property
+    def cold(self) -> list:
+        """Get cold identifiers currently rotated in."""
+        return list(self._cold)
+
+    def rates(self) -> Dict[str, float]:
+        """
+        Get the tick rates measured while subscribed.
+
+        Returns:
+            dict: identifier -> ticks per second
+        """
+        with self._lock:
+            return {i: a.rate(self.dwell) for i, a in self._activity.items()}
+
+    def staleness(self, now: float=None) -> Dict[str, float]:
+        """
+        Get the age of the latest quote of every identifier.
+
+        Args:
+            now (float): time.monotonic() to measure against, defaults to now
+
+        Returns:
+            dict: identifier -> seconds since the latest quote, None if no
+                quote was received yet
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return {i: None if a.last_tick is None else now - a.last_tick
+                    for i, a in self._activity.items()}
+
+    # ==========================================================================
+    # Scheduling
+    # ==========================================================================
+
+    def update(self, streamer: QuoteStreamer, quote: Quote,
+               now: float=None):
+        """
+        Count a quote and forward it to on_quote.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+            now (float): time.monotonic() of receipt, defaults to now
+        """
+        activity = self._activity.get(quote.identifier)
+        if activity is not None:
+            with self._lock:
+                activity.ticks += 1
+                activity.last_tick = time.monotonic() if now is None else now
+        if self.on_quote is not None:
+            try:
+                self.on_quote(streamer, quote)
+            except Exception as e:
+                self._logger.error(
+                    "error from callback {}: {}".format(self.on_quote, e))
+
+    def step(self, now: float=None):
+        """
+        Update rates, the hot set and the cold rotation, and subscribe and
+        unsubscribe the streamer accordingly.
+
+        Args:
+            now (float): time.monotonic() of the step, defaults to now
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = 0.0 if self._stepped is None else now - self._stepped
+            self._stepped = now
+            self._measure(elapsed)
+            if len(self._activity) <= self.budget:
+                self._hot = set(self._activity)
+                self._cold = set()
+            else:
+                self._schedule(now)
+            wanted = self._hot | self._cold
+            added = wanted - self._subscribed
+            removed = self._subscribed - wanted
+            self._subscribed = wanted
+
+        if removed:
+            self.streamer.unsubscribe(removed)
+        if added:
+            self.streamer.subscribe(added)
+
+    def start(self):
+        """
+        Step every interval seconds on a background thread.
+        """
+        self._stopped.clear()
+        self.step()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop stepping. Subscriptions are left as they are.
+        """
+        self._stopped.set()
+        if self._thread is not None \
+                and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                self._logger.error("error scheduling subscriptions: {}"
+                                   .format(e))
+
+    def _measure(self, elapsed: float):
+        if elapsed <= 0:
+            return
+        # decayed sums over the window, only counting subscribed time
+        decay = math.exp(-elapsed / self.window)
+        for identifier in self._subscribed:
+            activity = self._activity.get(identifier)
+            if activity is not None:
+                activity.ticks *= decay
+                activity.exposure = activity.exposure * decay \
+                    + self.window * (1 - decay)
+
+    def _schedule(self, now: float):
+        activity = self._activity
+
+        # hot set: the highest measured rates, favouring current members
+        def score(identifier: str) -> float:
+            rate = activity[identifier].rate(self.dwell)
+            return rate * _HYSTERESIS if identifier in self._hot else rate
+        measured = [i for i, a in activity.items() if a.ticks > 0]
+        measured.sort(key=score, reverse=True)
+        hot = set(measured[:self.budget - self.rotation])
+
+        # cold rotation: keep identifiers still waiting for a quote
+        cold = set()
+        for identifier in self._cold - hot:
+            a = activity[identifier]
+            waiting = a.last_tick is None or a.last_tick < a.subscribed_at
+            if waiting and now - a.subscribed_at < self.dwell:
+                cold.add(identifier)
+
+        # and fill free slots with the identifiers looked at longest ago, by
+        # their latest quote or the latest attempt to get one
+        def looked_at(identifier: str) -> float:
+            a = activity[identifier]
+            times = [t for t in (a.last_tick, a.subscribed_at) if t is not None]
+            return max(times) if times else -math.inf
+        free = self.budget - len(hot) - len(cold)
+        if free > 0:
+            candidates = [i for i in activity
+                          if i not in hot and i not in cold
+                          and i not in self._cold]
+            candidates.sort(key=looked_at)
+            for identifier in candidates[:free]:
+                activity[identifier].subscribed_at = now
+                cold.add(identifier)
+
+        self._hot = hot
+        self._cold = cold
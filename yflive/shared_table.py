@@ -0,0 +1,359 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Union
+
+import base64
+import os
+import struct
+import threading
+import logging
+
+from multiprocessing import resource_tracker, shared_memory
+
+from yflive._reader import _Projection
+from yflive.quote import Quote
+from yflive.streamer import QuoteStreamer
+
+__all__ = ['SharedQuoteTable', 'SharedQuoteReader', 'TABLE_FIELDS']
+
+# ==============================================================================
+# Table layout
+# ==============================================================================
+
+# Fields kept per identifier and their struct format
+TABLE_FIELDS = (
+    ("price", "d"), ("bid", "d"), ("ask", "d"), ("time", "q"),
+    ("bidSize", "q"), ("askSize", "q"), ("lastSize", "q"), ("dayVolume", "q"),
+    ("change", "d"), ("changePercent", "d"), ("dayHigh", "d"), ("dayLow", "d"),
+)
+
+TABLE_MAGIC = b"YFQT"
+
+# Longest identifier in bytes, longer ones are dropped
+IDENTIFIER_SIZE = 32
+
+# magic, capacity, row size, rows in use
+_HEADER = struct.Struct("<4sIII")
+_COUNT_OFFSET = 12
+_HEADER_SIZE = 64
+
+_SEQUENCE = struct.Struct("<Q")
+
+# identifier, bit mask of present fields, values
+_ROW = struct.Struct("<{}sI4x{}".format(
+    IDENTIFIER_SIZE, "".join(fmt for _, fmt in TABLE_FIELDS)))
+
+# rows are padded to cache lines, writes to one row do not disturb readers
+# of another
+ROW_SIZE = -(-(_SEQUENCE.size + _ROW.size) // 64) * 64
+
+_NAMES = tuple(name for name, _ in TABLE_FIELDS)
+_DEFAULTS = tuple(0.0 if fmt == "d" else 0 for _, fmt in TABLE_FIELDS)
+
+# Names of the tables created by this process
+_OWNED = set()
+
+def _offset(row: int) -> int:
+    return _HEADER_SIZE + row * ROW_SIZE
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    # before Python 3.13 attaching registers the block with the resource
+    # tracker, which unlinks it once this process exits
+    if os.name == "posix" and name not in _OWNED:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+class SharedQuoteTable:
+    """
+    Writer of the latest state of every identifier into a shared memory table
+    other processes read with a SharedQuoteReader.
+
+    Quotes are merged per identifier, fields absent from a quote keep their
+    previous value. Every identifier gets a fixed row of TABLE_FIELDS on its
+    first quote, rows are never reused. Each row is guarded by a sequence
+    lock: the writer makes its sequence number odd, writes the row and makes
+    it even again, readers retry while the number is odd or changed during
+    their read. There is a single writer per table, safe to feed from several
+    threads.
+
+    The table is fed through update, which has the signature of the
+    QuoteStreamer on_quote callback, or used as sink:
+
+        table = SharedQuoteTable("yflive-quotes", capacity=10000)
+        qs = QuoteStreamer(subscribe=["AAPL"], sink=table)
+        qs.start()
+
+        # in any other process
+        reader = SharedQuoteReader("yflive-quotes")
+        reader.get("AAPL")["price"]
+    """
+
+    def __init__(self, name: str=None, capacity: int=4096,
+                 streamer: QuoteStreamer=None):
+        """
+        Constructor method for SharedQuoteTable.
+
+        Args:
+            name (str): name of the shared memory block, None picks a name
+            capacity (int): maximum number of identifiers
+            streamer (QuoteStreamer): streamer whose on_quote is set to update
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.dropped = 0
+
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=True, size=_offset(capacity))
+        self.name = self._shm.name
+        _OWNED.add(self.name)
+        _HEADER.pack_into(self._shm.buf, 0, TABLE_MAGIC, capacity, ROW_SIZE, 0)
+
+        # identifier -> (row, encoded identifier, present mask, values)
+        self._rows = {}
+        self._projection = _Projection(("identifier",) + _NAMES)
+        self._lock = threading.Lock()
+
+        self._logger = logging.getLogger("yflive")
+
+        if streamer is not None:
+            streamer.on_quote = self.update
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def update(self, streamer: QuoteStreamer, quote: Quote):
+        """
+        Merge a quote into the row of its identifier.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+        """
+        self._write(quote._raw)
+
+    def append(self, quote: Quote):
+        """
+        Merge a Quote into the row of its identifier.
+
+        Args:
+            quote (Quote): quote to merge
+        """
+        self._write(quote._raw)
+
+    def append_message(self, msg: Union[str, bytes]):
+        """
+        Decode the table fields of a websocket message and merge them into
+        the row of its identifier.
+
+        Args:
+            msg (str): base64 encoded websocket message
+        """
+        self._write(self._projection.decode(base64.b64decode(msg)))
+
+    def close(self):
+        """
+        Release and remove the shared memory block. Attached readers keep
+        their mapping until they close.
+        """
+        with self._lock:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
+                _OWNED.discard(self.name)
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _write(self, fields: dict):
+        identifier = fields.get("identifier")
+        if identifier is None:
+            return
+        with self._lock:
+            if self._shm is None:
+                return
+            row = self._rows.get(identifier)
+            if row is None:
+                row = self._add(identifier)
+                if row is None:
+                    return
+
+            index, encoded, mask, values = row
+            for i, name in enumerate(_NAMES):
+                value = fields.get(name)
+                if value is not None:
+                    values[i] = value
+                    mask |= 1 << i
+            row[2] = mask
+
+            buf = self._shm.buf
+            offset = _offset(index)
+            sequence = _SEQUENCE.unpack_from(buf, offset)[0]
+            _SEQUENCE.pack_into(buf, offset, sequence + 1)
+            _ROW.pack_into(buf, offset + _SEQUENCE.size, encoded, mask,
+                           *values)
+            _SEQUENCE.pack_into(buf, offset, sequence + 2)
+
+    def _add(self, identifier: str) -> list:
+        encoded = identifier.encode("utf-8")
+        if len(self._rows) >= self.capacity or len(encoded) > IDENTIFIER_SIZE:
+            self.dropped += 1
+            return None
+        index = len(self._rows)
+        row = self._rows[identifier] = [index, encoded, 0, list(_DEFAULTS)]
+        # the identifier is in place before the row is counted
+        _ROW.pack_into(self._shm.buf, _offset(index) + _SEQUENCE.size,
+                       encoded, 0, *_DEFAULTS)
+        struct.pack_into("<I", self._shm.buf, _COUNT_OFFSET, index + 1)
+        return row
+
+class SharedQuoteReader:
+    """
+    Reader of a SharedQuoteTable, from any process on the same host.
+
+    Reads are plain memory reads of the mapped table, without locks, system
+    calls or pickling. Each read returns a consistent state of one row.
+
+        reader = SharedQuoteReader("yflive-quotes")
+        reader.get("AAPL")   # {"price": ..., "bid": ..., ...}
+        reader.snapshot()    # all identifiers
+    """
+
+    def __init__(self, name: str):
+        """
+        Constructor method for SharedQuoteReader.
+
+        Args:
+            name (str): name of the shared memory block of the table
+        """
+        self.name = name
+        self._shm = _attach(name)
+        magic, capacity, row_size, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        if magic != TABLE_MAGIC or row_size != ROW_SIZE:
+            self._shm.close()
+            raise ValueError("{} is not a compatible quote table".format(name))
+        self.capacity = capacity
+        self.retries = 0
+
+        # identifier -> row, rows are never reused
+        self._rows = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._rows)
+
+    @property
+    def identifiers(self) -> List[str]:
+        """Get identifiers in the table."""
+        self._refresh()
+        return list(self._rows)
+
+    def get(self, identifier: str) -> Dict[str, Union[float, int]]:
+        """
+        Read the latest state of an identifier.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            dict: field name -> value of fields received so far, None if the
+                identifier is not in the table
+        """
+        row = self._rows.get(identifier)
+        if row is None:
+            self._refresh()
+            row = self._rows.get(identifier)
+            if row is None:
+                return None
+        mask, values = self._read(row)
+        return {name: values[i] for i, name in enumerate(_NAMES)
+                if mask >> i & 1}
+
+    def quote(self, identifier: str) -> Quote:
+        """
+        Read the latest state of an identifier as Quote.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            Quote: merged quote, None if the identifier is not in the table
+        """
+        fields = self.get(identifier)
+        if fields is None:
+            return None
+        return Quote(identifier=identifier, **fields)
+
+    def snapshot(self) -> Dict[str, Dict[str, Union[float, int]]]:
+        """
+        Read the latest state of all identifiers, each row consistent in
+        itself.
+
+        Returns:
+            dict: identifier -> field name -> value
+        """
+        self._refresh()
+        return {identifier: self.get(identifier) for identifier in self._rows}
+
+    def close(self):
+        """
+        Unmap the table.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _refresh(self):
+        buf = self._shm.buf
+        count = struct.unpack_from("<I", buf, _COUNT_OFFSET)[0]
+        for index in range(len(self._rows), count):
+            encoded = _ROW.unpack_from(buf, _offset(index) +
+                                       _SEQUENCE.size)[0]
+            self._rows[encoded.rstrip(b"\0").decode("utf-8")] = index
+
+    def _read(self, row: int) -> tuple:
+        buf = self._shm.buf
+        offset = _offset(row)
+        while True:
+            before = _SEQUENCE.unpack_from(buf, offset)[0]
+            if not before & 1:
+                values = _ROW.unpack_from(buf, offset + _SEQUENCE.size)
+                if _SEQUENCE.unpack_from(buf, offset)[0] == before:
+                    return values[1], values[2:]
+            self.retries += 1
@@ -0,0 +1,248 @@
+# Copyright 2021 Max Beinlich
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Tuple, Union
+
+import base64
+import threading
+
+import numpy as np
+
+from yflive._reader import _QuoteReader
+from yflive.columnar import PRESENT, _BITS, _LAYOUT, _STRINGS
+from yflive.quote import Quote
+from yflive.yfquote_pb2 import YFQuote
+
+__all__ = ['SnapshotStore']
+
+VERSION = "_version"
+
+class SnapshotStore:
+    """
+    The SnapshotStore maintains the full state of every identifier.
+
+    Yahoo! Finance only sends the fields that changed, every quote is merged
+    into the row of its identifier so the row always holds the latest value of
+    every field received so far.
+
+    Rows are stored column-wise in NumPy arrays typed like QuoteColumns, with
+    string fields interned. Lookups by identifier are O(1). Every update bumps
+    the store version and stamps the row with it, so readers can ask for the 
+    rows changed since the version they last saw:
+
+        rows, version = store.changed_since(version)
+
+    The store can be fed as QuoteStreamer sink or through update, which has the
+    signature of the on_quote callback. All methods are thread-safe.
+    """
+
+    def __init__(self, capacity: int=1024):
+        """
+        Constructor method for SnapshotStore.
+
+        Args:
+            capacity (int): number of rows allocated up front, grows as needed
+        """
+        self.version = 0
+
+        self._rows = {}
+        self._identifiers = []
+        self._codes = {f: {} for f in _STRINGS}
+        self._strings = {f: [] for f in _STRINGS}
+        self._yfquote = YFQuote()
+        self._lock = threading.Lock()
+
+        self._capacity = max(capacity, 1)
+        self._columns = {f: np.full(self._capacity, fill, dtype=dtype) 
+                         for f, (dtype, fill) in _LAYOUT.items()}
+        self._present = np.zeros(self._capacity, dtype=np.uint64)
+        self._versions = np.zeros(self._capacity, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._identifiers)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._rows
+
+    # ==========================================================================
+    # Writing
+    # ==========================================================================
+
+    def update(self, streamer, quote: Quote):
+        """
+        Merge a quote into the row of its identifier.
+
+        Args:
+            streamer (QuoteStreamer): streamer the quote was received from
+            quote (Quote): received quote
+        """
+        self.append(quote)
+
+    def append(self, quote: Quote):
+        """
+        Merge a quote into the row of its identifier.
+
+        Args:
+            quote (Quote): received quote
+        """
+        fields = quote._raw
+        with self._lock:
+            self._merge(fields)
+
+    def append_message(self, msg: Union[str, bytes]):
+        """
+        Decode a websocket message and merge it without constructing a Quote.
+
+        Args:
+            msg (str): base64 encoded websocket message
+        """
+        with self._lock:
+            fields = _QuoteReader._fields(self._yfquote, base64.b64decode(msg))
+            self._merge(fields)
+
+    # ==========================================================================
+    # Reading
+    # ==========================================================================
+
+    def get(self, identifier: str) -> Quote:
+        """
+        Get the merged state of an identifier.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            Quote: merged quote, None if nothing was received yet
+        """
+        with self._lock:
+            row = self._rows.get(identifier)
+            if row is None:
+                return None
+            return Quote(**self._fields(row))
+
+    def row_version(self, identifier: str) -> int:
+        """
+        Get the store version at which an identifier was last updated.
+
+        Args:
+            identifier (str): identifier to look up
+
+        Returns:
+            int: version of the row, 0 if nothing was received yet
+        """
+        with self._lock:
+            row = self._rows.get(identifier)
+            return 0 if row is None else int(self._versions[row])
+
+    def changed_since(self, version: int=0) -> Tuple[List[str], int]:
+        """
+        Get identifiers updated after a given version.
+
+        Args:
+            version (int): version returned by a previous call, 0 for all
+
+        Returns:
+            tuple: identifiers changed and the current version
+        """
+        with self._lock:
+            n = len(self._identifiers)
+            rows = np.flatnonzero(self._versions[:n] > version)
+            return [self._identifiers[r] for r in rows], self.version
+
+    def export(self, since: int=0) -> Dict[str, np.ndarray]:
+        """
+        Export rows as table of columns.
+
+        Numeric columns are copies of the typed store columns, string columns
+        are object arrays holding None for absent values. "_present" holds the
+        presence mask (bit i for Quote.__fields__[i]) and "_version" the 
+        version of each row.
+
+        Args:
+            since (int): only export rows updated after this version
+
+        Returns:
+            dict: field name -> array, one entry per row
+        """
+        with self._lock:
+            n = len(self._identifiers)
+            rows = np.flatnonzero(self._versions[:n] > since)
+            table = {}
+            for f, col in self._columns.items():
+                if f in _STRINGS:
+                    strings = np.array(self._strings[f] + [None], dtype=object)
+                    table[f] = strings[col[rows]]
+                else:
+                    table[f] = col[rows]
+            table[PRESENT] = self._present[rows]
+            table[VERSION] = self._versions[rows]
+            return table
+
+    # ==========================================================================
+    # Helper methods
+    # ==========================================================================
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        for f, col in self._columns.items():
+            grown = np.full(capacity, _LAYOUT[f][1], dtype=col.dtype)
+            grown[:self._capacity] = col
+            self._columns[f] = grown
+        for name in ("_present", "_versions"):
+            grown = np.zeros(capacity, dtype=np.uint64)
+            grown[:self._capacity] = getattr(self, name)
+            setattr(self, name, grown)
+        self._capacity = capacity
+
+    def _intern(self, field: str, value: str) -> int:
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._strings[field].append(value)
+        return code
+
+    def _merge(self, fields: dict):
+        identifier = fields.get("identifier")
+        if identifier is None:
+            return
+        row = self._rows.get(identifier)
+        if row is None:
+            row = len(self._identifiers)
+            if row == self._capacity:
+                self._grow()
+            self._rows[identifier] = row
+            self._identifiers.append(identifier)
+
+        columns = self._columns
+        mask = int(self._present[row])
+        for name, value in fields.items():
+            mask |= _BITS[name]
+            if name in _STRINGS:
+                value = self._intern(name, value)
+            columns[name][row] = value
+        self._present[row] = mask
+        self.version += 1
+        self._versions[row] = self.version
+
+    def _fields(self, row: int) -> dict:
+        mask = int(self._present[row])
+        fields = {}
+        for name in Quote.__fields__:
+            if mask & _BITS[name]:
+                value = self._columns[name][row].item()
+                if name in _STRINGS:
+                    value = self._strings[name][value]
+                fields[name] = value
+        return fields